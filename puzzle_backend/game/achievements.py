@@ -0,0 +1,160 @@
+"""Достижения: декларативные правила и их инкрементальная проверка.
+
+Правило либо пороговое по счётчику игрока (PlayerStats), либо условие на одну
+завершённую игру (сложность, число ходов, время). При завершении игры счётчики
+увеличиваются через F(), и проверяются только правила, чей порог пересечён именно
+сейчас, и условия на эту игру — история сессий не перечитывается.
+"""
+from dataclasses import dataclass
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+from django.dispatch import receiver
+
+from .models import Achievement, GameSession, PlayerStats, UserAchievement
+from .signals import session_completed
+
+COUNTERS = ('completions', 'completions_3', 'completions_4', 'completions_5')
+
+
+@dataclass(frozen=True)
+class Rule:
+    code: str
+    name: str
+    description: str
+    counter: str = None
+    threshold: int = None
+    difficulty: int = None
+    max_moves: int = None
+    max_seconds: int = None
+
+    def crossed(self, stats, increments):
+        """Порог счётчика пересечён последним увеличением."""
+        value = stats[self.counter]
+        return value >= self.threshold > value - increments.get(self.counter, 0)
+
+    def reached(self, stats):
+        return self.counter is not None and stats.get(self.counter, 0) >= self.threshold
+
+    def matches(self, difficulty, moves, seconds):
+        """Условие на одну игру."""
+        if self.counter is not None:
+            return False
+        if self.difficulty is not None and difficulty != self.difficulty:
+            return False
+        if self.max_moves is not None and (moves is None or moves >= self.max_moves):
+            return False
+        if self.max_seconds is not None and (seconds is None or seconds >= self.max_seconds):
+            return False
+        return True
+
+    def q(self):
+        """То же условие как фильтр по GameSession (для пакетной проверки истории)."""
+        condition = Q()
+        if self.difficulty is not None:
+            condition &= Q(difficulty=self.difficulty)
+        if self.max_moves is not None:
+            condition &= Q(game_state__moves__lt=self.max_moves)
+        if self.max_seconds is not None:
+            condition &= Q(game_state__timer__lt=self.max_seconds)
+        return condition
+
+
+RULES = (
+    Rule('first_win', "Первая победа", "Соберите любой пазл", counter='completions', threshold=1),
+    Rule('ten_wins', "Десять побед", "Соберите 10 пазлов", counter='completions', threshold=10),
+    Rule('fifty_wins', "Полсотни", "Соберите 50 пазлов", counter='completions', threshold=50),
+    Rule('first_5x5', "Большая доска", "Соберите пазл 5x5", counter='completions_5', threshold=1),
+    Rule('quick_3x3', "Экономно", "Соберите 3x3 меньше чем за 30 ходов", difficulty=3, max_moves=30),
+    Rule('quick_4x4', "Точный расчёт", "Соберите 4x4 меньше чем за 100 ходов", difficulty=4, max_moves=100),
+    Rule('speedrun', "Быстрее минуты", "Соберите любой пазл меньше чем за минуту", max_seconds=60),
+)
+
+
+def sync_definitions():
+    """Создаёт недостающие строки Achievement для правил из RULES."""
+    Achievement.objects.bulk_create(
+        [Achievement(code=rule.code, name=rule.name, description=rule.description) for rule in RULES],
+        ignore_conflicts=True,
+    )
+
+
+def award(pairs):
+    """Выдаёт достижения парами (user_id, code); уже выданные пропускаются на уровне БД."""
+    pairs = set(pairs)
+    if not pairs:
+        return 0
+    ids = dict(Achievement.objects.filter(code__in={code for _, code in pairs}).values_list('code', 'id'))
+    UserAchievement.objects.bulk_create(
+        [UserAchievement(user_id=user_id, achievement_id=ids[code]) for user_id, code in pairs if code in ids],
+        ignore_conflicts=True,
+    )
+    return len(pairs)
+
+
+def _session_facts(session):
+    state = session.game_state if isinstance(session.game_state, dict) else {}
+    moves, seconds = state.get('moves'), state.get('timer')
+    return (
+        session.difficulty,
+        moves if isinstance(moves, int) else None,
+        seconds if isinstance(seconds, int) else None,
+    )
+
+
+def increment(user_id, difficulty):
+    """Увеличивает счётчики игрока и возвращает их новые значения."""
+    counter = f'completions_{difficulty}'
+    increments = {'completions': 1, counter: 1}
+    with transaction.atomic():
+        stats = PlayerStats.objects.filter(user_id=user_id)
+        if not stats.update(**{name: F(name) + step for name, step in increments.items()}):
+            try:
+                with transaction.atomic():
+                    PlayerStats.objects.create(user_id=user_id, **increments)
+            except IntegrityError:
+                stats.update(**{name: F(name) + step for name, step in increments.items()})
+        values = stats.values(*COUNTERS).get()
+    return values, increments
+
+
+def evaluate(session):
+    """Коды достижений, заработанных этим завершением игры."""
+    stats, increments = increment(session.user_id, session.difficulty)
+    facts = _session_facts(session)
+    return [
+        rule.code for rule in RULES
+        if (rule.counter is not None and rule.crossed(stats, increments)) or rule.matches(*facts)
+    ]
+
+
+@receiver(session_completed)
+def award_on_completion(sender, session, newly_completed=True, **kwargs):
+    if not newly_completed or session.score <= 0:
+        return
+    award((session.user_id, code) for code in evaluate(session))
+
+
+def backfill(user_ids):
+    """Пересчитывает счётчики пачки пользователей по истории и выдаёт достижения."""
+    sessions = GameSession.objects.filter(user_id__in=user_ids, is_completed=True, score__gt=0)
+    stats = {user_id: dict.fromkeys(COUNTERS, 0) for user_id in user_ids}
+    for user_id, difficulty, count in (
+        sessions.values('user_id', 'difficulty').annotate(count=Count('id'))
+        .values_list('user_id', 'difficulty', 'count')
+    ):
+        stats[user_id]['completions'] += count
+        stats[user_id][f'completions_{difficulty}'] += count
+
+    PlayerStats.objects.bulk_create(
+        [PlayerStats(user_id=user_id, **values) for user_id, values in stats.items()],
+        update_conflicts=True, unique_fields=['user'], update_fields=list(COUNTERS),
+    )
+    pairs = [
+        (user_id, rule.code) for user_id, values in stats.items() for rule in RULES if rule.reached(values)
+    ]
+    for rule in RULES:
+        if rule.counter is None:
+            matched = sessions.filter(rule.q()).values_list('user_id', flat=True).distinct()
+            pairs += [(user_id, rule.code) for user_id in matched]
+    return award(pairs)
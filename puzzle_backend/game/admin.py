@@ -1,12 +1,23 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import User
-from import_export import resources
+from django.conf import settings
+from django.forms.models import BaseInlineFormSet
+from django.core.exceptions import PermissionDenied
+from import_export import resources, widgets
 from import_export.admin import ImportExportModelAdmin, ExportActionMixin
 from import_export.formats.base_formats import XLSX, CSV
+from django.http import FileResponse, Http404, JsonResponse, StreamingHttpResponse
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from django.utils import timezone
+from datetime import timedelta
+from . import achievements, exports, leaderboard
+from .pagination import EstimatedCountPaginator
 from .models import (
     UserProfile, Achievement, UserAchievement, GameSession,
-    Friendship, Leaderboard, Challenge
+    Friendship, Leaderboard, LeaderboardEntry, PlayerStats, Challenge
 )
 
 class UserProfileInline(admin.StackedInline):
@@ -20,13 +31,79 @@ class UserAchievementInline(admin.TabularInline):
     verbose_name = "Достижение"
     verbose_name_plural = "Достижения"
 
+class LargeTableAdminMixin:
+    """Списки больших таблиц: оценка числа строк вместо COUNT(*), без второго COUNT по всей таблице."""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+class RangeListFilter(admin.SimpleListFilter):
+    """Фильтр по диапазонам значения вместо варианта на каждое различное значение."""
+    field_name = None
+    # (ключ, подпись, нижняя граница включительно, верхняя не включительно или None)
+    ranges = ()
+
+    def lookups(self, request, model_admin):
+        return [(key, label) for key, label, _, _ in self.ranges]
+
+    def queryset(self, request, queryset):
+        for key, _, low, high in self.ranges:
+            if self.value() == key:
+                queryset = queryset.filter(**{f'{self.field_name}__gte': low})
+                return queryset if high is None else queryset.filter(**{f'{self.field_name}__lt': high})
+        return queryset
+
+SCORE_RANGES = (
+    ('0', '0', 0, 1),
+    ('1-999', 'до 1000', 1, 1000),
+    ('1000-4999', '1000–4999', 1000, 5000),
+    ('5000-9999', '5000–9999', 5000, 10000),
+    ('10000+', '10000 и больше', 10000, None),
+)
+
+class ScoreRangeFilter(RangeListFilter):
+    title = 'Очки'
+    parameter_name = 'score_range'
+    field_name = 'score'
+    ranges = SCORE_RANGES
+
+class BestScoreRangeFilter(RangeListFilter):
+    title = 'Лучшие очки'
+    parameter_name = 'best_score_range'
+    field_name = 'best_score'
+    ranges = SCORE_RANGES[1:]
+
+class LimitedInlineFormSet(BaseInlineFormSet):
+    """Формсет только для просмотра: последние ``max_rows`` строк вместо всех."""
+    max_rows = None
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        return queryset if self.max_rows is None else queryset[:self.max_rows]
+
 class GameSessionInline(admin.TabularInline):
+    """Последние игры пользователя; полная история — в списке сессий с фильтром по игроку."""
     model = GameSession
     extra = 0
     fields = ('difficulty', 'score', 'is_completed', 'updated_at')
-    readonly_fields = ('updated_at',)
+    readonly_fields = fields
+    ordering = ('-updated_at',)
+    show_change_link = True
+    can_delete = False
+    verbose_name_plural = "Последние игры"
+    formset = LimitedInlineFormSet
 
-class UserAdmin(BaseUserAdmin, ExportActionMixin):
+    def get_formset(self, request, obj=None, **kwargs):
+        formset = super().get_formset(request, obj, **kwargs)
+        formset.max_rows = settings.ADMIN_INLINE_SESSIONS
+        return formset
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+class UserAdmin(LargeTableAdminMixin, BaseUserAdmin, ExportActionMixin):
     inlines = (UserProfileInline, UserAchievementInline, GameSessionInline)
     list_display = ('username', 'email', 'is_staff', 'date_joined')
     actions = ['export_admin_action']
@@ -34,47 +111,114 @@ class UserAdmin(BaseUserAdmin, ExportActionMixin):
 admin.site.unregister(User)
 admin.site.register(User, UserAdmin)
 
-class GameSessionResource(resources.ModelResource):
-    user__username = resources.Field(attribute='user__username', column_name='Игрок')
-    difficulty = resources.Field(attribute='difficulty', column_name='Сложность')
-    score = resources.Field(attribute='score', column_name='Очки')
-    is_completed = resources.Field(attribute='is_completed', column_name='Завершена')
-    time_played = resources.Field(attribute='time_played', column_name='Время игры')
-    updated_at = resources.Field(attribute='updated_at', column_name='Обновлено')
+class UsernameWidget(widgets.ForeignKeyWidget):
+    """Игрок по имени; имена разрешаются заранее пачками, а не запросом на строку."""
 
-    class Meta:
-        model = GameSession
-        fields = ('user__username', 'difficulty', 'score', 'is_completed', 'time_played', 'updated_at')
-        export_order = ('user__username', 'difficulty', 'score', 'is_completed', 'time_played', 'updated_at')
+    def __init__(self):
+        super().__init__(User, 'username')
+        self.users = {}
 
-    def dehydrate_player(self, obj):
-        return obj.user.username if obj.user else ''
+    def clean(self, value, row=None, **kwargs):
+        if value in (None, ''):
+            raise ValueError("Не указан игрок")
+        try:
+            return self.users[str(value)]
+        except KeyError:
+            raise ValueError(f"Игрок «{value}» не найден") from None
 
-    def dehydrate_difficulty(self, obj):
-        choices = {3: '3x3', 4: '4x4', 5: '5x5'}
-        return choices.get(obj.difficulty, str(obj.difficulty))
+class DifficultyWidget(widgets.IntegerWidget):
+    """Сложность: «4x4» в файле, 4 в модели."""
 
-    def dehydrate_score(self, obj):
-        return obj.score
+    def clean(self, value, row=None, **kwargs):
+        if isinstance(value, str):
+            value = value.lower().replace('х', 'x').split('x', 1)[0]
+        value = super().clean(value, row, **kwargs)
+        if value not in exports.DIFFICULTIES:
+            raise ValueError(f"Неизвестная сложность: {value}")
+        return value
 
-    def dehydrate_is_completed(self, obj):
-        return 'Да' if obj.is_completed else 'Нет'
+    def render(self, value, obj=None):
+        return exports.DIFFICULTIES.get(value, str(value))
 
-    def dehydrate_time_played(self, obj):
-        if obj.time_played:
-            return int(obj.time_played.total_seconds())
-        return ''
+class YesNoWidget(widgets.BooleanWidget):
+    TRUE_VALUES = ['Да', 'да', *widgets.BooleanWidget.TRUE_VALUES]
+    FALSE_VALUES = ['Нет', 'нет', *widgets.BooleanWidget.FALSE_VALUES]
 
-    def dehydrate_updated_at(self, obj):
-        return obj.updated_at.strftime('%d.%m.%Y %H:%M:%S') if obj.updated_at else ''
+class SecondsWidget(widgets.Widget):
+    """Время игры целым числом секунд."""
 
-class GameSessionAdmin(ImportExportModelAdmin):
+    def clean(self, value, row=None, **kwargs):
+        if value in (None, ''):
+            return None
+        return timedelta(seconds=int(float(value)))
+
+    def render(self, value, obj=None):
+        return int(value.total_seconds()) if value else ''
+
+class GameSessionResource(resources.ModelResource):
+    """Экспорт и пакетный импорт сессий.
+
+    Импорт не вызывает GameSession.save() на строку: строки копятся и вставляются
+    bulk_create пачками, а рекорды и достижения пересчитываются одним проходом по
+    затронутым игрокам в after_import — других записей в рекорды при импорте нет.
+    """
+    user = resources.Field(attribute='user', column_name='Игрок', widget=UsernameWidget())
+    difficulty = resources.Field(attribute='difficulty', column_name='Сложность', widget=DifficultyWidget())
+    score = resources.Field(attribute='score', column_name='Очки', widget=widgets.IntegerWidget())
+    is_completed = resources.Field(attribute='is_completed', column_name='Завершена', widget=YesNoWidget())
+    time_played = resources.Field(attribute='time_played', column_name='Время игры', widget=SecondsWidget())
+    updated_at = resources.Field(
+        attribute='updated_at', column_name='Обновлено', readonly=True,
+        widget=widgets.DateTimeWidget(format='%d.%m.%Y %H:%M:%S'),
+    )
+
+    class Meta:
+        model = GameSession
+        fields = ('user', 'difficulty', 'score', 'is_completed', 'time_played', 'updated_at')
+        export_order = ('user', 'difficulty', 'score', 'is_completed', 'time_played', 'updated_at')
+        # У сессий нет естественного ключа: каждая строка — новая сессия, без поиска по id
+        force_init_instance = True
+        use_bulk = True
+        batch_size = 1000
+        skip_diff = True
+
+    def before_import(self, dataset, **kwargs):
+        """Разрешает имена игроков запросом на пачку строк."""
+        self.imported_user_ids = set()
+        widget = self.fields['user'].widget
+        column = self.fields['user'].column_name
+        names = sorted({str(value) for value in dataset[column] if value not in (None, '')}) \
+            if column in (dataset.headers or ()) else []
+        widget.users = {}
+        for offset in range(0, len(names), self._meta.batch_size):
+            chunk = names[offset:offset + self._meta.batch_size]
+            widget.users.update((user.username, user) for user in User.objects.filter(username__in=chunk))
+
+    def before_save_instance(self, instance, row, **kwargs):
+        if instance.game_state is None:
+            instance.game_state = {}
+        self.imported_user_ids.add(instance.user_id)
+
+    def after_import(self, dataset, result, **kwargs):
+        """Один пересчёт рекордов и достижений по затронутым игрокам."""
+        if kwargs.get('dry_run') or result.has_errors() or not self.imported_user_ids:
+            return
+        user_ids = sorted(self.imported_user_ids)
+        leaderboard.rebuild(user_ids, batch_size=self._meta.batch_size)
+        achievements.sync_definitions()
+        for offset in range(0, len(user_ids), self._meta.batch_size):
+            achievements.backfill(user_ids[offset:offset + self._meta.batch_size])
+
+class GameSessionAdmin(LargeTableAdminMixin, ImportExportModelAdmin):
     resource_class = GameSessionResource
     formats = [XLSX, CSV]
+    # Кнопки потоковой выгрузки рядом с импортом/экспортом
+    import_export_change_list_template = 'admin/game/gamesession/change_list.html'
     list_display = ('player', 'difficulty_display', 'score', 'is_completed', 'time_played_display', 'updated_at')
-    list_filter = ('difficulty', 'is_completed', 'updated_at')
+    list_select_related = ('user',)
+    list_filter = ('difficulty', 'is_completed', 'replay_status', ScoreRangeFilter, 'updated_at')
     search_fields = ('user__username',)
-    readonly_fields = ('time_played', 'created_at', 'updated_at')
+    readonly_fields = ('time_played', 'replay_status', 'replay_score', 'created_at', 'updated_at')
 
     def player(self, obj):
         return obj.user.username if obj.user else ''
@@ -91,36 +235,121 @@ class GameSessionAdmin(ImportExportModelAdmin):
         return ''
     time_played_display.short_description = 'Время игры'
 
+    def get_export_queryset(self, request):
+        # Имя игрока в выгрузке через import-export — JOIN вместо запроса на строку
+        return super().get_export_queryset(request).select_related('user')
+
+    def get_urls(self):
+        view = self.admin_site.admin_view
+        return [
+            path('export-csv/', view(self.export_csv_view), name='game_gamesession_export_csv'),
+            path('export-xlsx/', view(self.export_xlsx_view), name='game_gamesession_export_xlsx'),
+            path('export-xlsx/<uuid:job_id>/', view(self.export_progress_view),
+                 name='game_gamesession_export_progress'),
+            path('export-xlsx/<uuid:job_id>/download/', view(self.export_download_view),
+                 name='game_gamesession_export_download'),
+        ] + super().get_urls()
+
+    def _check_export(self, request):
+        if not self.has_export_permission(request):
+            raise PermissionDenied
+
+    def export_csv_view(self, request):
+        """CSV потоком: строки читаются курсором и сразу уходят клиенту (с фильтрами списка)."""
+        self._check_export(request)
+        response = StreamingHttpResponse(
+            exports.stream_csv(self.get_export_queryset(request)), content_type='text/csv; charset=utf-8'
+        )
+        filename = f"sessions-{timezone.now():%Y%m%d-%H%M%S}.csv"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    def export_xlsx_view(self, request):
+        """Запускает фоновую выгрузку XLSX и переводит на страницу прогресса."""
+        self._check_export(request)
+        if request.method != 'POST':
+            return redirect('admin:game_gamesession_changelist')
+        job_id = exports.start_xlsx(self.get_export_queryset(request))
+        messages.info(request, "Выгрузка XLSX запущена")
+        return redirect('admin:game_gamesession_export_progress', job_id=job_id)
+
+    def export_progress_view(self, request, job_id):
+        self._check_export(request)
+        job_id = str(job_id)
+        state = exports.state(job_id)
+        if state is None:
+            raise Http404("Задача выгрузки не найдена")
+        if request.GET.get('format') == 'json':
+            return JsonResponse(state)
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': "Выгрузка сессий в XLSX",
+            'job_id': job_id,
+            'state': state,
+            'status_url': reverse('admin:game_gamesession_export_progress', args=[job_id]) + '?format=json',
+            'download_url': reverse('admin:game_gamesession_export_download', args=[job_id]),
+        }
+        return TemplateResponse(request, 'admin/game/gamesession/export_progress.html', context)
+
+    def export_download_view(self, request, job_id):
+        self._check_export(request)
+        job_id = str(job_id)
+        state = exports.state(job_id)
+        file = exports.path(job_id)
+        if not state or state['status'] != 'done' or not file.is_file():
+            raise Http404("Файл выгрузки не готов")
+        return FileResponse(open(file, 'rb'), as_attachment=True, filename=f'sessions-{job_id[:8]}.xlsx')
+
 admin.site.register(GameSession, GameSessionAdmin)
 
 @admin.register(Achievement)
 class AchievementAdmin(admin.ModelAdmin):
-    list_display = ('name', 'description')
-    search_fields = ('name',)
+    list_display = ('name', 'code', 'description')
+    search_fields = ('name', 'code')
 
 @admin.register(UserAchievement)
-class UserAchievementAdmin(admin.ModelAdmin):
+class UserAchievementAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('user', 'achievement')
+    list_select_related = ('user', 'achievement')
     list_filter = ('achievement',)
     search_fields = ('user__username', 'achievement__name')
 
 @admin.register(Friendship)
-class FriendshipAdmin(admin.ModelAdmin):
+class FriendshipAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('from_user', 'to_user', 'created_at')
+    list_select_related = ('from_user', 'to_user')
     search_fields = ('from_user__username', 'to_user__username')
 
 @admin.register(Leaderboard)
-class LeaderboardAdmin(admin.ModelAdmin):
+class LeaderboardAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('user', 'best_score', 'date_achieved')
+    list_select_related = ('user',)
     search_fields = ('user__username',)
-    list_filter = ('best_score',)
+    list_filter = (BestScoreRangeFilter,)
     ordering = ('-best_score',)
     def get_queryset(self, request):
         qs = super().get_queryset(request)
         return qs.filter(best_score__gt=0)
 
+@admin.register(LeaderboardEntry)
+class LeaderboardEntryAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    list_display = ('user', 'difficulty', 'best_score', 'date_achieved')
+    list_select_related = ('user',)
+    search_fields = ('user__username',)
+    list_filter = ('difficulty', BestScoreRangeFilter)
+    ordering = ('difficulty', '-best_score')
+
+@admin.register(PlayerStats)
+class PlayerStatsAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    list_display = ('user', 'completions', 'completions_3', 'completions_4', 'completions_5')
+    list_select_related = ('user',)
+    search_fields = ('user__username',)
+    readonly_fields = ('completions', 'completions_3', 'completions_4', 'completions_5')
+
 @admin.register(Challenge)
-class ChallengeAdmin(admin.ModelAdmin):
+class ChallengeAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('from_user', 'to_user', 'difficulty', 'target_score', 'is_accepted', 'is_completed')
+    list_select_related = ('from_user', 'to_user')
     list_filter = ('difficulty', 'is_accepted', 'is_completed')
     search_fields = ('from_user__username', 'to_user__username')
\ No newline at end of file
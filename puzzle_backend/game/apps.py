@@ -2,4 +2,9 @@ from django.apps import AppConfig
 
 class GameConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'game'
\ No newline at end of file
+    name = 'game'
+
+    def ready(self):
+        # Регистрирует обработчики сигналов (инвалидация кэша лидерборда, достижения,
+        # журнал изменений индекса рейтинга, push-обновления, замеры запросов к БД, метрики)
+        from . import achievements, instrumentation, leaderboard, metrics, ranking, updates  # noqa: F401
@@ -0,0 +1,119 @@
+"""Асинхронные версии read-only эндпоинтов (/api/async/...).
+
+Те же ответы, что у синхронных представлений, но запросы к БД идут через асинхронный
+ORM (``aget``, ``async for``), и под ASGI-сервером ожидание БД не занимает поток.
+Исключение — страница списка: её читает пагинатор DRF (CursorPagination.apaginate_queryset)
+в потоке через sync_to_async, чтобы не копировать его разбор курсора.
+Аутентификация — только JWT (как DEFAULT_AUTHENTICATION_CLASSES), сериализация —
+теми же сериализаторами DRF по уже загруженным объектам. Таблица лидеров — те же запросы
+и то же построение строк (leaderboard.numbered), что и в синхронном представлении.
+"""
+import functools
+from types import SimpleNamespace
+
+from django.contrib.auth.models import User
+from django.http import HttpResponse
+from django.utils.dateparse import parse_date
+from rest_framework import exceptions
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+from . import leaderboard
+from .models import Achievement, Friendship, UserProfile
+from .pagination import CursorPagination
+from .serializers import AchievementSerializer, FriendSerializer, ProfileSerializer
+
+
+def render(data, status=200, headers=None):
+    return HttpResponse(JSONRenderer().render(data), status=status, content_type='application/json',
+                        headers=headers)
+
+
+def async_api_view(view):
+    """GET-представление: возвращает данные ответа, ошибки DRF превращаются в JSON с их кодом."""
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return render({'detail': exceptions.MethodNotAllowed(request.method).detail}, status=405,
+                          headers={'Allow': 'GET, HEAD'})
+        try:
+            return render(await view(request, *args, **kwargs))
+        except exceptions.APIException as exc:
+            detail = exc.detail if isinstance(exc.detail, (dict, list)) else {'detail': exc.detail}
+            headers = None
+            if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+                headers = {'WWW-Authenticate': 'Bearer realm="api"'}
+            return render(detail, status=exc.status_code, headers=headers)
+    return wrapper
+
+
+async def authenticate(request, required=True):
+    """Пользователь из заголовка Authorization: Bearer <access>; None — без заголовка."""
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    raw = authentication.get_raw_token(header) if header is not None else None
+    if raw is None:
+        if required:
+            raise exceptions.NotAuthenticated()
+        return None
+    token = authentication.get_validated_token(raw)
+    try:
+        return await User.objects.aget(pk=token[api_settings.USER_ID_CLAIM], is_active=True)
+    except User.DoesNotExist:
+        raise exceptions.AuthenticationFailed("Пользователь не найден", code='user_not_found')
+
+
+async def paginated(request, queryset, serializer_class, ordering):
+    paginator = CursorPagination()
+    drf_request = Request(request)
+    view = SimpleNamespace(cursor_ordering=ordering)
+    page = await paginator.apaginate_queryset(queryset, drf_request, view)
+    data = serializer_class(page, many=True, context={'request': drf_request}).data
+    return paginator.get_paginated_data(data)
+
+
+@async_api_view
+async def leaderboard_view(request):
+    difficulty = request.GET.get('difficulty')
+    friends = request.GET.get('friends') == 'true'
+    date_from = parse_date(request.GET.get('date_from', ''))
+    date_to = parse_date(request.GET.get('date_to', ''))
+    user = await authenticate(request, required=False)
+
+    if difficulty and difficulty not in ('3', '4', '5'):
+        raise exceptions.ValidationError({"difficulty": "Допустимые значения: 3, 4, 5."})
+
+    friends_of = user.pk if friends and user is not None else None
+    key = await leaderboard.acache_key(difficulty, date_from, date_to, friends_of)
+
+    return await leaderboard.acached(
+        key, lambda: leaderboard.aresults(difficulty, date_from, date_to, friends_of)
+    )
+
+
+@async_api_view
+async def public_profile_view(request, username):
+    try:
+        profile = await UserProfile.objects.select_related('user').aget(user__username=username)
+    except UserProfile.DoesNotExist:
+        raise exceptions.NotFound()
+    return ProfileSerializer(profile, context={'request': request}).data
+
+
+@async_api_view
+async def achievements_view(request):
+    user = await authenticate(request)
+    return await paginated(
+        request, Achievement.objects.filter(userachievement__user=user), AchievementSerializer, '-id'
+    )
+
+
+@async_api_view
+async def friends_view(request):
+    user = await authenticate(request)
+    return await paginated(
+        request, Friendship.objects.filter(from_user=user).select_related('to_user'), FriendSerializer,
+        ('-created_at', '-id'),
+    )
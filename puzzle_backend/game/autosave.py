@@ -0,0 +1,131 @@
+"""Буфер автосохранения: пакеты ходов копятся в кэше, в БД пишется редкий снимок.
+
+Буфер с ходами, которых ещё нет в снимке, хранится без срока: иначе вкладка, простоявшая
+дольше BUFFER_TIMEOUT, теряла бы ходы. Срок (продлеваемый при каждом чтении и записи)
+получает только буфер, целиком записанный в БД.
+
+Копить ходы можно только в общем кэше (AUTOSAVE_BUFFER_MOVES): без него каждый пакет
+пишется в БД сразу. Если буфер всё же пропал, он строится заново из снимка, и пакет
+с несовпадающим числом ходов (base) отклоняется — см. check_base.
+"""
+import copy
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from . import metrics
+from .engine import Board
+from .models import GameSession
+
+BUFFER_TIMEOUT = 60 * 60
+# Поля доски: после создания сессии их меняет только API ходов, а не PATCH клиента
+BOARD_KEYS = ('tiles', 'emptyIndex', 'moves', 'initialTiles', 'moveLog')
+
+
+def _key(session_id):
+    return f'autosave:{session_id}'
+
+
+def _timeout(entry):
+    return None if entry['pending'] else BUFFER_TIMEOUT
+
+
+def load_buffer(session_id, user_id):
+    """Буфер сессии из кэша или None, если его нет или он чужой."""
+    entry = cache.get(_key(session_id))
+    if entry is None or entry['user_id'] != user_id:
+        return None
+    cache.touch(_key(session_id), _timeout(entry))
+    return entry
+
+
+def overlay(sessions, user_id):
+    """Подставляет в сессии состояние из буферов: клиент продолжает с последнего хода."""
+    keys = {_key(session.pk): session for session in sessions}
+    if not keys:
+        return
+    for key, entry in cache.get_many(list(keys)).items():
+        if entry['user_id'] == user_id:
+            keys[key].game_state = entry['state']
+
+
+def new_buffer(session):
+    return {
+        'user_id': session.user_id,
+        'state': copy.deepcopy(session.game_state),
+        'pending': 0,
+        'snapshot_at': time.time(),
+    }
+
+
+def discard_buffer(session_id):
+    """Удаляет буфер и возвращает его (например, перед полным PATCH)."""
+    entry = cache.get(_key(session_id))
+    cache.delete(_key(session_id))
+    return entry
+
+
+def keep_board(game_state, current):
+    """Переносит доску из сохранённого состояния в присланное клиентом."""
+    for key in BOARD_KEYS:
+        if key in current:
+            game_state[key] = current[key]
+        else:
+            game_state.pop(key, None)
+
+
+def drop_buffers(session_ids):
+    """Удаляет буферы брошенных сессий: их ходы больше не нужны."""
+    cache.delete_many([_key(session_id) for session_id in session_ids])
+
+
+def check_base(entry, base):
+    """Пакет продолжает именно это состояние: base — число ходов у клиента до пакета."""
+    return base is None or entry['state'].get('moves', 0) == base
+
+
+def apply_moves(state, moves):
+    """Применяет ходы (позиции плиток, по которым кликнули) к game_state на месте."""
+    board = Board.from_state(state)
+    board.apply_moves(moves)
+    state['tiles'] = board.state_tiles()
+    state['emptyIndex'] = board.blank
+    state['moves'] = state.get('moves', 0) + len(moves)
+    state.setdefault('moveLog', []).extend(moves)
+
+
+def apply_batch(entry, moves, timer):
+    """Применяет пакет целиком или не применяет вовсе (IllegalMoveError, InvalidBoardError)."""
+    state = copy.deepcopy(entry['state'])
+    apply_moves(state, moves)
+    state['timer'] = timer
+    entry['state'] = state
+    entry['pending'] += len(moves)
+
+
+def commit(session_id, entry, flush=False):
+    """Сохраняет буфер; снимок в БД пишется раз в N ходов, T секунд или по flush.
+
+    Возвращает None, если сессия уже завершена или удалена, иначе признак записи снимка.
+    """
+    now = time.time()
+    due = (
+        flush
+        or not settings.AUTOSAVE_BUFFER_MOVES
+        or entry['pending'] >= settings.AUTOSAVE_SNAPSHOT_MOVES
+        or now - entry['snapshot_at'] >= settings.AUTOSAVE_SNAPSHOT_SECONDS
+    )
+    if due:
+        updated = GameSession.objects.filter(pk=session_id, is_completed=False).update(
+            game_state=entry['state'], updated_at=timezone.now()
+        )
+        if not updated:
+            cache.delete(_key(session_id))
+            return None
+        entry['pending'] = 0
+        entry['snapshot_at'] = now
+    cache.set(_key(session_id), entry, _timeout(entry))
+    metrics.AUTOSAVES.inc(snapshot='true' if due else 'false')
+    return due
@@ -0,0 +1,171 @@
+"""Игровой движок пазла: компактная доска, ходы и проверка решаемости.
+
+Доска n×n хранится как bytearray длины n*n: ``tiles[pos]`` — номер плитки на позиции
+``pos``, пустая клетка — плитка с номером ``n*n - 1`` (как во фронтенде). Собранная доска —
+``tiles[i] == i``. Ход — позиция плитки, которая сдвигается в пустую клетку.
+"""
+from functools import lru_cache
+
+SIZES = (3, 4, 5)
+
+
+class InvalidBoardError(ValueError):
+    """Состояние доски не является перестановкой плиток n×n."""
+
+
+class IllegalMoveError(Exception):
+    """Ход не соответствует текущему положению пустой клетки."""
+
+    def __init__(self, position, offset):
+        super().__init__(f"Недопустимый ход {position} (№{offset} в пакете)")
+        self.position = position
+        self.offset = offset
+
+
+@lru_cache(maxsize=None)
+def neighbours(size):
+    """Для каждой позиции — кортеж соседних позиций (куда может уйти пустая клетка)."""
+    result = []
+    for pos in range(size * size):
+        row, col = divmod(pos, size)
+        adjacent = []
+        if row > 0:
+            adjacent.append(pos - size)
+        if row < size - 1:
+            adjacent.append(pos + size)
+        if col > 0:
+            adjacent.append(pos - 1)
+        if col < size - 1:
+            adjacent.append(pos + 1)
+        result.append(tuple(adjacent))
+    return tuple(result)
+
+
+@lru_cache(maxsize=None)
+def adjacency(size):
+    """Плоская таблица смежности: ``adjacency(n)[a * n*n + b] == 1``, если a и b соседние."""
+    cells = size * size
+    table = bytearray(cells * cells)
+    for pos, adjacent in enumerate(neighbours(size)):
+        for other in adjacent:
+            table[pos * cells + other] = 1
+    return bytes(table)
+
+
+def first_illegal_move(size, blank, moves):
+    """Индекс первого недопустимого хода в пакете или -1.
+
+    Допустимость зависит только от пути пустой клетки: перед ходом i она стоит на
+    месте хода i-1, поэтому весь пакет проверяется одним проходом по парам без
+    изменения доски.
+    """
+    cells = size * size
+    table = adjacency(size)
+    previous = [blank, *moves[:-1]]
+    for offset, (before, pos) in enumerate(zip(previous, moves)):
+        if not 0 <= pos < cells or not table[before * cells + pos]:
+            return offset
+    return -1
+
+
+class Board:
+    """Доска n×n с отслеживанием пустой клетки за O(1)."""
+    __slots__ = ('size', 'tiles', 'blank')
+
+    def __init__(self, size, tiles, blank=None):
+        self.size = size
+        self.tiles = bytearray(tiles)
+        self.blank = self.tiles.index(size * size - 1) if blank is None else blank
+
+    @classmethod
+    def solved(cls, size):
+        return cls(size, range(size * size), size * size - 1)
+
+    @classmethod
+    def from_tiles(cls, tiles):
+        """Доска из списка номеров плиток с проверкой, что это перестановка."""
+        cells = len(tiles)
+        size = int(round(cells ** 0.5))
+        if size not in SIZES or size * size != cells or sorted(tiles) != list(range(cells)):
+            raise InvalidBoardError("Некорректный набор плиток")
+        return cls(size, tiles)
+
+    @classmethod
+    def from_state(cls, game_state):
+        """Доска из game_state фронтенда ({'tiles': [{'index': n}, ...]})."""
+        try:
+            tiles = [int(tile['index']) for tile in game_state['tiles']]
+        except (KeyError, TypeError, ValueError):
+            raise InvalidBoardError("Некорректное состояние игры")
+        return cls.from_tiles(tiles)
+
+    def state_tiles(self):
+        """Плитки в формате game_state фронтенда."""
+        return [{'index': tile} for tile in self.tiles]
+
+    def key(self):
+        return bytes(self.tiles)
+
+    def copy(self):
+        return Board(self.size, self.tiles, self.blank)
+
+    def legal_moves(self):
+        return neighbours(self.size)[self.blank]
+
+    def move(self, pos):
+        if pos not in neighbours(self.size)[self.blank]:
+            raise IllegalMoveError(pos, 0)
+        tiles = self.tiles
+        tiles[self.blank], tiles[pos] = tiles[pos], tiles[self.blank]
+        self.blank = pos
+
+    def apply_moves(self, moves):
+        """Применяет пакет ходов целиком; при недопустимом ходе доска не меняется."""
+        offset = first_illegal_move(self.size, self.blank, moves)
+        if offset >= 0:
+            raise IllegalMoveError(moves[offset], offset)
+        tiles = self.tiles
+        blank = self.blank
+        for pos in moves:
+            tiles[blank] = tiles[pos]
+            blank = pos
+        if moves:
+            tiles[blank] = self.size * self.size - 1
+        self.blank = blank
+
+    def is_solved(self):
+        return all(tile == pos for pos, tile in enumerate(self.tiles))
+
+    def is_solvable(self):
+        """Чётность перестановки равна чётности расстояния пустой клетки до её места."""
+        cells = len(self.tiles)
+        seen = bytearray(cells)
+        transpositions = 0
+        for start in range(cells):
+            length = 0
+            pos = start
+            while not seen[pos]:
+                seen[pos] = 1
+                pos = self.tiles[pos]
+                length += 1
+            if length:
+                transpositions += length - 1
+        row, col = divmod(self.blank, self.size)
+        distance = (self.size - 1 - row) + (self.size - 1 - col)
+        return transpositions % 2 == distance % 2
+
+    def __eq__(self, other):
+        return isinstance(other, Board) and self.size == other.size and self.tiles == other.tiles
+
+    def __hash__(self):
+        return hash((self.size, bytes(self.tiles)))
+
+    def __repr__(self):
+        return f"Board({self.size}, {list(self.tiles)})"
+
+
+def replay(initial_tiles, moves):
+    """Доска после применения лога ходов к начальной раскладке."""
+    board = Board.from_tiles(list(initial_tiles))
+    board.apply_moves(list(moves))
+    return board
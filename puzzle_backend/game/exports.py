@@ -0,0 +1,212 @@
+"""Выгрузка игровых сессий без сборки всего файла в памяти.
+
+CSV отдаётся потоком (StreamingHttpResponse) по мере чтения строк из БД курсором.
+XLSX строится фоновой задачей в файл (openpyxl в режиме write_only), прогресс
+задачи хранится в кэше и показывается в админке.
+
+Задача живёт в пуле потоков веб-воркера и погибает вместе с ним (перезапуск воркера,
+SIGHUP, деплой). Пока задача в очереди или выполняется, поток-пульс процесса продлевает
+её аренду в кэше; состояние running без аренды считается прерванным.
+"""
+import csv
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from openpyxl import Workbook
+
+logger = logging.getLogger(__name__)
+
+HEADERS = ('Игрок', 'Сложность', 'Очки', 'Завершена', 'Время игры', 'Обновлено')
+FIELDS = ('user__username', 'difficulty', 'score', 'is_completed', 'time_played', 'updated_at')
+DIFFICULTIES = {3: '3x3', 4: '4x4', 5: '5x5'}
+# Строк данных на лист: в листе Excel не больше 1 048 576 строк, одна — заголовок
+SHEET_ROWS = 1048575
+
+_executor = None
+_executor_lock = threading.Lock()
+# Задачи этого процесса (в очереди и выполняющиеся), которым нужен пульс
+_active = set()
+_active_lock = threading.Lock()
+_pulse = None
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.EXPORT_WORKERS, thread_name_prefix='exports')
+        return _executor
+
+
+def format_row(username, difficulty, score, is_completed, time_played, updated_at):
+    """Строка выгрузки в том же виде, что и у GameSessionResource."""
+    return (
+        username or '',
+        DIFFICULTIES.get(difficulty, str(difficulty)),
+        score,
+        'Да' if is_completed else 'Нет',
+        int(time_played.total_seconds()) if time_played else '',
+        updated_at.strftime('%d.%m.%Y %H:%M:%S') if updated_at else '',
+    )
+
+
+def rows(queryset):
+    """Строки выгрузки курсором по chunk_size; имя игрока — через JOIN, без моделей."""
+    for row in queryset.values_list(*FIELDS).iterator(chunk_size=settings.EXPORT_CHUNK_SIZE):
+        yield format_row(*row)
+
+
+class _Echo:
+    """Псевдофайл для csv.writer: возвращает записанную строку вместо буферизации."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(queryset):
+    """Генератор строк CSV для StreamingHttpResponse."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(HEADERS)
+    for row in rows(queryset):
+        yield writer.writerow(row)
+
+
+# Фоновая выгрузка XLSX
+
+def _key(job_id):
+    return f'export:{job_id}'
+
+
+def path(job_id):
+    return settings.EXPORT_DIR / f'{job_id}.xlsx'
+
+
+def _lease_key(job_id):
+    return f'export:{job_id}:lease'
+
+
+def state(job_id):
+    """Состояние задачи: status (running/done/failed), rows, total; None — нет такой задачи.
+
+    Задача running без аренды (её процесс завершился) помечается failed.
+    """
+    values = cache.get_many([_key(job_id), _lease_key(job_id)])
+    current = values.get(_key(job_id))
+    if current and current['status'] == 'running' and _lease_key(job_id) not in values:
+        logger.warning("Выгрузка %s прервана: процесс задачи завершился", job_id)
+        current = dict(current, status='failed')
+        _set_state(job_id, **current)
+    return current
+
+
+def _set_state(job_id, **values):
+    cache.set(_key(job_id), values, settings.EXPORT_RETENTION_SECONDS)
+
+
+def _renew(job_ids):
+    cache.set_many({_lease_key(job_id): True for job_id in job_ids}, settings.EXPORT_LEASE_SECONDS)
+
+
+def _beat():
+    while True:
+        time.sleep(settings.EXPORT_LEASE_SECONDS / 3)
+        with _active_lock:
+            job_ids = list(_active)
+        if job_ids:
+            try:
+                _renew(job_ids)
+            except Exception:
+                logger.exception("Не удалось продлить аренду выгрузок")
+
+
+def _track(job_id):
+    """Берёт аренду задачи и запускает поток-пульс процесса, если его ещё нет."""
+    global _pulse
+    _renew([job_id])
+    with _active_lock:
+        _active.add(job_id)
+        if _pulse is None or not _pulse.is_alive():
+            _pulse = threading.Thread(target=_beat, name='exports-pulse', daemon=True)
+            _pulse.start()
+
+
+def _untrack(job_id):
+    with _active_lock:
+        _active.discard(job_id)
+    cache.delete(_lease_key(job_id))
+
+
+def write_xlsx(job_id, queryset):
+    """Пишет выгрузку в файл, обновляя прогресс после каждой пачки строк.
+
+    Каждые SHEET_ROWS строк начинается новый лист («Сессии 2», …) со своим заголовком.
+    """
+    total = queryset.count()
+    _set_state(job_id, status='running', rows=0, total=total)
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Сессии')
+    sheet.append(HEADERS)
+    written = 0
+    for row in rows(queryset):
+        if written and written % SHEET_ROWS == 0:
+            sheet = workbook.create_sheet(f'Сессии {written // SHEET_ROWS + 1}')
+            sheet.append(HEADERS)
+        sheet.append(row)
+        written += 1
+        if written % settings.EXPORT_CHUNK_SIZE == 0:
+            _set_state(job_id, status='running', rows=written, total=total)
+
+    target = path(job_id)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    partial = target.with_suffix('.part')
+    workbook.save(partial)
+    partial.replace(target)
+    _set_state(job_id, status='done', rows=written, total=total)
+
+
+def _run(job_id, queryset):
+    try:
+        write_xlsx(job_id, queryset)
+    except Exception:
+        logger.exception("Не удалось выгрузить сессии (задача %s)", job_id)
+        _set_state(job_id, status='failed', rows=0, total=0)
+    finally:
+        _untrack(job_id)
+
+
+def _run_in_thread(job_id, queryset):
+    try:
+        _run(job_id, queryset)
+    finally:
+        # У потоков пула свои соединения с БД
+        connection.close()
+
+
+def prune():
+    """Удаляет файлы выгрузок старше срока хранения."""
+    directory = settings.EXPORT_DIR
+    if not directory.is_dir():
+        return
+    cutoff = time.time() - settings.EXPORT_RETENTION_SECONDS
+    for file in directory.iterdir():
+        if file.stat().st_mtime < cutoff:
+            file.unlink(missing_ok=True)
+
+
+def start_xlsx(queryset):
+    """Ставит выгрузку в пул (синхронно, если пул выключен) и возвращает id задачи."""
+    prune()
+    job_id = str(uuid.uuid4())
+    _set_state(job_id, status='running', rows=0, total=None)
+    _track(job_id)
+    if settings.EXPORT_WORKERS <= 0:
+        _run(job_id, queryset)
+    else:
+        _get_executor().submit(_run_in_thread, job_id, queryset)
+    return job_id
@@ -0,0 +1,36 @@
+"""HTML-оболочка фронтенда (index.html).
+
+Шаблон не зависит от запроса, поэтому рендерится один раз на процесс. Ответ помечен
+``no-cache`` с ETag: браузер каждый раз перепроверяет оболочку (после выкладки в ней новые
+хэшированные имена статики), а повторный визит стоит одного короткого ответа 304.
+"""
+import hashlib
+from functools import lru_cache
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.views.decorators.cache import cache_control
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import condition, require_safe
+
+
+@lru_cache(maxsize=None)
+def _render():
+    content = render_to_string('index.html')
+    return content, hashlib.sha256(content.encode()).hexdigest()[:32]
+
+
+def shell():
+    """(HTML, ETag) оболочки; в режиме отладки — заново при каждом запросе."""
+    if settings.DEBUG:
+        _render.cache_clear()
+    return _render()
+
+
+@require_safe
+@gzip_page
+@cache_control(no_cache=True)
+@condition(etag_func=lambda request: shell()[1])
+def index(request):
+    return HttpResponse(shell()[0])
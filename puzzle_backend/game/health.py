@@ -0,0 +1,40 @@
+"""Проверки для балансировщика и оркестратора: /healthz и /readyz.
+
+Обе не обращаются к БД: частые проверки не должны занимать соединения, а временная
+недоступность БД не должна выводить из балансировки все экземпляры сразу.
+"""
+from django.core.cache import cache
+from django.http import JsonResponse
+from django.views.decorators.cache import never_cache
+
+from . import ranking
+
+
+@never_cache
+def healthz(request):
+    """Процесс жив и обрабатывает запросы."""
+    return JsonResponse({'status': 'ok'})
+
+
+def checks():
+    results = {}
+    try:
+        cache.set('health:ping', 1, 10)
+        results['cache'] = cache.get('health:ping') == 1
+    except Exception:
+        results['cache'] = False
+    if ranking.enabled():
+        # Пока индекс рейтинга грузится, запросы ушли бы в SQL — трафик лучше не давать
+        results['rank_index'] = ranking.loaded()
+        if not results['rank_index']:
+            ranking.warm()
+    return results
+
+
+@never_cache
+def readyz(request):
+    """Экземпляр готов принимать трафик: кэш отвечает, индекс рейтинга (если включён) загружен."""
+    results = checks()
+    ready = all(results.values())
+    return JsonResponse({'status': 'ok' if ready else 'unavailable', 'checks': results},
+                        status=200 if ready else 503)
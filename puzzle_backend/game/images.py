@@ -0,0 +1,149 @@
+"""Локальный пул картинок для пазла: спрайты по сложностям и дисковый LRU-кэш.
+
+Исходники лежат в PUZZLE_IMAGE_POOL_DIR. Для каждой сложности исходник обрезается до
+квадрата и раскладывается в спрайт n×n плиток по PUZZLE_IMAGE_TILE_SIZE пикселей;
+смещение плитки i — (i % n, i // n) × размер плитки. Готовые спрайты хранятся в
+PUZZLE_IMAGE_CACHE_DIR, общий объём ограничен PUZZLE_IMAGE_CACHE_BYTES: при
+переполнении удаляются файлы, к которым дольше всего не обращались (по mtime).
+"""
+import os
+import random
+import re
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from PIL import Image, ImageOps
+
+SOURCE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp'}
+SOURCE_ID = re.compile(r'^[\w-]+$')
+# Не обновляем mtime при каждом обращении, чтобы не писать на диск на каждый запрос
+TOUCH_INTERVAL = 60
+
+
+class ImageNotFound(Exception):
+    """В пуле нет такого (или вообще никакого) исходника."""
+
+
+# Список пула: (каталог, mtime каталога, {id: путь}, отсортированные id). Добавление или
+# удаление файла меняет mtime каталога, поэтому на запрос хватает одного stat()
+_listing = (None, None, {}, ())
+
+
+def _pool():
+    global _listing
+    directory = Path(settings.PUZZLE_IMAGE_POOL_DIR)
+    try:
+        mtime = directory.stat().st_mtime_ns
+    except FileNotFoundError:
+        return {}, ()
+    listing = _listing
+    if listing[:2] != (directory, mtime):
+        pool = {
+            item.stem: item for item in directory.iterdir()
+            if item.suffix.lower() in SOURCE_EXTENSIONS and SOURCE_ID.match(item.stem)
+        }
+        listing = _listing = (directory, mtime, pool, tuple(sorted(pool)))
+    return listing[2], listing[3]
+
+
+def sources():
+    """Исходники пула: {id: путь}; id — имя файла без расширения."""
+    return dict(_pool()[0])
+
+
+def random_source():
+    ids = _pool()[1]
+    if not ids:
+        raise ImageNotFound("Пул картинок пуст")
+    return random.choice(ids)
+
+
+def layout(difficulty):
+    """Описание спрайта: размер плитки, размер листа и смещения плиток по номерам."""
+    tile = settings.PUZZLE_IMAGE_TILE_SIZE
+    return {
+        'tile_size': tile,
+        'width': difficulty * tile,
+        'height': difficulty * tile,
+        'tiles': [[(i % difficulty) * tile, (i // difficulty) * tile] for i in range(difficulty * difficulty)],
+    }
+
+
+def sprite_path(source_id, difficulty):
+    return Path(settings.PUZZLE_IMAGE_CACHE_DIR) / f'{source_id}-{difficulty}.jpg'
+
+
+def render(source, difficulty):
+    """Квадратный спрайт сложности из исходника (с учётом EXIF-поворота)."""
+    side = difficulty * settings.PUZZLE_IMAGE_TILE_SIZE
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image).convert('RGB')
+        return ImageOps.fit(image, (side, side), Image.LANCZOS)
+
+
+def sprite(source_id, difficulty):
+    """Путь к спрайту: из дискового кэша или построенный заново."""
+    if not SOURCE_ID.match(source_id):
+        raise ImageNotFound(source_id)
+    path = sprite_path(source_id, difficulty)
+    try:
+        if time.time() - path.stat().st_mtime > TOUCH_INTERVAL:
+            os.utime(path)
+        return path
+    except FileNotFoundError:
+        pass
+
+    source = sources().get(source_id)
+    if source is None:
+        raise ImageNotFound(source_id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f'{path.stem}.{uuid.uuid4().hex}.tmp')
+    render(source, difficulty).save(tmp, 'JPEG', quality=85, optimize=True, progressive=True)
+    os.replace(tmp, path)
+    evict()
+    return path
+
+
+def open_sprite(source_id, difficulty, attempts=3):
+    """Открытый файл спрайта.
+
+    Между sprite() и open() спрайт может удалить evict() другого воркера — тогда он
+    строится заново.
+    """
+    for _ in range(attempts - 1):
+        try:
+            return open(sprite(source_id, difficulty), 'rb')
+        except FileNotFoundError:
+            continue
+    return open(sprite(source_id, difficulty), 'rb')
+
+
+def evict(limit=None):
+    """Удаляет самые давно использованные спрайты, пока кэш больше лимита."""
+    limit = settings.PUZZLE_IMAGE_CACHE_BYTES if limit is None else limit
+    files = []
+    total = 0
+    with os.scandir(settings.PUZZLE_IMAGE_CACHE_DIR) as entries:
+        for entry in entries:
+            if not entry.name.endswith('.jpg'):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                # Файл удалил параллельный процесс
+                continue
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+    removed = 0
+    for _, size, path in sorted(files):
+        if total <= limit:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            continue
+        total -= size
+        removed += 1
+    return removed
@@ -0,0 +1,165 @@
+"""Замеры на запрос: число и время SQL-запросов, время сериализации, размер ответа.
+
+Включается настройкой REQUEST_INSTRUMENTATION. Для каждого запроса middleware:
+
+* добавляет заголовок ``Server-Timing`` (db, ser, app — видно в DevTools браузера);
+* пишет в логгер ``game.requests`` строку JSON с представлением и замерами;
+* ищет N+1: один и тот же запрос (с точностью до параметров) больше
+  N_PLUS_ONE_THRESHOLD раз — предупреждение с именем представления и текстом запроса.
+
+Запросы считаются обёрткой execute_wrapper на каждом соединении, а замеры текущего
+запроса лежат в ContextVar — поэтому учитываются и запросы асинхронных представлений,
+выполняемые в потоках sync_to_async.
+"""
+import json
+import logging
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger('game.requests')
+
+_current = ContextVar('request_stats', default=None)
+
+# Параметры в тексте запроса: списки плейсхолдеров, числа и строки
+_PLACEHOLDER_LIST = re.compile(r'\((?:\s*%s\s*,)+\s*%s\s*\)')
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+def shape(sql):
+    """Текст запроса без параметров: одинаковая форма — один и тот же запрос в цикле."""
+    return _LITERAL.sub('?', _PLACEHOLDER_LIST.sub('(...)', sql))
+
+
+class RequestStats:
+    __slots__ = ('started', 'queries', 'db_time', 'serializer_time', 'serializer_depth', 'statements')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+        self.statements = Counter()
+
+    def repeated(self, threshold):
+        """Формы запросов, выполненных больше ``threshold`` раз: [(форма, число), ...]."""
+        shapes = Counter()
+        for sql, count in self.statements.items():
+            shapes[shape(sql)] += count
+        return [(sql, count) for sql, count in shapes.most_common() if count > threshold]
+
+
+def record_query(execute, sql, params, many, context):
+    """execute_wrapper: время и текст запроса в замеры текущего HTTP-запроса."""
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.db_time += time.perf_counter() - started
+        stats.statements[sql] += 1
+
+
+def install(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@receiver(connection_created)
+def install_on_connect(sender, connection, **kwargs):
+    install(connection)
+
+
+class TimedRepresentationMixin:
+    """Время to_representation сериализатора (вложенные сериализаторы не считаются дважды)."""
+
+    def to_representation(self, instance):
+        stats = _current.get()
+        if stats is None:
+            return super().to_representation(instance)
+        stats.serializer_depth += 1
+        started = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            stats.serializer_depth -= 1
+            if not stats.serializer_depth:
+                stats.serializer_time += time.perf_counter() - started
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return None
+    return match.view_name or match._func_path
+
+
+class RequestInstrumentationMiddleware:
+    """Замеры запроса в Server-Timing и в лог ``game.requests`` (REQUEST_INSTRUMENTATION)."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = _current.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, stats)
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = _current.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, stats)
+
+    def finish(self, request, response, stats):
+        total = time.perf_counter() - stats.started
+        db_ms, serializer_ms, total_ms = stats.db_time * 1000, stats.serializer_time * 1000, total * 1000
+        response['Server-Timing'] = (
+            f'db;dur={db_ms:.1f};desc="{stats.queries} queries", '
+            f'ser;dur={serializer_ms:.1f}, app;dur={total_ms:.1f}'
+        )
+        size = None if response.streaming else len(response.content)
+        view = view_name(request)
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'view': view,
+            'status': response.status_code,
+            'duration_ms': round(total_ms, 2),
+            'db_queries': stats.queries,
+            'db_ms': round(db_ms, 2),
+            'serializer_ms': round(serializer_ms, 2),
+            'response_bytes': size,
+        }, ensure_ascii=False))
+
+        for sql, count in stats.repeated(settings.N_PLUS_ONE_THRESHOLD):
+            logger.warning(json.dumps({
+                'n_plus_one': True, 'view': view, 'path': request.path, 'count': count, 'sql': sql[:500],
+            }, ensure_ascii=False))
+        return response
@@ -0,0 +1,291 @@
+"""Таблица лидеров: выборка топа, кэш ответов и пересчёт рекордов из истории сессий."""
+from datetime import datetime, time, timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Max, OuterRef, Q, Subquery, Value
+from django.db.models.signals import post_delete, post_save
+from django.db.models.functions import Coalesce
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import metrics
+from .models import Friendship, GameSession, Leaderboard, LeaderboardEntry
+from .signals import session_completed
+
+TOP_SIZE = 50
+
+VERSION_KEY = 'leaderboard:version'
+
+
+def _version(key):
+    return cache.get_or_set(key, 1, None)
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 2, None)
+
+
+def friends_version_key(user_id):
+    return f'leaderboard:friends:{user_id}'
+
+
+def cache_key(difficulty, date_from, date_to, friends_of=None):
+    """Ключ ответа; версии в ключе делают старые ответы недостижимыми после изменений."""
+    scope = 'all'
+    if friends_of is not None:
+        scope = f'friends:{friends_of}:{_version(friends_version_key(friends_of))}'
+    return f'leaderboard:{_version(VERSION_KEY)}:{difficulty or "any"}:{date_from or ""}:{date_to or ""}:{scope}'
+
+
+def cached(key, compute):
+    data = cache.get(key)
+    metrics.LEADERBOARD_CACHE.inc(result='miss' if data is None else 'hit')
+    if data is None:
+        data = compute()
+        cache.set(key, data, settings.LEADERBOARD_CACHE_TIMEOUT)
+    return data
+
+
+async def acache_key(difficulty, date_from, date_to, friends_of=None):
+    """cache_key для асинхронных представлений."""
+    scope = 'all'
+    if friends_of is not None:
+        version = await cache.aget_or_set(friends_version_key(friends_of), 1, None)
+        scope = f'friends:{friends_of}:{version}'
+    version = await cache.aget_or_set(VERSION_KEY, 1, None)
+    return f'leaderboard:{version}:{difficulty or "any"}:{date_from or ""}:{date_to or ""}:{scope}'
+
+
+async def acached(key, compute):
+    """cached для асинхронных представлений; ``compute`` — корутинная функция."""
+    data = await cache.aget(key)
+    metrics.LEADERBOARD_CACHE.inc(result='miss' if data is None else 'hit')
+    if data is None:
+        data = await compute()
+        await cache.aset(key, data, settings.LEADERBOARD_CACHE_TIMEOUT)
+    return data
+
+
+def invalidate():
+    _bump(VERSION_KEY)
+
+
+# Увеличивается после пересчёта рекордов из истории: индексы рейтинга в памяти перечитываются
+REBUILD_KEY = 'leaderboard:rebuilt'
+
+
+def rebuilt():
+    invalidate()
+    _bump(REBUILD_KEY)
+
+
+@receiver(session_completed)
+def invalidate_on_completion(sender, session, **kwargs):
+    invalidate()
+
+
+@receiver(post_save, sender=Friendship)
+@receiver(post_delete, sender=Friendship)
+def invalidate_friends_scope(sender, instance, **kwargs):
+    _bump(friends_version_key(instance.from_user_id))
+
+
+def day_start(day):
+    """Начало дня в текущем часовом поясе (для диапазонных фильтров по updated_at)."""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+# Порядок рейтинга: очки по убыванию, раньше достигнутый рекорд выше, затем id игрока
+# (в каждом рейтинге у игрока одна строка, поэтому порядок полный)
+RANK_ORDER = ('-best_score', F('date_achieved').asc(nulls_last=True), 'user_id')
+REVERSE_ORDER = ('best_score', F('date_achieved').desc(nulls_first=True), '-user_id')
+
+
+def ranked(difficulty=None, user_ids=None):
+    """Строки рейтинга: рекорды по сложности или общие (из Leaderboard), только с очками."""
+    if difficulty:
+        queryset = LeaderboardEntry.objects.filter(difficulty=difficulty)
+    else:
+        queryset = Leaderboard.objects.all()
+    queryset = queryset.filter(best_score__gt=0)
+    if user_ids is not None:
+        queryset = queryset.filter(user_id__in=user_ids)
+    return queryset
+
+
+def top_rows(difficulty=None, user_ids=None, limit=TOP_SIZE):
+    return ranked(difficulty, user_ids).order_by(*RANK_ORDER).values('user__username', 'best_score')[:limit]
+
+
+def numbered(rows):
+    """Строки ответа с местами — общие для синхронного и асинхронного путей."""
+    return [dict(row, rank=rank) for rank, row in enumerate(rows, start=1)]
+
+
+def top_entries(difficulty=None, user_ids=None, limit=TOP_SIZE):
+    """Топ по таблицам рекордов: по сложности или общий (из Leaderboard)."""
+    return numbered(top_rows(difficulty, user_ids, limit))
+
+
+def period_rows(difficulty=None, date_from=None, date_to=None, user_ids=None, limit=TOP_SIZE):
+    """Топ за период: рекорд за период в таблицах не хранится — агрегируем историю сессий."""
+    queryset = GameSession.objects.filter(is_completed=True)
+    if difficulty:
+        queryset = queryset.filter(difficulty=difficulty)
+    # Границы дня вместо __date, чтобы работал индекс по updated_at
+    if date_from:
+        queryset = queryset.filter(updated_at__gte=day_start(date_from))
+    if date_to:
+        queryset = queryset.filter(updated_at__lt=day_start(date_to + timedelta(days=1)))
+    if user_ids is not None:
+        queryset = queryset.filter(user__in=user_ids)
+    return queryset.values('user__username').annotate(best_score=Max('score')).order_by('-best_score')[:limit]
+
+
+def results(difficulty=None, date_from=None, date_to=None, friends_of=None):
+    """Ответ таблицы лидеров (то, что кладётся в кэш): топ рейтинга или топ за период."""
+    from . import ranking  # ranking импортирует этот модуль
+
+    friend_ids = None
+    if friends_of is not None:
+        friend_ids = list(Friendship.objects.filter(from_user_id=friends_of).values_list('to_user_id', flat=True))
+
+    if not (date_from or date_to):
+        # Без диапазона дат топ берётся из индекса рейтинга в памяти или из таблиц рекордов
+        if friend_ids is None:
+            return ranking.top_entries(difficulty=difficulty)
+        return top_entries(difficulty=difficulty, user_ids=friend_ids)
+
+    return numbered(period_rows(difficulty, date_from, date_to, friend_ids))
+
+
+async def aresults(difficulty=None, date_from=None, date_to=None, friends_of=None):
+    """results для асинхронных представлений: те же запросы через async ORM (``async for``).
+
+    В потоке выполняется только чтение индекса рейтинга: его синхронизация читает кэш
+    блокирующими вызовами под блокировкой процесса.
+    """
+    from . import ranking
+
+    friend_ids = None
+    if friends_of is not None:
+        friend_ids = [pk async for pk in Friendship.objects.filter(from_user_id=friends_of)
+                      .values_list('to_user_id', flat=True)]
+
+    if not (date_from or date_to):
+        if friend_ids is None:
+            entries = await sync_to_async(ranking.indexed_top)(difficulty)
+            if entries is not None:
+                return entries
+        rows = top_rows(difficulty, friend_ids)
+    else:
+        rows = period_rows(difficulty, date_from, date_to, friend_ids)
+    return numbered([row async for row in rows])
+
+
+def _above(row):
+    """Условие «строка выше в рейтинге, чем row» в том же порядке, что и RANK_ORDER."""
+    score, achieved, pk = row['best_score'], row['date_achieved'], row['user_id']
+    if achieved is None:
+        tie = (Q(best_score=score, date_achieved__isnull=False)
+               | Q(best_score=score, date_achieved__isnull=True, user_id__lt=pk))
+    else:
+        tie = (Q(best_score=score, date_achieved__lt=achieved)
+               | Q(best_score=score, date_achieved=achieved, user_id__lt=pk))
+    return Q(best_score__gt=score) | tie
+
+
+def _below(row):
+    """Условие «строка ниже в рейтинге, чем row»."""
+    score, achieved, pk = row['best_score'], row['date_achieved'], row['user_id']
+    if achieved is None:
+        tie = Q(best_score=score, date_achieved__isnull=True, user_id__gt=pk)
+    else:
+        tie = (Q(best_score=score, date_achieved__gt=achieved) | Q(best_score=score, date_achieved__isnull=True)
+               | Q(best_score=score, date_achieved=achieved, user_id__gt=pk))
+    return Q(best_score__lt=score) | tie
+
+
+def position(user_id, difficulty=None, user_ids=None, size=5):
+    """Место игрока и окно из ``size`` строк рейтинга вокруг него.
+
+    Место — число строк выше по индексу рейтинга плюс один, соседи — по ``size - 1``
+    ближайших строк сверху и снизу; ни один запрос не читает весь рейтинг.
+    Возвращает None, если у игрока нет рекорда в этом рейтинге.
+    """
+    queryset = ranked(difficulty, user_ids)
+    fields = ('user_id', 'user__username', 'best_score', 'date_achieved')
+    me = queryset.filter(user_id=user_id).values(*fields).first()
+    if me is None:
+        return None
+    above = queryset.filter(_above(me))
+    rank = above.count() + 1
+
+    before = list(above.order_by(*REVERSE_ORDER).values(*fields)[:size - 1])[::-1]
+    after = list(queryset.filter(_below(me)).order_by(*RANK_ORDER).values(*fields)[:size - 1])
+    return window(before, me, after, rank, size)
+
+
+def window(before, me, after, rank, size):
+    """Ответ /leaderboard/me/: окно из ``size`` строк вокруг игрока, сдвинутое у краёв рейтинга."""
+    rows = before + [me] + after
+    start = min(max(len(before) - size // 2, 0), max(len(rows) - size, 0))
+    first_rank = rank - len(before) + start
+    entries = [
+        {'user__username': row['user__username'], 'best_score': row['best_score'], 'rank': first_rank + offset}
+        for offset, row in enumerate(rows[start:start + size])
+    ]
+    return {'rank': rank, 'best_score': me['best_score'], 'entries': entries}
+
+
+def rebuild(user_ids=None, batch_size=1000):
+    """Пересчитывает рекорды по сложностям и общий рекорд из завершённых сессий.
+
+    Возвращает количество созданных записей LeaderboardEntry.
+    """
+    sessions = GameSession.objects.filter(is_completed=True, score__gt=0)
+    entries = LeaderboardEntry.objects.all()
+    leaderboards = Leaderboard.objects.all()
+    if user_ids is not None:
+        sessions = sessions.filter(user_id__in=user_ids)
+        entries = entries.filter(user_id__in=user_ids)
+        leaderboards = leaderboards.filter(user_id__in=user_ids)
+
+    # Один упорядоченный проход: первая строка каждой пары (user, difficulty) — рекорд
+    best = sessions.order_by('user_id', 'difficulty', '-score', 'updated_at').values_list(
+        'user_id', 'difficulty', 'score', 'updated_at'
+    )
+
+    created = 0
+    with transaction.atomic():
+        entries.delete()
+        batch = []
+        last_key = None
+        for user_id, difficulty, score, updated_at in best.iterator(chunk_size=batch_size):
+            if (user_id, difficulty) == last_key:
+                continue
+            last_key = (user_id, difficulty)
+            batch.append(LeaderboardEntry(
+                user_id=user_id, difficulty=difficulty, best_score=score, date_achieved=updated_at
+            ))
+            if len(batch) >= batch_size:
+                LeaderboardEntry.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+        if batch:
+            LeaderboardEntry.objects.bulk_create(batch)
+            created += len(batch)
+
+        user_best = LeaderboardEntry.objects.filter(user_id=OuterRef('user_id')).order_by('-best_score', 'date_achieved')
+        leaderboards.update(
+            best_score=Coalesce(Subquery(user_best.values('best_score')[:1]), Value(0)),
+            date_achieved=Subquery(user_best.values('date_achieved')[:1]),
+        )
+        transaction.on_commit(rebuilt)
+    return created
@@ -0,0 +1,40 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from game import achievements
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает счётчики игроков по истории и выдаёт заработанные достижения (пачками пользователей)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        achievements.sync_definitions()
+        ids = User.objects.order_by('pk').values_list('pk', flat=True)
+
+        users = awarded = 0
+        chunk = []
+        for pk in ids.iterator(chunk_size=options['chunk_size']):
+            chunk.append(pk)
+            if len(chunk) >= options['chunk_size']:
+                awarded += self.process(chunk)
+                users += len(chunk)
+                chunk = []
+        if chunk:
+            awarded += self.process(chunk)
+            users += len(chunk)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Пользователей: {users}, пар «игрок — достижение» проверено: {awarded} "
+            f"({time.monotonic() - started:.1f} с)"
+        ))
+
+    def process(self, chunk):
+        with transaction.atomic():
+            return achievements.backfill(chunk)
@@ -0,0 +1,184 @@
+import asyncio
+import resource
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+# Синхронный путь и его асинхронная версия (game.async_views)
+ENDPOINTS = {
+    'leaderboard': ('/api/leaderboard/', '/api/async/leaderboard/'),
+    'profile': ('/api/profile/{username}/', '/api/async/profile/{username}/'),
+    'achievements': ('/api/achievements/', '/api/async/achievements/'),
+    'friends': ('/api/friends/', '/api/async/friends/'),
+}
+NEEDS_TOKEN = {'achievements', 'friends'}
+
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return 0.0
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+async def fetch(reader, writer, request):
+    """Один запрос HTTP/1.1 по открытому соединению: (статус, закрыл ли сервер соединение)."""
+    writer.write(request)
+    await writer.drain()
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("соединение закрыто сервером")
+    status = int(status_line.split()[1])
+    length, chunked, close = 0, False, False
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        name, value = name.strip().lower(), value.strip().lower()
+        if name == 'content-length':
+            length = int(value)
+        elif name == 'transfer-encoding':
+            chunked = 'chunked' in value
+        elif name == 'connection':
+            close = value == 'close'
+    if chunked:
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.readexactly(length)
+    return status, close
+
+
+async def worker(host, port, request, deadline, timeout, stats):
+    """Соединение с keep-alive: запросы подряд до дедлайна, при обрыве — переподключение.
+
+    Время ответа пишется для любого статуса. Запрос без ответа за ``timeout`` секунд
+    считается таймаутом и попадает в перцентили со временем ``timeout``: иначе самые
+    медленные запросы выпадали бы из p99.
+    """
+    writer = None
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            status, close = await asyncio.wait_for(fetch(reader, writer, request), timeout)
+            stats['latencies'].append(time.perf_counter() - started)
+            stats['responses'] += 1
+            if not 200 <= status < 300:
+                stats['errors'] += 1
+            if close:
+                writer.close()
+                writer = None
+        except asyncio.TimeoutError:
+            stats['latencies'].append(timeout)
+            stats['timeouts'] += 1
+            writer.close()
+            writer = None
+        except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError, IndexError):
+            stats['errors'] += 1
+            if writer is not None:
+                writer.close()
+                writer = None
+            await asyncio.sleep(0.05)
+    if writer is not None:
+        writer.close()
+
+
+async def load(url, connections, duration, token=None, timeout=10):
+    parts = urlsplit(url)
+    if parts.scheme != 'http':
+        raise CommandError(f"Поддерживается только http:// ({url})")
+    target = parts.path + (f'?{parts.query}' if parts.query else '')
+    headers = [f'GET {target} HTTP/1.1', f'Host: {parts.netloc}', 'Accept: application/json']
+    if token:
+        headers.append(f'Authorization: Bearer {token}')
+    request = ('\r\n'.join(headers) + '\r\n\r\n').encode()
+
+    stats = {'latencies': [], 'responses': 0, 'errors': 0, 'timeouts': 0}
+    started = time.monotonic()
+    await asyncio.gather(*(
+        worker(parts.hostname, parts.port or 80, request, started + duration, timeout, stats)
+        for _ in range(connections)
+    ))
+    elapsed = time.monotonic() - started
+    latencies = sorted(stats['latencies'])
+    return {
+        'rps': stats['responses'] / elapsed,
+        'p50': percentile(latencies, 0.50) * 1000,
+        'p95': percentile(latencies, 0.95) * 1000,
+        'p99': percentile(latencies, 0.99) * 1000,
+        'ok': stats['responses'] - stats['errors'],
+        'errors': stats['errors'],
+        'timeouts': stats['timeouts'],
+    }
+
+
+class Command(BaseCommand):
+    help = ("Нагрузка на синхронные эндпоинты (WSGI) и их асинхронные версии (ASGI): "
+            "запросы в секунду и p50/p95/p99 при N одновременных соединениях")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wsgi', default='http://localhost:8000',
+                            help="Адрес WSGI-сервера (синхронные представления)")
+        parser.add_argument('--asgi', default='http://localhost:8001',
+                            help="Адрес ASGI-сервера (асинхронные представления /api/async/...)")
+        parser.add_argument('--runserver',
+                            help="Адрес manage.py runserver: синхронные пути замеряются и на нём (для сравнения)")
+        parser.add_argument('--endpoints', default='leaderboard',
+                            help=f"Через запятую: {', '.join(ENDPOINTS)}")
+        parser.add_argument('--query', default='', help="Строка запроса, например difficulty=4")
+        parser.add_argument('--username', help="Игрок для profile")
+        parser.add_argument('--token', help="JWT access-токен для achievements и friends")
+        parser.add_argument('--connections', type=int, default=1000, help="Одновременных соединений")
+        parser.add_argument('--duration', type=float, default=30, help="Длительность замера, секунд")
+        parser.add_argument('--warmup', type=float, default=5, help="Прогрев перед замером, секунд")
+        parser.add_argument('--timeout', type=float, default=10,
+                            help="Ответ дольше этого (секунд) считается таймаутом")
+
+    def handle(self, *args, **options):
+        names = [name.strip() for name in options['endpoints'].split(',') if name.strip()]
+        unknown = set(names) - set(ENDPOINTS)
+        if unknown:
+            raise CommandError(f"Неизвестные эндпоинты: {', '.join(sorted(unknown))}")
+        if 'profile' in names and not options['username']:
+            raise CommandError("Для profile нужен --username")
+        if set(names) & NEEDS_TOKEN and not options['token']:
+            raise CommandError("Для achievements и friends нужен --token")
+        self.raise_file_limit(options['connections'])
+
+        self.stdout.write(
+            f"{'эндпоинт':<14}{'сервер':<11}{'запр/с':>10}{'p50, мс':>10}{'p95, мс':>10}{'p99, мс':>10}"
+            f"{'ошибки':>8}{'таймауты':>10}"
+        )
+        for name in names:
+            sync_path, async_path = ENDPOINTS[name]
+            runs = [('wsgi', sync_path), ('asgi', async_path)]
+            if options['runserver']:
+                runs.insert(0, ('runserver', sync_path))
+            for server, path in runs:
+                url = options[server].rstrip('/') + path.format(username=options['username'])
+                if options['query']:
+                    url += '?' + options['query']
+                token = options['token'] if name in NEEDS_TOKEN else None
+                if options['warmup'] > 0:
+                    asyncio.run(load(url, options['connections'], options['warmup'], token, options['timeout']))
+                result = asyncio.run(load(url, options['connections'], options['duration'], token, options['timeout']))
+                self.stdout.write(
+                    f"{name:<14}{server:<11}{result['rps']:>10.1f}{result['p50']:>10.1f}{result['p95']:>10.1f}"
+                    f"{result['p99']:>10.1f}{result['errors']:>8}{result['timeouts']:>10}"
+                )
+
+    def raise_file_limit(self, connections):
+        """Каждому соединению нужен дескриптор: поднимаем мягкий лимит до жёсткого."""
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        needed = connections + 100
+        if soft < needed:
+            target = needed if hard == resource.RLIM_INFINITY else min(needed, hard)
+            resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+            if target < needed:
+                self.stderr.write(f"Лимит открытых файлов {target} меньше нужного ({needed}): ulimit -n")
@@ -0,0 +1,48 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from game import thumbnails
+from game.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = "Строит миниатюры для уже загруженных аватаров (в пуле потоков)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Перестроить и существующие миниатюры")
+        parser.add_argument('--workers', type=int, default=4)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        profiles = UserProfile.objects.exclude(avatar='').exclude(avatar__isnull=True)
+        if not options['all']:
+            profiles = profiles.filter(avatar_thumbs={})
+        ids = profiles.order_by('pk').values_list('pk', flat=True).iterator()
+
+        if options['workers'] <= 1:
+            results = [self.build(pk) for pk in ids]
+        else:
+            # Pillow отпускает GIL при декодировании и сжатии, поэтому хватает потоков
+            with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+                results = list(pool.map(self.build_in_thread, ids))
+
+        built = sum(1 for result in results if result)
+        self.stdout.write(self.style.SUCCESS(
+            f"Миниатюры построены: {built}, ошибок: {len(results) - built} ({time.monotonic() - started:.1f} с)"
+        ))
+
+    def build(self, pk):
+        try:
+            return thumbnails.process(pk) is not None
+        except Exception as exc:
+            self.stderr.write(f"  профиль {pk}: {exc}")
+            return False
+
+    def build_in_thread(self, pk):
+        try:
+            return self.build(pk)
+        finally:
+            connection.close()
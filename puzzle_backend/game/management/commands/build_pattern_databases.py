@@ -0,0 +1,64 @@
+import os
+import time
+from multiprocessing import Pool
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from game import patterns
+
+
+def build_one(job):
+    """Строит и записывает одну базу; выполняется в отдельном процессе."""
+    size, tiles, directory = job
+    started = time.monotonic()
+    table = patterns.build_table(size, tiles)
+    written = patterns.write(Path(directory) / patterns.file_name(size, tiles), size, tiles, table)
+    return tiles, written, time.monotonic() - started
+
+
+class Command(BaseCommand):
+    help = "Строит аддитивные базы шаблонов для решателя (по процессу на группу плиток)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, action='append', dest='sizes', choices=(3, 4, 5),
+                            help="Размер доски (можно несколько раз); по умолчанию 4 и 5")
+        parser.add_argument('--partition',
+                            help="Размеры групп через дефис, например 6-6-3 (только с одним --size)")
+        parser.add_argument('--output', help="Каталог для файлов; по умолчанию PATTERN_DB_DIR")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+
+    def handle(self, *args, **options):
+        sizes = options['sizes'] or [4, 5]
+        if options['partition'] and len(sizes) != 1:
+            raise CommandError("--partition задаётся вместе с одним --size")
+        directory = Path(options['output'] or settings.PATTERN_DB_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        jobs = []
+        for size in sizes:
+            counts = patterns.DEFAULT_PARTITIONS[size]
+            if options['partition']:
+                try:
+                    counts = tuple(int(part) for part in options['partition'].split('-'))
+                except ValueError:
+                    raise CommandError("Разбиение задаётся как 6-6-3")
+            try:
+                groups = patterns.partition_groups(size, counts)
+            except ValueError as exc:
+                raise CommandError(str(exc))
+            # Старые файлы другого разбиения пересекались бы с новыми
+            for stale in directory.glob(f'{size}x{size}-*.pdb'):
+                stale.unlink()
+            jobs += [(size, tiles, str(directory)) for tiles in groups]
+
+        started = time.monotonic()
+        total = 0
+        with Pool(processes=max(1, min(options['workers'], len(jobs)))) as pool:
+            for tiles, written, seconds in pool.imap_unordered(build_one, jobs):
+                total += written
+                self.stdout.write(f"  плитки {list(tiles)}: {written / 2 ** 20:.1f} МБ, {seconds:.1f} с")
+        self.stdout.write(self.style.SUCCESS(
+            f"Баз: {len(jobs)}, {total / 2 ** 20:.1f} МБ в {directory} ({time.monotonic() - started:.1f} с)"
+        ))
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from game import ranking
+
+
+class Command(BaseCommand):
+    help = "Сверяет индекс рейтинга в памяти с SQL (размер, топ и места случайной выборки игроков)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--difficulty', type=int, choices=(3, 4, 5), action='append', dest='difficulties',
+                            help="Сложность (можно указать несколько раз); по умолчанию — все и общий рейтинг")
+        parser.add_argument('--sample', type=int, default=100, help="Сколько игроков проверить в каждом рейтинге")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        problems = []
+        for difficulty in options['difficulties'] or ranking.SCOPES:
+            problems += ranking.check(difficulty, sample=options['sample'])
+        for problem in problems:
+            self.stderr.write(f"  {problem}")
+        if problems:
+            raise CommandError(f"Расхождений: {len(problems)}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Индекс рейтинга согласован с БД ({time.monotonic() - started:.1f} с)"
+        ))
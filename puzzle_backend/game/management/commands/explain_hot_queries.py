@@ -0,0 +1,141 @@
+import random
+import re
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.utils import timezone
+
+from game import leaderboard
+from game.models import Challenge, Friendship, GameSession, Leaderboard, LeaderboardEntry
+from game.pagination import CursorPagination
+from game.views import ChallengeViewSet, FriendListCreateView, GameSessionViewSet
+
+SESSIONS_PER_USER = 5
+DATE_BUCKETS = 30
+
+
+class Rollback(Exception):
+    """Откатывает засеянные данные после проверки."""
+
+
+def first_page(view_class, user):
+    """Первая страница списка: queryset представления в порядке его курсорной пагинации."""
+    request = RequestFactory().get('/')
+    request.user = user
+    view = view_class()
+    view.setup(request)
+    queryset = view.get_queryset()
+    ordering = CursorPagination().get_ordering(request, queryset, view)
+    return queryset.order_by(*ordering)[:settings.REST_FRAMEWORK['PAGE_SIZE'] + 1]
+
+
+def hot_queries(user):
+    """Запросы горячих эндпоинтов — через те же функции, что и представления."""
+    today = timezone.now().date()
+    return [
+        ('sessions: незавершённые игры', first_page(GameSessionViewSet, user)),
+        ('leaderboard: топ по сложности', leaderboard.top_rows(difficulty=4)),
+        ('leaderboard: общий топ', leaderboard.top_rows()),
+        ('leaderboard: за период', leaderboard.period_rows(4, today, today)),
+        ('challenges: входящие', first_page(ChallengeViewSet, user)),
+        ('friends: список', first_page(FriendListCreateView, user)),
+        ('users: username__iexact',
+         User.objects.filter(username__iexact=user.username.upper())),
+    ]
+
+
+def sequential_scans(plan, vendor):
+    """Строки плана с полным проходом по таблице."""
+    lines = plan.splitlines()
+    if vendor == 'postgresql':
+        return [line.strip() for line in lines if 'Seq Scan' in line]
+    if vendor == 'sqlite':
+        return [line.strip() for line in lines if re.search(r'\bSCAN\b', line) and 'USING' not in line]
+    return []
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN для горячих запросов на засеянной БД; ошибка, если есть последовательное сканирование"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0,
+                            help="Сколько синтетических пользователей засеять перед проверкой")
+        parser.add_argument('--keep', action='store_true', help="Не откатывать засеянные данные")
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        vendor = connection.vendor
+        failures = []
+        try:
+            with transaction.atomic():
+                if options['seed']:
+                    self.seed(options['seed'])
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE')
+                user = User.objects.order_by('?').first()
+                if user is None:
+                    raise CommandError("БД пуста — используйте --seed N")
+                for name, queryset in hot_queries(user):
+                    failures += self.explain(name, queryset, vendor)
+                if not options['keep']:
+                    raise Rollback
+        except Rollback:
+            pass
+
+        if failures:
+            raise CommandError("Последовательное сканирование:\n" + "\n".join(failures))
+        self.stdout.write(self.style.SUCCESS("Все горячие запросы используют индексы"))
+
+    def explain(self, name, queryset, vendor):
+        if name.startswith('users:') and vendor != 'postgresql':
+            # Функциональный индекс по UPPER(username) создаётся только в PostgreSQL
+            self.stdout.write(f"  {name}: пропущено ({vendor})")
+            return []
+        plan = queryset.explain()
+        scans = sequential_scans(plan, vendor)
+        self.stdout.write(f"  {name}: {'SEQ SCAN' if scans else 'OK'}")
+        if self.verbosity > 1:
+            self.stdout.write(plan)
+        return [f"{name}: {scan}" for scan in scans]
+
+    def seed(self, count):
+        prefix = f'explain_{uuid.uuid4().hex[:8]}'
+        users = User.objects.bulk_create(
+            [User(username=f'{prefix}_{i}', password='!') for i in range(count)], batch_size=1000
+        )
+        rng = random.Random(count)
+        sessions, entries, leaderboards, challenges, friendships = [], [], [], [], []
+        for i, user in enumerate(users):
+            best = {}
+            for _ in range(SESSIONS_PER_USER):
+                difficulty, score = rng.choice((3, 4, 5)), rng.randint(1, 9999)
+                sessions.append(GameSession(user=user, difficulty=difficulty, game_state={},
+                                            score=score, is_completed=True))
+                best[difficulty] = max(best.get(difficulty, 0), score)
+            sessions.append(GameSession(user=user, difficulty=3, game_state={}))
+            entries += [LeaderboardEntry(user=user, difficulty=d, best_score=s) for d, s in best.items()]
+            leaderboards.append(Leaderboard(user=user, best_score=max(best.values())))
+            for step in (1, 2, 3):
+                other = users[(i + step) % count]
+                if other != user:
+                    friendships.append(Friendship(from_user=user, to_user=other))
+                    challenges.append(Challenge(from_user=other, to_user=user, difficulty=3, target_score=5000))
+        GameSession.objects.bulk_create(sessions, batch_size=1000)
+        LeaderboardEntry.objects.bulk_create(entries, batch_size=1000)
+        Leaderboard.objects.bulk_create(leaderboards, batch_size=1000, ignore_conflicts=True)
+        Friendship.objects.bulk_create(friendships, batch_size=1000, ignore_conflicts=True)
+        Challenge.objects.bulk_create(challenges, batch_size=1000)
+
+        # Разносим даты по году, чтобы диапазонные запросы были избирательными
+        now = timezone.now()
+        user_ids = [user.pk for user in users]
+        for bucket in range(DATE_BUCKETS):
+            GameSession.objects.filter(user_id__in=user_ids[bucket::DATE_BUCKETS]).update(
+                updated_at=now - timedelta(days=bucket * 365 // DATE_BUCKETS)
+            )
+        self.stdout.write(f"Засеяно пользователей: {count}, сессий: {len(sessions)}")
@@ -0,0 +1,70 @@
+import io
+import json
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from PIL import Image, ImageOps
+
+from game import images
+
+CAT_API_URL = 'https://api.thecatapi.com/v1/images/search'
+TIMEOUT = 15
+
+
+def download(url):
+    request = Request(url, headers={'User-Agent': 'puzzle-backend'})
+    with urlopen(request, timeout=TIMEOUT) as response:
+        return response.read()
+
+
+def fetch_one(api_url, directory):
+    """Скачивает одну картинку (не GIF) и сохраняет квадратный JPEG в пул; возвращает id или None."""
+    try:
+        url = json.loads(download(api_url))[0]['url']
+        if url.lower().endswith('.gif'):
+            return None
+        with Image.open(io.BytesIO(download(url))) as image:
+            image = ImageOps.exif_transpose(image).convert('RGB')
+            side = min(image.size)
+            if side < 3 * settings.PUZZLE_IMAGE_TILE_SIZE:
+                return None
+            # Крупнейший спрайт — 5x5; больше хранить незачем
+            target = min(side, 5 * settings.PUZZLE_IMAGE_TILE_SIZE)
+            image = ImageOps.fit(image, (target, target), Image.LANCZOS)
+            source_id = uuid.uuid4().hex[:12]
+            image.save(Path(directory) / f'{source_id}.jpg', 'JPEG', quality=90)
+        return source_id
+    except (OSError, ValueError, KeyError, IndexError):
+        return None
+
+
+class Command(BaseCommand):
+    help = "Пополняет локальный пул картинок пазла и заранее строит спрайты"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=50, help="Сколько картинок скачать")
+        parser.add_argument('--api-url', default=CAT_API_URL)
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--no-prerender', action='store_true', help="Не строить спрайты заранее")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        directory = Path(settings.PUZZLE_IMAGE_POOL_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            results = pool.map(lambda _: fetch_one(options['api_url'], directory), range(options['count']))
+            added = [source_id for source_id in results if source_id]
+            if not options['no_prerender']:
+                jobs = [(source_id, difficulty) for source_id in added for difficulty in (3, 4, 5)]
+                list(pool.map(lambda job: images.sprite(*job), jobs))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Добавлено картинок: {len(added)} из {options['count']}, в пуле: {len(images.sources())} "
+            f"({time.monotonic() - started:.1f} с)"
+        ))
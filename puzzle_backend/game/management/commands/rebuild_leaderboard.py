@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from game import leaderboard
+
+
+class Command(BaseCommand):
+    help = "Пересобирает рекорды по сложностям (LeaderboardEntry) и общий рекорд из истории сессий"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids',
+                            help="ID пользователя (можно указать несколько раз); по умолчанию — все")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        created = leaderboard.rebuild(user_ids=options['user_ids'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Записей рекордов: {created} ({time.monotonic() - started:.1f} с)"
+        ))
@@ -0,0 +1,66 @@
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+
+from game import verification
+from game.models import GameSession
+
+
+def chunks(queryset, size):
+    """Пачки простых кортежей из потокового чтения завершённых сессий."""
+    rows = queryset.order_by('pk').values_list('pk', 'game_state', 'score', 'time_played')
+    batch = []
+    for pk, game_state, score, time_played in rows.iterator(chunk_size=size):
+        batch.append((pk, game_state, score, time_played.total_seconds() if time_played else None))
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Command(BaseCommand):
+    help = "Проверяет завершённые игры повтором лога ходов и помечает несовпадения"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Перепроверить и уже проверенные сессии")
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        queryset = GameSession.objects.filter(is_completed=True, score__gt=0)
+        if not options['all']:
+            queryset = queryset.filter(replay_status=verification.PENDING)
+
+        self.totals = {}
+        batches = chunks(queryset, options['chunk_size'])
+        if options['workers'] <= 1:
+            for batch in batches:
+                self.save(verification.verify_chunk(batch))
+        else:
+            # Ограниченное окно задач: чтение из БД не убегает вперёд пула
+            with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+                running = set()
+                for batch in batches:
+                    running.add(pool.submit(verification.verify_chunk, batch))
+                    if len(running) >= options['workers'] * 2:
+                        done, running = wait(running, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            self.save(future.result())
+                for future in running:
+                    self.save(future.result())
+
+        checked = sum(self.totals.values())
+        summary = ", ".join(f"{status}: {count}" for status, count in sorted(self.totals.items()))
+        self.stdout.write(self.style.SUCCESS(
+            f"Проверено сессий: {checked} ({summary or 'нет'}) за {time.monotonic() - started:.1f} с"
+        ))
+
+    def save(self, results):
+        sessions = [GameSession(pk=pk, replay_status=status, replay_score=score) for pk, status, score in results]
+        GameSession.objects.bulk_update(sessions, ['replay_status', 'replay_score'])
+        for _, status, _ in results:
+            self.totals[status] = self.totals.get(status, 0) + 1
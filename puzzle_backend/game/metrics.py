@@ -0,0 +1,439 @@
+"""Метрики в текстовом формате Prometheus: /metrics.
+
+Счётчики и гистограммы пишутся в хранилище процесса:
+
+* без METRICS_DIR — словарь в памяти (runserver, тесты, один процесс);
+* с METRICS_DIR — файл ``metrics-<pid>.db`` на процесс, отображённый в память (mmap).
+  Процесс пишет только в свой файл, поэтому межпроцессных блокировок нет: обновление —
+  поиск смещения в словаре и запись 8 байт под блокировкой своего процесса. /metrics
+  читает и суммирует файлы всех воркеров.
+
+Файл завершившегося воркера мастер gunicorn вливает в ``metrics-archive.db`` (child_exit),
+чтобы счётчики не откатывались при перезапуске воркеров; ряды с меткой pid отбрасываются.
+
+Гистограммы хранят корзины без накопления (одна запись на наблюдение), накопленные
+значения ``le`` считаются при выдаче.
+"""
+import bisect
+import ipaddress
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.http import HttpResponse, HttpResponseForbidden
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_safe
+
+from .instrumentation import view_name
+from .signals import session_completed
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+ARCHIVE_NAME = 'metrics-archive.db'
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Файл: заголовок (занятые байты), затем записи «длина ключа, ключ JSON, выравнивание, float64»
+_HEADER = struct.Struct('<I4x')
+_KEYLEN = struct.Struct('<I')
+_VALUE = struct.Struct('<d')
+_INITIAL_SIZE = 64 * 1024
+
+
+def _aligned(offset):
+    return (offset + 7) & ~7
+
+
+def _encode(key):
+    sample, labels = key
+    return json.dumps([sample, dict(labels)], ensure_ascii=False, sort_keys=True).encode()
+
+
+def _decode(raw):
+    sample, labels = json.loads(raw)
+    return sample, tuple(sorted(labels.items()))
+
+
+def _entries(buffer, used):
+    """(ключ, смещение значения) записей файла."""
+    position = _HEADER.size
+    while position < used:
+        length = _KEYLEN.unpack_from(buffer, position)[0]
+        start = position + _KEYLEN.size
+        value_at = _aligned(start + length)
+        yield _decode(bytes(buffer[start:start + length])), value_at
+        position = value_at + _VALUE.size
+
+
+def read_file(path):
+    """Пары (ключ, значение) файла метрик.
+
+    Запись становится видна через заголовок только после того, как дописана целиком,
+    поэтому файл можно читать, пока процесс-владелец в него пишет.
+    """
+    data = Path(path).read_bytes()
+    if len(data) < _HEADER.size:
+        return []
+    used = min(_HEADER.unpack_from(data)[0], len(data))
+    return [(key, _VALUE.unpack_from(data, offset)[0]) for key, offset in _entries(data, used)]
+
+
+class MmapFile:
+    """Файл метрик одного процесса: значения обновляются на месте, новые ключи дописываются в конец."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._file = os.fdopen(os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644), 'r+b')
+        size = os.fstat(self._file.fileno()).st_size
+        if size < _INITIAL_SIZE:
+            self._file.truncate(_INITIAL_SIZE)
+            size = _INITIAL_SIZE
+        self._map = mmap.mmap(self._file.fileno(), size)
+        self._used = _HEADER.unpack_from(self._map)[0] or _HEADER.size
+        self._offsets = {key: offset for key, offset in _entries(self._map, self._used)}
+
+    def inc(self, key, amount):
+        with self._lock:
+            offset = self._offsets.get(key)
+            if offset is None:
+                offset = self._append(key)
+            _VALUE.pack_into(self._map, offset, _VALUE.unpack_from(self._map, offset)[0] + amount)
+
+    def _append(self, key):
+        raw = _encode(key)
+        start = self._used
+        value_at = _aligned(start + _KEYLEN.size + len(raw))
+        end = value_at + _VALUE.size
+        if end > len(self._map):
+            self._grow(end)
+        _KEYLEN.pack_into(self._map, start, len(raw))
+        self._map[start + _KEYLEN.size:start + _KEYLEN.size + len(raw)] = raw
+        _VALUE.pack_into(self._map, value_at, 0.0)
+        # Заголовок — последним: читатели не увидят недописанную запись
+        _HEADER.pack_into(self._map, 0, end)
+        self._used = end
+        self._offsets[key] = value_at
+        return value_at
+
+    def _grow(self, needed):
+        size = len(self._map)
+        while size < needed:
+            size *= 2
+        self._map.close()
+        self._file.truncate(size)
+        self._map = mmap.mmap(self._file.fileno(), size)
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+class LocalStore:
+    """Значения в памяти процесса."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, key, amount):
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def values(self):
+        with self._lock:
+            return dict(self._values)
+
+
+class DirectoryStore:
+    """Файлы воркеров в общем каталоге: пишет процесс в свой файл, читаются все."""
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self._lock = threading.Lock()
+        self._file = None
+
+    def _own(self):
+        with self._lock:
+            if self._file is None:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                self._file = MmapFile(self.directory / f'metrics-{os.getpid()}.db')
+            return self._file
+
+    def inc(self, key, amount):
+        (self._file or self._own()).inc(key, amount)
+
+    def values(self):
+        totals = {}
+        for path in sorted(self.directory.glob('metrics-*.db')):
+            try:
+                entries = read_file(path)
+            except FileNotFoundError:
+                # Воркер завершился, его файл уже в архиве
+                continue
+            for key, value in entries:
+                totals[key] = totals.get(key, 0.0) + value
+        return totals
+
+
+@lru_cache(maxsize=None)
+def store():
+    if settings.METRICS_DIR:
+        return DirectoryStore(settings.METRICS_DIR)
+    return LocalStore()
+
+
+_pid = str(os.getpid())
+
+
+def _after_fork():
+    # Воркер gunicorn пишет в свой файл, а не в файл мастера
+    global _pid
+    _pid = str(os.getpid())
+    store.cache_clear()
+
+
+os.register_at_fork(after_in_child=_after_fork)
+
+
+def reset_dir(directory):
+    """Мастер gunicorn при старте: файлы прошлого запуска удаляются."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    for path in directory.glob('metrics-*.db'):
+        path.unlink()
+
+
+def archive(directory, pid):
+    """Мастер gunicorn после выхода воркера: его счётчики — в архив, файл удаляется."""
+    path = Path(directory) / f'metrics-{pid}.db'
+    if not path.exists():
+        return
+    target = MmapFile(Path(directory) / ARCHIVE_NAME)
+    try:
+        for key, value in read_file(path):
+            if 'pid' not in dict(key[1]):
+                target.inc(key, value)
+    finally:
+        target.close()
+    path.unlink()
+
+
+def _number(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _line(sample, labels, value):
+    if labels:
+        pairs = ','.join(f'{name}="{_escape(labels[name])}"' for name in sorted(labels))
+        return f'{sample}{{{pairs}}} {_number(value)}'
+    return f'{sample} {_number(value)}'
+
+
+_registry = {}
+
+
+class Metric:
+    type = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(sorted(labelnames))
+        _registry[name] = self
+
+    def _labels(self, labels):
+        return tuple((name, str(labels[name])) for name in self.labelnames)
+
+    def samples(self, values):
+        for labels, value in sorted(values.get(self.name, ()), key=lambda item: sorted(item[0].items())):
+            yield _line(self.name, labels, value)
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        store().inc((self.name, self._labels(labels)), amount)
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._bounds = tuple(_number(bound) for bound in self.buckets) + ('+Inf',)
+
+    def observe(self, value, **labels):
+        labels = self._labels(labels)
+        bound = self._bounds[bisect.bisect_left(self.buckets, value)]
+        target = store()
+        target.inc((f'{self.name}_bucket', tuple(sorted(labels + (('le', bound),)))), 1)
+        target.inc((f'{self.name}_sum', labels), value)
+        target.inc((f'{self.name}_count', labels), 1)
+
+    def samples(self, values):
+        buckets = {}
+        for labels, value in values.get(f'{self.name}_bucket', ()):
+            labels = dict(labels)
+            bound = labels.pop('le')
+            buckets.setdefault(tuple(sorted(labels.items())), {})[bound] = value
+        sums = {tuple(sorted(labels.items())): value for labels, value in values.get(f'{self.name}_sum', ())}
+        for key in sorted(set(buckets) | set(sums)):
+            labels = dict(key)
+            cumulative = 0
+            for bound in self._bounds:
+                cumulative += buckets.get(key, {}).get(bound, 0)
+                yield _line(f'{self.name}_bucket', {**labels, 'le': bound}, cumulative)
+            yield _line(f'{self.name}_sum', labels, sums.get(key, 0))
+            yield _line(f'{self.name}_count', labels, cumulative)
+
+
+class HitRatio(Metric):
+    """Доля попаданий по счётчику с меткой result=hit|miss (за всё время работы)."""
+    type = 'gauge'
+
+    def __init__(self, name, documentation, counter):
+        super().__init__(name, documentation)
+        self.counter = counter
+
+    def samples(self, values):
+        counts = {'hit': 0, 'miss': 0}
+        for labels, value in values.get(self.counter.name, ()):
+            counts[labels['result']] = counts.get(labels['result'], 0) + value
+        total = counts['hit'] + counts['miss']
+        if total:
+            yield _line(self.name, {}, counts['hit'] / total)
+
+
+REQUESTS = Counter('puzzle_http_requests_total', "HTTP-запросы по представлению, методу и статусу",
+                   ('view', 'method', 'status'))
+REQUEST_DURATION = Histogram('puzzle_http_request_duration_seconds', "Время обработки запроса, секунды", ('view',))
+DB_QUERIES = Counter('puzzle_db_queries_total', "SQL-запросы процесса", ('pid',))
+DB_QUERY_SECONDS = Counter('puzzle_db_query_seconds_total', "Время SQL-запросов процесса, секунды", ('pid',))
+AUTOSAVES = Counter('puzzle_autosaves_total', "Пакеты ходов автосохранения; snapshot — записан ли снимок в БД",
+                    ('snapshot',))
+SESSIONS_COMPLETED = Counter('puzzle_sessions_completed_total', "Завершённые игры по сложности", ('difficulty',))
+LEADERBOARD_CACHE = Counter('puzzle_leaderboard_cache_requests_total', "Обращения к кэшу таблицы лидеров",
+                            ('result',))
+LEADERBOARD_CACHE_HIT_RATIO = HitRatio('puzzle_leaderboard_cache_hit_ratio',
+                                       "Доля попаданий в кэш таблицы лидеров", LEADERBOARD_CACHE)
+CHALLENGES_CREATED = Counter('puzzle_challenges_created_total', "Созданные вызовы")
+
+
+def render(values=None):
+    """Все метрики в текстовом формате Prometheus."""
+    if values is None:
+        values = store().values()
+    by_sample = {}
+    for (sample, labels), value in values.items():
+        by_sample.setdefault(sample, []).append((dict(labels), value))
+    lines = []
+    for metric in _registry.values():
+        lines.append(f'# HELP {metric.name} {_escape(metric.documentation)}')
+        lines.append(f'# TYPE {metric.name} {metric.type}')
+        lines.extend(metric.samples(by_sample))
+    return '\n'.join(lines) + '\n'
+
+
+def count_query(execute, sql, params, many, context):
+    """execute_wrapper: число и время SQL-запросов процесса."""
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        DB_QUERIES.inc(pid=_pid)
+        DB_QUERY_SECONDS.inc(time.perf_counter() - started, pid=_pid)
+
+
+def install(connection):
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_query)
+
+
+@receiver(connection_created)
+def install_on_connect(sender, connection, **kwargs):
+    install(connection)
+
+
+@receiver(session_completed)
+def count_completed(sender, session, newly_completed=True, **kwargs):
+    if newly_completed:
+        SESSIONS_COMPLETED.inc(difficulty=session.difficulty)
+
+
+@receiver(post_save, sender='game.Challenge')
+def count_challenge(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        transaction.on_commit(CHALLENGES_CREATED.inc)
+
+
+# Произвольные методы от клиентов не должны плодить ряды
+_METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+
+class MetricsMiddleware:
+    """Число запросов и гистограмма времени ответа по представлению."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        response = self.get_response(request)
+        self.observe(request, response, started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self.observe(request, response, started)
+        return response
+
+    def observe(self, request, response, started):
+        view = view_name(request) or 'unmatched'
+        method = request.method if request.method in _METHODS else 'other'
+        REQUESTS.inc(view=view, method=method, status=response.status_code)
+        REQUEST_DURATION.observe(time.perf_counter() - started, view=view)
+
+
+def scrape_allowed(addr):
+    """Адрес входит в METRICS_ALLOWED_IPS (отдельные адреса или сети вида 172.28.0.0/24)."""
+    try:
+        ip = ipaddress.ip_address(addr)
+    except (TypeError, ValueError):
+        return False
+    return any(ip in ipaddress.ip_network(net, strict=False) for net in settings.METRICS_ALLOWED_IPS)
+
+
+@never_cache
+@require_safe
+def scrape(request):
+    """Метрики для Prometheus; доступны только с адресов METRICS_ALLOWED_IPS.
+
+    Каждый сервис (web, asgi) отдаёт свои счётчики; Prometheus обходит их напрямую по
+    внутренней сети, через proxy /metrics закрыт.
+    """
+    if not scrape_allowed(request.META.get('REMOTE_ADDR')):
+        return HttpResponseForbidden()
+    return HttpResponse(render(), content_type=CONTENT_TYPE)
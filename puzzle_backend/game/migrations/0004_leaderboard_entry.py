@@ -0,0 +1,62 @@
+# Generated by Django 4.2.16 on 2026-10-16 23:39
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_entries(apps, schema_editor):
+    # Как leaderboard.rebuild(): рекорд — первая сессия с лучшим счётом (дата её завершения)
+    GameSession = apps.get_model('game', 'GameSession')
+    LeaderboardEntry = apps.get_model('game', 'LeaderboardEntry')
+    best = GameSession.objects.filter(is_completed=True, score__gt=0).order_by(
+        'user_id', 'difficulty', '-score', 'updated_at'
+    ).values_list('user_id', 'difficulty', 'score', 'updated_at')
+    batch, last_key = [], None
+    for user_id, difficulty, score, updated_at in best.iterator(chunk_size=1000):
+        if (user_id, difficulty) == last_key:
+            continue
+        last_key = (user_id, difficulty)
+        batch.append(LeaderboardEntry(
+            user_id=user_id, difficulty=difficulty, best_score=score, date_achieved=updated_at
+        ))
+        if len(batch) >= 1000:
+            LeaderboardEntry.objects.bulk_create(batch)
+            batch = []
+    LeaderboardEntry.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('game', '0003_alter_friendship_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('difficulty', models.IntegerField(choices=[(3, '3x3'), (4, '4x4'), (5, '5x5')], verbose_name='Сложность')),
+                ('best_score', models.IntegerField(default=0, verbose_name='Лучшие очки')),
+                ('date_achieved', models.DateTimeField(blank=True, null=True, verbose_name='Дата достижения')),
+            ],
+            options={
+                'verbose_name': 'Рекорд по сложности',
+                'verbose_name_plural': 'Рекорды по сложности',
+            },
+        ),
+        migrations.AddField(
+            model_name='leaderboardentry',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entries', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterUniqueTogether(
+            name='leaderboardentry',
+            unique_together={('user', 'difficulty')},
+        ),
+        migrations.RunPython(fill_entries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 4.2.16 on 2026-10-16 23:42
+
+from django.db import migrations, models
+
+# username__iexact в PostgreSQL компилируется в UPPER("username"::text) = UPPER(%s)
+USERNAME_UPPER_INDEX = 'game_auth_user_username_upper_idx'
+
+
+def create_username_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {USERNAME_UPPER_INDEX} ON auth_user (UPPER(username::text))'
+        )
+
+
+def drop_username_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS {USERNAME_UPPER_INDEX}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('game', '0004_leaderboard_entry'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='challenge',
+            index=models.Index(fields=['to_user', '-created_at'], name='game_challenge_inbox_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gamesession',
+            index=models.Index(fields=['user', 'is_completed', '-updated_at'], name='game_session_user_state_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gamesession',
+            index=models.Index(condition=models.Q(('is_completed', False)), fields=['user', '-updated_at'], name='game_session_in_progress_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gamesession',
+            index=models.Index(condition=models.Q(('is_completed', True)), fields=['difficulty', '-score'], name='game_session_completed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gamesession',
+            index=models.Index(condition=models.Q(('is_completed', True)), fields=['difficulty', 'updated_at'], name='game_session_completed_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leaderboard',
+            index=models.Index(fields=['-best_score', 'date_achieved'], name='game_leaderboard_rank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leaderboardentry',
+            index=models.Index(fields=['difficulty', '-best_score', 'date_achieved'], name='game_entry_rank_idx'),
+        ),
+        migrations.RunPython(create_username_index, drop_username_index),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.16 on 2026-10-16 23:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0005_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='friendship',
+            index=models.Index(fields=['from_user', '-created_at'], name='game_friendship_list_idx'),
+        ),
+    ]
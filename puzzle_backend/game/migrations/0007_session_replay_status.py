@@ -0,0 +1,23 @@
+# Generated by Django 4.2.16 on 2026-10-16 23:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0006_friendship_list_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gamesession',
+            name='replay_score',
+            field=models.IntegerField(blank=True, null=True, verbose_name='Очки по повтору'),
+        ),
+        migrations.AddField(
+            model_name='gamesession',
+            name='replay_status',
+            field=models.CharField(choices=[('pending', 'Не проверена'), ('valid', 'Подтверждена'), ('score_mismatch', 'Очки не совпадают'), ('not_solved', 'Лог не собирает пазл'), ('no_log', 'Нет лога ходов')], default='pending', max_length=16, verbose_name='Проверка повтором'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.16 on 2026-10-17 00:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0007_session_replay_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='avatar_thumbs',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Миниатюры аватара'),
+        ),
+    ]
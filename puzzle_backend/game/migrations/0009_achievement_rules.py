@@ -0,0 +1,58 @@
+# Generated by Django 4.2.16 on 2026-10-17 00:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Снимок правил game.achievements.RULES на момент миграции
+DEFINITIONS = [
+    ('first_win', "Первая победа", "Соберите любой пазл"),
+    ('ten_wins', "Десять побед", "Соберите 10 пазлов"),
+    ('fifty_wins', "Полсотни", "Соберите 50 пазлов"),
+    ('first_5x5', "Большая доска", "Соберите пазл 5x5"),
+    ('quick_3x3', "Экономно", "Соберите 3x3 меньше чем за 30 ходов"),
+    ('quick_4x4', "Точный расчёт", "Соберите 4x4 меньше чем за 100 ходов"),
+    ('speedrun', "Быстрее минуты", "Соберите любой пазл меньше чем за минуту"),
+]
+
+
+def create_achievements(apps, schema_editor):
+    Achievement = apps.get_model('game', 'Achievement')
+    Achievement.objects.bulk_create(
+        [Achievement(code=code, name=name, description=description) for code, name, description in DEFINITIONS],
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('game', '0008_profile_avatar_thumbs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='achievement',
+            name='code',
+            field=models.CharField(blank=True, max_length=50, null=True, unique=True, verbose_name='Код правила'),
+        ),
+        migrations.CreateModel(
+            name='PlayerStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('completions', models.IntegerField(default=0, verbose_name='Завершено игр')),
+                ('completions_3', models.IntegerField(default=0, verbose_name='Завершено 3x3')),
+                ('completions_4', models.IntegerField(default=0, verbose_name='Завершено 4x4')),
+                ('completions_5', models.IntegerField(default=0, verbose_name='Завершено 5x5')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Статистика игрока',
+                'verbose_name_plural': 'Статистика игроков',
+            },
+        ),
+        migrations.RunPython(create_achievements, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,14 @@
+from django.db import migrations
+
+# Раньше здесь создавался триггер БД, поднимавший LeaderboardEntry при завершении игры.
+# Рекорд по сложности теперь пишет GameSession.update_leaderboard через ORM; миграция
+# оставлена пустой, чтобы не ломать историю, а уже созданные триггеры удаляет 0011.
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0009_achievement_rules'),
+    ]
+
+    operations = []
@@ -0,0 +1,30 @@
+from django.db import migrations
+
+# Триггеры, которые создавала прежняя версия 0010 (только PostgreSQL и SQLite)
+DROP = {
+    'postgresql': [
+        'DROP TRIGGER IF EXISTS game_session_entry_insert ON game_gamesession',
+        'DROP TRIGGER IF EXISTS game_session_entry_update ON game_gamesession',
+        'DROP FUNCTION IF EXISTS game_record_entry()',
+    ],
+    'sqlite': [
+        'DROP TRIGGER IF EXISTS game_session_entry_insert',
+        'DROP TRIGGER IF EXISTS game_session_entry_update',
+    ],
+}
+
+
+def drop_trigger(apps, schema_editor):
+    for sql in DROP.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0010_leaderboard_entry_trigger'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_trigger, migrations.RunPython.noop),
+    ]
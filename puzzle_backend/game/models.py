@@ -1,8 +1,14 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models.fields.files import FieldFile
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Greatest
 from django.contrib.auth.models import User
+from django.utils import timezone
+from .signals import session_completed
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from datetime import timedelta
+import copy
 
 class TimeStampedModel(models.Model):
     """Абстрактная модель с таймстемпами."""
@@ -12,10 +18,58 @@ class TimeStampedModel(models.Model):
     class Meta:
         abstract = True
 
-class UserProfile(TimeStampedModel):
+class ChangeTrackingMixin:
+    """Запоминает загруженные из БД значения полей, чтобы сохранять только изменённые."""
+
+    def _field_state(self, field):
+        value = getattr(self, field.attname)
+        # Файл сравниваем по имени; JSON копируем, чтобы увидеть изменения «на месте»
+        return value.name if isinstance(value, FieldFile) else copy.deepcopy(value)
+
+    def _snapshot(self):
+        # Отложенные поля (.only/.defer) не трогаем — иначе каждое вызовет отдельный запрос
+        self._loaded_values = {
+            field.attname: self._field_state(field) for field in self._meta.concrete_fields
+            if field.attname in self.__dict__
+        }
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._snapshot()
+        return instance
+
+    def changed_fields(self):
+        """Имена изменённых полей; None, если состояние в БД неизвестно."""
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return None
+        return [
+            field.name for field in self._meta.concrete_fields
+            if field.attname in loaded and field.attname in self.__dict__
+            and self._field_state(field) != loaded[field.attname]
+        ]
+
+    def save_changes(self):
+        """Сохраняет только изменённые поля; без изменений запросов нет."""
+        changed = self.changed_fields()
+        if changed == []:
+            return False
+        if changed is not None:
+            changed.append('updated_at')
+        self.save(update_fields=changed)
+        return True
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._snapshot()
+
+class UserProfile(ChangeTrackingMixin, TimeStampedModel):
     """Профиль пользователя с дополнительными полями."""
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
     avatar = models.ImageField(upload_to='avatars/', blank=True, null=True)
+    # Пути к миниатюрам аватара: {"128": {"webp": ..., "jpeg": ...}}; строятся в фоне
+    avatar_thumbs = models.JSONField(default=dict, blank=True, verbose_name="Миниатюры аватара")
     bio = models.TextField(blank=True, verbose_name="О себе")
     date_of_birth = models.DateField(blank=True, null=True, verbose_name="Дата рождения")
 
@@ -24,6 +78,8 @@ class UserProfile(TimeStampedModel):
 
 class Achievement(TimeStampedModel):
     """Достижение (награда)."""
+    # Код правила из game.achievements; у созданных вручную достижений кода нет
+    code = models.CharField(max_length=50, unique=True, null=True, blank=True, verbose_name="Код правила")
     name = models.CharField(max_length=100, verbose_name="Название")
     description = models.TextField(verbose_name="Описание")
     icon = models.ImageField(upload_to='achievements/', blank=True, null=True, verbose_name="Иконка")
@@ -52,53 +108,90 @@ class GameSession(TimeStampedModel):
     score = models.IntegerField(default=0, verbose_name="Очки")
     time_played = models.DurationField(null=True, blank=True, verbose_name="Время игры")
     is_completed = models.BooleanField(default=False, verbose_name="Завершена")
+    replay_status = models.CharField(
+        max_length=16, default='pending', verbose_name="Проверка повтором",
+        choices=[
+            ('pending', 'Не проверена'), ('valid', 'Подтверждена'), ('score_mismatch', 'Очки не совпадают'),
+            ('not_solved', 'Лог не собирает пазл'), ('no_log', 'Нет лога ходов'),
+        ],
+    )
+    replay_score = models.IntegerField(null=True, blank=True, verbose_name="Очки по повтору")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'is_completed', '-updated_at'], name='game_session_user_state_idx'),
+            # Частичные индексы: незавершённые игры пользователя и завершённые для лидерборда
+            models.Index(fields=['user', '-updated_at'], condition=models.Q(is_completed=False),
+                         name='game_session_in_progress_idx'),
+            models.Index(fields=['difficulty', '-score'], condition=models.Q(is_completed=True),
+                         name='game_session_completed_idx'),
+            models.Index(fields=['difficulty', 'updated_at'], condition=models.Q(is_completed=True),
+                         name='game_session_completed_at_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Запоминаем загруженные значения, чтобы не обновлять рекорд при повторных сохранениях
+        instance._loaded_result = (instance.__dict__.get('is_completed'), instance.__dict__.get('score'))
+        return instance
 
     def save(self, *args, **kwargs):
-    # Сохраняем оригинальный created_at при первом сохранении
-        if self.pk is None:
-            # При создании записи
+        # Автосохранение незавершённой игры — один UPDATE без дополнительных запросов
+        if not self.is_completed:
             super().save(*args, **kwargs)
-            original_created_at = self.created_at
-        else:
-            # При обновлении получаем текущий объект из БД
-            try:
-                original = GameSession.objects.get(pk=self.pk)
-                original_created_at = original.created_at
-            except GameSession.DoesNotExist:
-                original_created_at = self.created_at
+            self._loaded_result = (self.is_completed, self.score)
+            return
+
+        # Завершение — одна транзакция: UPDATE сессии (вместе с time_played) и UPDATE рекорда
+        with transaction.atomic():
+            if self.time_played is None:
+                self.time_played = timezone.now() - (self.created_at or timezone.now())
+                if kwargs.get('update_fields') is not None:
+                    kwargs['update_fields'] = {*kwargs['update_fields'], 'time_played'}
             super().save(*args, **kwargs)
-        
-        # Обновляем время игры только если игра завершена и time_played еще не установлен
-        if self.is_completed and self.time_played is None:
-            # Используем текущее время для расчета
-            from django.utils import timezone
-            self.time_played = timezone.now() - original_created_at
-            # Сохраняем без вызова сигнала save
-            super(GameSession, self).save(update_fields=['time_played'])
-        
-        if self.is_completed:
-            self.update_leaderboard()
-    
+            loaded = getattr(self, '_loaded_result', None)
+            if loaded != (True, self.score):
+                self.update_leaderboard()
+                newly_completed = loaded is None or loaded[0] is not True
+                # send_robust: после коммита сбой одного получателя (кэш, Redis) не должен
+                # превращать сохранённую игру в 500 и пропускать остальных; Django пишет его
+                # в лог django.dispatch
+                transaction.on_commit(lambda: session_completed.send_robust(
+                    sender=GameSession, session=self, newly_completed=newly_completed
+                ))
+        self._loaded_result = (self.is_completed, self.score)
+
     def update_leaderboard(self):
-        try:
-            leaderboard = Leaderboard.objects.get(user=self.user)
-            # Находим лучший результат среди всех завершенных игр пользователя
-            best_game = GameSession.objects.filter(
-                user=self.user, 
-                is_completed=True, 
-                score__gt=0  # Только положительные результаты
-            ).order_by('-score').first()
-            
-            if best_game and best_game.score > leaderboard.best_score:
-                leaderboard.best_score = best_game.score
-                leaderboard.date_achieved = best_game.updated_at
-                leaderboard.save()
-        except Leaderboard.DoesNotExist:
-            # Создаем Leaderboard, если его нет
-            Leaderboard.objects.create(
-                user=self.user,
-                best_score=self.score if self.is_completed else 0
-            )
+        """Поднимает общий рекорд и рекорд по сложности условными UPDATE."""
+        if self.score <= 0:
+            return
+        updated = Leaderboard.objects.filter(user_id=self.user_id).update(**self._record_update())
+        if not updated:
+            # Строка создаётся сигналом при регистрации; сюда попадаем только без неё
+            Leaderboard.objects.create(user_id=self.user_id, best_score=self.score, date_achieved=self.updated_at)
+
+        # Рекорд по сложности; строка появляется при первом завершении на этой сложности
+        entries = LeaderboardEntry.objects.filter(user_id=self.user_id, difficulty=self.difficulty)
+        if not entries.update(**self._record_update()):
+            try:
+                with transaction.atomic():
+                    LeaderboardEntry.objects.create(
+                        user_id=self.user_id, difficulty=self.difficulty,
+                        best_score=self.score, date_achieved=self.updated_at
+                    )
+            except IntegrityError:
+                # Параллельное завершение успело вставить строку — поднимаем её условно
+                entries.update(**self._record_update())
+
+    def _record_update(self):
+        return {
+            'best_score': Greatest('best_score', Value(self.score)),
+            'date_achieved': Case(
+                When(best_score__lt=self.score, then=Value(self.updated_at)),
+                default=F('date_achieved'),
+            ),
+        }
 
     def __str__(self):
         status = "завершена" if self.is_completed else "в процессе"
@@ -111,21 +204,62 @@ class Friendship(TimeStampedModel):
 
     class Meta:
         unique_together = ('from_user', 'to_user')
+        indexes = [
+            models.Index(fields=['from_user', '-created_at'], name='game_friendship_list_idx'),
+        ]
         verbose_name = "Дружба"
         verbose_name_plural = "Друзья"
 
     def __str__(self):
         return f"{self.from_user.username} → {self.to_user.username}"
 
-class Leaderboard(TimeStampedModel):
+class Leaderboard(ChangeTrackingMixin, TimeStampedModel):
     """Лучший результат пользователя (обновляется при новом рекорде)."""
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='leaderboard')
     best_score = models.IntegerField(default=0, verbose_name="Лучшие очки")
     date_achieved = models.DateTimeField(null=True, blank=True, verbose_name="Дата достижения")
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-best_score', 'date_achieved'], name='game_leaderboard_rank_idx'),
+        ]
+
     def __str__(self):
         return f"Рекорд {self.user.username}: {self.best_score}"
 
+class LeaderboardEntry(TimeStampedModel):
+    """Лучший результат пользователя на конкретной сложности (обновляется при завершении игры)."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='leaderboard_entries')
+    difficulty = models.IntegerField(choices=[(3, '3x3'), (4, '4x4'), (5, '5x5')], verbose_name="Сложность")
+    best_score = models.IntegerField(default=0, verbose_name="Лучшие очки")
+    date_achieved = models.DateTimeField(null=True, blank=True, verbose_name="Дата достижения")
+
+    class Meta:
+        unique_together = ('user', 'difficulty')
+        indexes = [
+            models.Index(fields=['difficulty', '-best_score', 'date_achieved'], name='game_entry_rank_idx'),
+        ]
+        verbose_name = "Рекорд по сложности"
+        verbose_name_plural = "Рекорды по сложности"
+
+    def __str__(self):
+        return f"Рекорд {self.user.username} ({self.difficulty}x{self.difficulty}): {self.best_score}"
+
+class PlayerStats(TimeStampedModel):
+    """Счётчики игрока для правил достижений (увеличиваются при завершении игры)."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='stats')
+    completions = models.IntegerField(default=0, verbose_name="Завершено игр")
+    completions_3 = models.IntegerField(default=0, verbose_name="Завершено 3x3")
+    completions_4 = models.IntegerField(default=0, verbose_name="Завершено 4x4")
+    completions_5 = models.IntegerField(default=0, verbose_name="Завершено 5x5")
+
+    class Meta:
+        verbose_name = "Статистика игрока"
+        verbose_name_plural = "Статистика игроков"
+
+    def __str__(self):
+        return f"Статистика {self.user.username}: {self.completions}"
+
 class Challenge(TimeStampedModel):
     """Вызов другу."""
     from_user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sent_challenges')
@@ -137,26 +271,44 @@ class Challenge(TimeStampedModel):
     is_completed = models.BooleanField(default=False, verbose_name="Завершён")
     response_score = models.IntegerField(null=True, blank=True, verbose_name="Ответ (очки)")
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['to_user', '-created_at'], name='game_challenge_inbox_idx'),
+        ]
+
     def __str__(self):
         return f"Вызов от {self.from_user} к {self.to_user} ({self.difficulty}x{self.difficulty})"
 
-# Сигналы для автосоздания профиля
-@receiver(post_save, sender=User)
-def create_user_profile(sender, instance, created, **kwargs):
-    if created:
-        UserProfile.objects.create(user=instance)
+def create_user_rows(users):
+    """Создаёт профили и строки рекордов для новых пользователей (по запросу на таблицу)."""
+    for model, name in ((UserProfile, 'profile'), (Leaderboard, 'leaderboard')):
+        for row in model.objects.bulk_create([model(user=user) for user in users]):
+            row._snapshot()
+            row.user._state.fields_cache[name] = row
 
-@receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    if hasattr(instance, 'profile'):
-        instance.profile.save()
+def bulk_create_users(users, batch_size=1000):
+    """Массовое создание пользователей с профилями и рекордами без сигналов (для импорта).
 
-@receiver(post_save, sender=User)
-def create_user_leaderboard(sender, instance, created, **kwargs):
-    if created:
-        Leaderboard.objects.create(user=instance)
+    Пароли должны быть уже захешированы (set_password / make_password).
+    """
+    users = list(users)
+    with transaction.atomic():
+        User.objects.bulk_create(users, batch_size=batch_size)
+        UserProfile.objects.bulk_create([UserProfile(user=user) for user in users], batch_size=batch_size)
+        Leaderboard.objects.bulk_create([Leaderboard(user=user) for user in users], batch_size=batch_size)
+    return users
 
+# Единственный обработчик сохранения пользователя: при создании заводит связанные строки,
+# при обычном сохранении (last_login, правка email) дописывает профиль и рекорд, только
+# если они были загружены через user.profile / user.leaderboard и реально изменены.
 @receiver(post_save, sender=User)
-def save_user_leaderboard(sender, instance, **kwargs):
-    if hasattr(instance, 'leaderboard'):
-        instance.leaderboard.save()
\ No newline at end of file
+def bootstrap_user(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        create_user_rows([instance])
+        return
+    for name in ('profile', 'leaderboard'):
+        related = instance._state.fields_cache.get(name)
+        if related is not None:
+            related.save_changes()
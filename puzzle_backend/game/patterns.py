@@ -0,0 +1,192 @@
+"""Аддитивные непересекающиеся базы шаблонов (pattern databases) для решателя.
+
+Плитки разбиваются на непересекающиеся группы; для каждой группы в файл записывается
+минимальное число ходов плиток этой группы до их мест. Ходы остальных плиток не
+считаются, поэтому значения разных групп складываются без потери допустимости.
+
+Обычно абстракция отслеживает пустую клетку (0-1 BFS: её ход через чужие плитки
+бесплатен), а в файл пишется минимум по положениям пустой клетки. Для крупных групп
+(6-6-3 на 4x4) это не помещается в память, и пустая клетка не отслеживается: плитка
+группы сдвигается в любую соседнюю клетку, не занятую плитками группы. Оценка слабее,
+но остаётся допустимой; формат файла одинаков.
+
+Формат файла: заголовок ``PDB1``, размер доски, число плиток k, номера плиток, затем
+N^k байт (N = n*n) — расстояние для позиций плиток в смешанной системе счисления
+``pos[0]*N^(k-1) + ... + pos[k-1]``. Во время работы файлы открываются через mmap,
+поэтому все воркеры делят одни и те же страницы.
+"""
+import mmap
+import os
+import struct
+from functools import lru_cache
+from pathlib import Path
+
+from .engine import neighbours
+
+MAGIC = b'PDB1'
+HEADER = struct.Struct('<4sBB')
+UNREACHED = 255
+# Предел N^(k+1) для поиска с отслеживанием пустой клетки (байт памяти)
+BLANK_TRACKING_LIMIT = 2 ** 25
+
+DEFAULT_PARTITIONS = {
+    3: (4, 4),
+    4: (5, 5, 5),
+    5: (4, 4, 4, 4, 4, 4),
+}
+
+
+def partition_groups(size, counts):
+    """Группы плиток подряд по номерам: (5, 5, 5) → 0-4, 5-9, 10-14."""
+    if sum(counts) != size * size - 1 or any(count < 1 for count in counts):
+        raise ValueError(f"Разбиение должно покрывать {size * size - 1} плиток")
+    groups, start = [], 0
+    for count in counts:
+        groups.append(tuple(range(start, start + count)))
+        start += count
+    return groups
+
+
+def file_name(size, tiles):
+    return f"{size}x{size}-{'_'.join(map(str, tiles))}.pdb"
+
+
+def build_table(size, tiles):
+    """Таблица расстояний для группы плиток от собранного положения."""
+    if (size * size) ** (len(tiles) + 1) <= BLANK_TRACKING_LIMIT:
+        return _build_with_blank(size, tiles)
+    return _build_relaxed(size, tiles)
+
+
+def _build_with_blank(size, tiles):
+    cells = size * size
+    k = len(tiles)
+    # Пустая клетка — младший разряд индекса состояния
+    weights = [cells ** (k - i) for i in range(k)]
+    adjacent = neighbours(size)
+    distance = bytearray([UNREACHED]) * (cells ** (k + 1))
+
+    current = [sum(tile * weight for tile, weight in zip(tiles, weights)) + cells - 1]
+    depth = 0
+    while current:
+        following = []
+        stack = []
+        for state in current:
+            if distance[state] == UNREACHED:
+                distance[state] = depth
+                stack.append(state)
+        # Бесплатные ходы пустой клетки раскрываются в пределах того же уровня
+        while stack:
+            state = stack.pop()
+            blank = state % cells
+            positions = []
+            rest = state
+            for weight in weights:
+                pos, rest = divmod(rest, weight)
+                positions.append(pos)
+            for target in adjacent[blank]:
+                if target in positions:
+                    nxt = state + (blank - target) * weights[positions.index(target)] + target - blank
+                    if distance[nxt] == UNREACHED:
+                        following.append(nxt)
+                else:
+                    nxt = state + target - blank
+                    if distance[nxt] == UNREACHED:
+                        distance[nxt] = depth
+                        stack.append(nxt)
+        current = following
+        depth += 1
+
+    table = bytearray(cells ** k)
+    for index in range(cells ** k):
+        table[index] = min(distance[index * cells:(index + 1) * cells])
+    return table
+
+
+def _build_relaxed(size, tiles):
+    cells = size * size
+    k = len(tiles)
+    weights = [cells ** (k - 1 - i) for i in range(k)]
+    adjacent = neighbours(size)
+    table = bytearray([UNREACHED]) * (cells ** k)
+
+    start = sum(tile * weight for tile, weight in zip(tiles, weights))
+    table[start] = 0
+    frontier = [start]
+    depth = 0
+    while frontier:
+        depth += 1
+        following = []
+        for index in frontier:
+            positions = []
+            rest = index
+            for weight in weights:
+                pos, rest = divmod(rest, weight)
+                positions.append(pos)
+            for pos, weight in zip(positions, weights):
+                for target in adjacent[pos]:
+                    if target in positions:
+                        continue
+                    nxt = index + (target - pos) * weight
+                    if table[nxt] == UNREACHED:
+                        table[nxt] = depth
+                        following.append(nxt)
+        frontier = following
+    return table
+
+
+def write(path, size, tiles, table):
+    """Атомарная запись файла базы (воркеры могут читать старую версию)."""
+    path = Path(path)
+    tmp = path.with_suffix('.tmp')
+    with open(tmp, 'wb') as handle:
+        handle.write(HEADER.pack(MAGIC, size, len(tiles)))
+        handle.write(bytes(tiles))
+        handle.write(table)
+    os.replace(tmp, path)
+    return path.stat().st_size
+
+
+class PatternDatabase:
+    """База шаблонов одной группы, отображённая в память только для чтения."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as handle:
+            self.data = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.size, k = HEADER.unpack_from(self.data)
+        if magic != MAGIC:
+            raise ValueError(f"{path}: не файл базы шаблонов")
+        self.tiles = tuple(self.data[HEADER.size:HEADER.size + k])
+        self.offset = HEADER.size + k
+        cells = self.size * self.size
+        self.weights = tuple(cells ** (k - 1 - i) for i in range(k))
+        if len(self.data) != self.offset + cells ** k:
+            raise ValueError(f"{path}: неверный размер файла")
+
+    def index(self, tiles):
+        """Индекс группы для доски (``tiles[pos]`` — плитка на позиции)."""
+        positions = {tile: pos for pos, tile in enumerate(tiles)}
+        return sum(positions[tile] * weight for tile, weight in zip(self.tiles, self.weights))
+
+    def value(self, index):
+        return self.data[self.offset + index]
+
+
+@lru_cache(maxsize=None)
+def _open(directory, size):
+    path = Path(directory)
+    if not path.is_dir():
+        return ()
+    result = tuple(PatternDatabase(item) for item in sorted(path.glob(f'{size}x{size}-*.pdb')))
+    seen = set()
+    for database in result:
+        if seen & set(database.tiles):
+            raise ValueError(f"Базы шаблонов {size}x{size} в {directory} пересекаются")
+        seen.update(database.tiles)
+    return result
+
+
+def databases(size):
+    """Базы шаблонов для размера доски из PATTERN_DB_DIR (пустой кортеж, если их нет)."""
+    from django.conf import settings
+    return _open(str(settings.PATTERN_DB_DIR), size)
@@ -0,0 +1,134 @@
+"""Раздача событий подписчикам WebSocket (/ws/updates/).
+
+Издатели — синхронный код (обработчики сигналов после коммита) — вызывают
+``publish(topic, message)``; подписчики — соединения WebSocket в цикле событий
+ASGI-сервера. Бэкенд задаётся настройкой PUBSUB_BACKEND:
+
+* ``LocalBroker`` — в пределах процесса (один процесс ASGI-сервера, тесты);
+* ``RedisBroker`` — между процессами через Redis Pub/Sub (нужен пакет redis).
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+LEADERBOARD_TOPIC = 'leaderboard'
+
+
+def user_topic(user_id):
+    return f'user:{user_id}'
+
+
+class Subscription:
+    """Очередь сообщений одного подписчика в его цикле событий."""
+
+    def __init__(self, broker, topics, loop, maxsize):
+        self.broker = broker
+        self.topics = tuple(topics)
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize)
+
+    def _put(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Клиент не успевает читать: вместо накопленного — одна команда перечитать всё
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({'type': 'resync'})
+
+    def deliver(self, message):
+        """Потокобезопасная доставка (издатель работает в потоке синхронного кода)."""
+        try:
+            self.loop.call_soon_threadsafe(self._put, message)
+        except RuntimeError:
+            # Цикл событий уже закрыт — соединение завершилось
+            self.broker.unsubscribe(self)
+
+    async def get(self):
+        return await self.queue.get()
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class LocalBroker:
+    """Подписки и раздача внутри процесса."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def subscribe(self, topics):
+        """Подписка на темы; вызывается из корутины в цикле событий подписчика."""
+        subscription = Subscription(self, topics, asyncio.get_running_loop(), settings.PUBSUB_QUEUE_SIZE)
+        with self._lock:
+            for topic in subscription.topics:
+                self._subscribers[topic].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for topic in subscription.topics:
+                subscribers = self._subscribers.get(topic)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[topic]
+
+    def deliver(self, topic, message):
+        with self._lock:
+            targets = list(self._subscribers.get(topic, ()))
+        for subscription in targets:
+            subscription.deliver(message)
+
+    def publish(self, topic, message):
+        self.deliver(topic, message)
+
+
+class RedisBroker(LocalBroker):
+    """Раздача между процессами: сообщение уходит в Redis, каждый процесс слушает
+    каналы с префиксом и раздаёт их своим подписчикам."""
+
+    def __init__(self, url=None, prefix='puzzle:updates:'):
+        super().__init__()
+        import redis  # необязательная зависимость: нужна только с этим бэкендом
+
+        self.url = url or settings.PUBSUB_REDIS_URL
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(self.url)
+        self._listener = None
+
+    def publish(self, topic, message):
+        self._client.publish(self.prefix + topic, json.dumps(message))
+
+    def subscribe(self, topics):
+        subscription = super().subscribe(topics)
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.get_running_loop().create_task(self._listen())
+        return subscription
+
+    async def _listen(self):
+        import redis.asyncio as aioredis
+
+        client = aioredis.Redis.from_url(self.url)
+        async with client.pubsub() as channel:
+            await channel.psubscribe(self.prefix + '*')
+            async for item in channel.listen():
+                if item['type'] != 'pmessage':
+                    continue
+                topic = item['channel'].decode()[len(self.prefix):]
+                self.deliver(topic, json.loads(item['data']))
+
+
+@lru_cache(maxsize=None)
+def broker():
+    return import_string(settings.PUBSUB_BACKEND)()
+
+
+def publish(topic, message):
+    broker().publish(topic, message)
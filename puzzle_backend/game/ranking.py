@@ -0,0 +1,415 @@
+"""Индекс рейтинга в памяти процесса: топ, место и перцентиль без запросов к БД.
+
+Для каждого рейтинга (сложности 3/4/5 и общий) хранятся отсортированные ключи
+``(-очки, время рекорда, id игрока)`` — тот же порядок, что leaderboard.RANK_ORDER —
+блоками (SortedKeys): новый рекорд и место игрока — O(log n), топ — срез. Индекс
+включается настройкой LEADERBOARD_RANK_INDEX; пока он не загружен («холодный»),
+ответы берутся из SQL.
+
+Процессы узнают о рекордах друг друга через журнал изменений в общем кэше:
+завершение игры получает номер (cache.incr) и записывает изменение под этим номером,
+а каждый процесс не чаще раза в RANK_INDEX_SYNC_SECONDS дочитывает пропущенные номера.
+Если запись журнала пропала или рекорды пересчитаны из истории (rebuild), индекс
+загружается заново.
+"""
+import bisect
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.dispatch import receiver
+
+from . import leaderboard
+from .signals import session_completed
+
+logger = logging.getLogger(__name__)
+
+SCOPES = (None, 3, 4, 5)
+SEQ_KEY = 'ranking:seq'
+CHANGE_TTL = 3600
+
+
+def _change_key(seq):
+    return f'ranking:change:{seq}'
+
+
+def _timestamp(moment):
+    # Рекорд без даты — ниже всех с теми же очками (как NULLS LAST в SQL)
+    return moment.timestamp() if moment is not None else math.inf
+
+
+class SortedKeys:
+    """Отсортированная последовательность блоками не длиннее 2 × LOAD.
+
+    Над длинами блоков — дерево Фенвика, поэтому место ключа (bisect_left) и доступ по
+    номеру — O(log n), а вставка и удаление сдвигают только один блок: O(log n + LOAD)
+    вместо O(n) у bisect.insort в один список. Дерево перестраивается (O(n / LOAD))
+    лишь при делении или исчезновении блока, то есть не чаще раза в LOAD вставок.
+    """
+    LOAD = 1000
+
+    def __init__(self, keys=()):
+        keys = sorted(keys)
+        self.lists = [keys[start:start + self.LOAD] for start in range(0, len(keys), self.LOAD)]
+        self.maxes = [block[-1] for block in self.lists]
+        self.length = len(keys)
+        self._build_tree()
+
+    def _build_tree(self):
+        self.tree = [0] * (len(self.lists) + 1)
+        for pos, block in enumerate(self.lists, start=1):
+            self.tree[pos] += len(block)
+            parent = pos + (pos & -pos)
+            if parent < len(self.tree):
+                self.tree[parent] += self.tree[pos]
+
+    def _tree_add(self, pos, delta):
+        pos += 1
+        while pos < len(self.tree):
+            self.tree[pos] += delta
+            pos += pos & -pos
+
+    def _before(self, pos):
+        """Число ключей в блоках до pos."""
+        total = 0
+        while pos:
+            total += self.tree[pos]
+            pos -= pos & -pos
+        return total
+
+    def _locate(self, index):
+        """(блок, смещение в нём) для номера ключа: спуск по дереву Фенвика."""
+        pos, step = 0, 1 << len(self.tree).bit_length()
+        while step:
+            following = pos + step
+            if following < len(self.tree) and self.tree[following] <= index:
+                pos = following
+                index -= self.tree[following]
+            step >>= 1
+        return pos, index
+
+    def __len__(self):
+        return self.length
+
+    def add(self, key):
+        if not self.lists:
+            self.lists, self.maxes, self.length = [[key]], [key], 1
+            self._build_tree()
+            return
+        pos = bisect.bisect_left(self.maxes, key)
+        if pos == len(self.maxes):
+            pos -= 1
+            self.lists[pos].append(key)
+            self.maxes[pos] = key
+        else:
+            bisect.insort(self.lists[pos], key)
+        self.length += 1
+        block = self.lists[pos]
+        if len(block) > 2 * self.LOAD:
+            self.lists.insert(pos + 1, block[self.LOAD:])
+            del block[self.LOAD:]
+            self.maxes[pos] = block[-1]
+            self.maxes.insert(pos + 1, self.lists[pos + 1][-1])
+            self._build_tree()
+        else:
+            self._tree_add(pos, 1)
+
+    def remove(self, key):
+        pos = bisect.bisect_left(self.maxes, key)
+        block = self.lists[pos]
+        del block[bisect.bisect_left(block, key)]
+        self.length -= 1
+        if block:
+            self.maxes[pos] = block[-1]
+            self._tree_add(pos, -1)
+        else:
+            del self.lists[pos]
+            del self.maxes[pos]
+            self._build_tree()
+
+    def bisect_left(self, key):
+        pos = bisect.bisect_left(self.maxes, key)
+        if pos == len(self.maxes):
+            return self.length
+        return self._before(pos) + bisect.bisect_left(self.lists[pos], key)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            start, stop, _ = item.indices(self.length)
+            result = []
+            if start < stop:
+                pos, offset = self._locate(start)
+                while len(result) < stop - start:
+                    block = self.lists[pos]
+                    result += block[offset:offset + stop - start - len(result)]
+                    pos, offset = pos + 1, 0
+            return result
+        if item < 0:
+            item += self.length
+        if not 0 <= item < self.length:
+            raise IndexError(item)
+        pos, offset = self._locate(item)
+        return self.lists[pos][offset]
+
+
+class RankIndex:
+    """Отсортированные ключи рейтинга одной сложности (или общего)."""
+
+    def __init__(self, rows=()):
+        keys = []
+        self.by_user = {}
+        self.names = {}
+        for user_id, username, score, achieved in rows:
+            key = (-score, _timestamp(achieved), user_id)
+            keys.append(key)
+            self.by_user[user_id] = key
+            self.names[user_id] = username
+        self.keys = SortedKeys(keys)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _row(self, key):
+        return {'user__username': self.names.get(key[2], ''), 'best_score': -key[0]}
+
+    def record(self, user_id, username, score, achieved):
+        """Поднимает рекорд игрока по тем же правилам, что GameSession.update_leaderboard."""
+        if score <= 0:
+            return
+        old = self.by_user.get(user_id)
+        self.names[user_id] = username
+        if old is not None:
+            if -old[0] >= score:
+                return
+            self.keys.remove(old)
+        key = (-score, _timestamp(achieved), user_id)
+        self.keys.add(key)
+        self.by_user[user_id] = key
+
+    def top(self, limit):
+        return [dict(self._row(key), rank=rank) for rank, key in enumerate(self.keys[:limit], start=1)]
+
+    def rank(self, user_id):
+        key = self.by_user.get(user_id)
+        return None if key is None else self.keys.bisect_left(key) + 1
+
+    def percentile(self, user_id):
+        """Доля игроков рейтинга, стоящих не выше этого (100 — первое место)."""
+        rank = self.rank(user_id)
+        if rank is None:
+            return None
+        return round(100 * (len(self.keys) - rank + 1) / len(self.keys), 2)
+
+    def position(self, user_id, size=5):
+        rank = self.rank(user_id)
+        if rank is None:
+            return None
+        index = rank - 1
+        before = [self._row(key) for key in self.keys[max(index - size + 1, 0):index]]
+        after = [self._row(key) for key in self.keys[index + 1:index + size]]
+        return leaderboard.window(before, self._row(self.keys[index]), after, rank, size)
+
+
+class _State:
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.indexes = None
+        self.seq = 0
+        self.epoch = None
+        self.synced_at = 0.0
+        self.gap_since = None
+        self.loading = False
+
+
+_state = _State()
+
+
+def enabled():
+    return settings.LEADERBOARD_RANK_INDEX
+
+
+def loaded():
+    with _state.lock:
+        return _state.indexes is not None
+
+
+def _current_seq():
+    return cache.get(SEQ_KEY, 0)
+
+
+def _current_epoch():
+    return cache.get(leaderboard.REBUILD_KEY, 1)
+
+
+def load():
+    """Загружает индексы всех рейтингов из БД (при старте процесса или после сброса)."""
+    # Номер журнала читаем до выборки: изменения, записанные во время загрузки, применятся
+    # повторно при синхронизации, а повторное применение рекорда ничего не меняет
+    seq, epoch = _current_seq(), _current_epoch()
+    indexes = {}
+    for difficulty in SCOPES:
+        rows = leaderboard.ranked(difficulty).values_list(
+            'user_id', 'user__username', 'best_score', 'date_achieved'
+        ).iterator(chunk_size=10000)
+        indexes[difficulty] = RankIndex(rows)
+    with _state.lock:
+        _state.indexes, _state.seq, _state.epoch, _state.gap_since = indexes, seq, epoch, None
+        _state.synced_at = time.monotonic()
+        _state.loading = False
+    logger.info("Индекс рейтинга загружен: %s", {scope: len(index) for scope, index in indexes.items()})
+    return indexes
+
+
+def reset():
+    """Делает индекс холодным; следующий запрос запустит загрузку в фоне."""
+    with _state.lock:
+        _state.indexes = None
+
+
+def _load_in_thread():
+    try:
+        load()
+    except Exception:
+        logger.exception("Не удалось загрузить индекс рейтинга")
+        with _state.lock:
+            _state.loading = False
+    finally:
+        connection.close()
+
+
+def warm():
+    """Запускает фоновую загрузку индекса, если она ещё не идёт."""
+    with _state.lock:
+        if _state.loading or _state.indexes is not None:
+            return
+        _state.loading = True
+    threading.Thread(target=_load_in_thread, name='rank-index', daemon=True).start()
+
+
+def _sync(force=False):
+    """Применяет изменения из журнала, записанные с прошлой синхронизации (любыми процессами)."""
+    now = time.monotonic()
+    if not force and now - _state.synced_at < settings.RANK_INDEX_SYNC_SECONDS:
+        return
+    _state.synced_at = now
+    if _current_epoch() != _state.epoch:
+        _state.indexes = None
+        return
+    latest = _current_seq()
+    if latest <= _state.seq:
+        return
+    changes = cache.get_many([_change_key(seq) for seq in range(_state.seq + 1, latest + 1)])
+    for seq in range(_state.seq + 1, latest + 1):
+        change = changes.get(_change_key(seq))
+        if change is None:
+            # Номер выдан, но запись ещё не дописана другим процессом — ждём; если пропуск
+            # держится дольше нескольких синхронизаций, запись вытеснена: перечитываем всё
+            if _state.gap_since is None:
+                _state.gap_since = now
+            elif now - _state.gap_since > 5 * settings.RANK_INDEX_SYNC_SECONDS:
+                _state.indexes = None
+            return
+        difficulty, user_id, username, score, achieved = change
+        _state.indexes[difficulty].record(user_id, username, score, achieved)
+        _state.indexes[None].record(user_id, username, score, achieved)
+        _state.seq, _state.gap_since = seq, None
+
+
+def index(difficulty=None, fresh=False):
+    """Индекс рейтинга или None, если он выключен или ещё не загружен (тогда — SQL).
+
+    ``fresh`` — дочитать журнал сейчас, не дожидаясь RANK_INDEX_SYNC_SECONDS.
+    """
+    if not enabled():
+        return None
+    with _state.lock:
+        if _state.indexes is not None:
+            _sync(force=fresh)
+        indexes = _state.indexes
+    if indexes is None:
+        warm()
+        return None
+    return indexes[int(difficulty) if difficulty else None]
+
+
+def indexed_top(difficulty=None, limit=leaderboard.TOP_SIZE):
+    """Топ из индекса или None, если индекс выключен или ещё не загружен."""
+    # Топ уходит в кэш ответов (leaderboard.cached) под текущей версией, поэтому журнал
+    # дочитывается сразу: иначе устаревший топ жил бы в кэше LEADERBOARD_CACHE_TIMEOUT
+    found = index(difficulty, fresh=True)
+    if found is None:
+        return None
+    with _state.lock:
+        return found.top(limit)
+
+
+def top_entries(difficulty=None, limit=leaderboard.TOP_SIZE):
+    entries = indexed_top(difficulty, limit)
+    return leaderboard.top_entries(difficulty=difficulty, limit=limit) if entries is None else entries
+
+
+def position(user_id, difficulty=None, size=5):
+    found = index(difficulty)
+    if found is None:
+        return leaderboard.position(user_id, difficulty=difficulty, size=size)
+    with _state.lock:
+        return found.position(user_id, size)
+
+
+@receiver(session_completed)
+def publish_record(sender, session, **kwargs):
+    """Записывает результат завершённой игры в журнал изменений рейтинга."""
+    if not enabled() or session.score <= 0:
+        return
+    try:
+        seq = cache.incr(SEQ_KEY)
+    except ValueError:
+        cache.add(SEQ_KEY, 0, None)
+        seq = cache.incr(SEQ_KEY)
+    cache.set(_change_key(seq), (
+        session.difficulty, session.user_id, session.user.username, session.score, session.updated_at,
+    ), CHANGE_TTL)
+    # invalidate_on_completion сменил версию кэша ответов ещё до записи в журнал: ответ,
+    # собранный в этот промежуток, не видит рекорда. Новая версия — уже после записи
+    leaderboard.invalidate()
+
+
+def check(difficulty=None, sample=100, live=False):
+    """Сверяет индекс с SQL: размер, топ и места случайной выборки игроков.
+
+    По умолчанию проверяется свежезагруженный индекс (порядок и окна); с ``live`` —
+    индекс этого процесса со всеми применёнными изменениями журнала.
+    Возвращает список расхождений (пустой — индекс согласован с БД).
+    """
+    if live:
+        checked = index(difficulty)
+        if checked is None:
+            return ["индекс не загружен"]
+    else:
+        checked = RankIndex(leaderboard.ranked(difficulty).values_list(
+            'user_id', 'user__username', 'best_score', 'date_achieved'
+        ).iterator(chunk_size=10000))
+    name = difficulty or 'общий'
+    problems = []
+    with _state.lock:
+        size = len(checked)
+        top = checked.top(leaderboard.TOP_SIZE)
+    if size != leaderboard.ranked(difficulty).count():
+        problems.append(f"рейтинг {name}: в индексе {size} строк, в БД другое число")
+    if top != leaderboard.top_entries(difficulty=difficulty):
+        problems.append(f"рейтинг {name}: топ не совпадает с SQL")
+    user_ids = list(leaderboard.ranked(difficulty).order_by('?').values_list('user_id', flat=True)[:sample])
+    for user_id in user_ids:
+        expected = leaderboard.position(user_id, difficulty=difficulty)
+        with _state.lock:
+            actual = checked.position(user_id)
+        if expected != actual:
+            problems.append(
+                f"рейтинг {name}, игрок {user_id}: SQL {expected and expected['rank']}, "
+                f"индекс {actual and actual['rank']}"
+            )
+    return problems
@@ -1,8 +1,13 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from .instrumentation import TimedRepresentationMixin
 from .models import UserProfile, GameSession, Friendship, Challenge, Achievement, UserAchievement
 
-class RegisterSerializer(serializers.ModelSerializer):
+class ModelSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
+    """Базовый сериализатор моделей: время сериализации попадает в замеры запроса."""
+
+class RegisterSerializer(ModelSerializer):
     """Сериализатор для регистрации."""
     password = serializers.CharField(write_only=True)
 
@@ -16,27 +21,45 @@ class RegisterSerializer(serializers.ModelSerializer):
             password=validated_data['password'],
             email=validated_data.get('email', '')
         )
-        UserProfile.objects.get_or_create(user=user) 
         return user
 
-class ProfileSerializer(serializers.ModelSerializer):
+class ProfileSerializer(ModelSerializer):
     """Сериализатор профиля (с username/email из User)."""
     username = serializers.CharField(source='user.username', read_only=True)
     email = serializers.EmailField(source='user.email', read_only=True)  
+    avatar_urls = serializers.SerializerMethodField()
 
     class Meta:
         model = UserProfile
-        fields = ('username', 'email', 'avatar', 'bio', 'date_of_birth')
+        fields = ('username', 'email', 'avatar', 'avatar_urls', 'bio', 'date_of_birth')
         read_only_fields = ('username', 'email')
 
-class GameSessionSerializer(serializers.ModelSerializer):
+    def get_avatar_urls(self, obj):
+        """URL миниатюр по размерам и форматам; пусто, пока они строятся."""
+        return {
+            size: {fmt: default_storage.url(path) for fmt, path in paths.items()}
+            for size, paths in (obj.avatar_thumbs or {}).items()
+        }
+
+class GameSessionSerializer(ModelSerializer):
     """Сериализатор игровых сессий."""
     class Meta:
         model = GameSession
         fields = '__all__'
-        read_only_fields = ('user', 'time_played')  # time_played рассчитывается автоматически
+        # time_played рассчитывается автоматически, результат проверки выставляет сервер
+        read_only_fields = ('user', 'time_played', 'replay_status', 'replay_score')
+
+class MoveBatchSerializer(serializers.Serializer):
+    """Пакет ходов для автосохранения (позиции плиток в порядке кликов)."""
+    moves = serializers.ListField(
+        child=serializers.IntegerField(min_value=0), allow_empty=True, max_length=500
+    )
+    timer = serializers.IntegerField(min_value=0)
+    flush = serializers.BooleanField(default=False)
+    # Число ходов у клиента до этого пакета: расхождение с сервером — 409 вместо хода не по той доске
+    base = serializers.IntegerField(min_value=0, required=False)
 
-class FriendSerializer(serializers.ModelSerializer):
+class FriendSerializer(ModelSerializer):
     """Сериализатор для списка друзей."""
     username = serializers.CharField(source='to_user.username', read_only=True)
     # Опционально: avatar = serializers.ImageField(source='to_user.profile.avatar', read_only=True)
@@ -46,13 +69,13 @@ class FriendSerializer(serializers.ModelSerializer):
         fields = ('id', 'username', 'created_at')
         read_only_fields = fields
 
-class AchievementSerializer(serializers.ModelSerializer):
+class AchievementSerializer(ModelSerializer):
     """Сериализатор достижений."""
     class Meta:
         model = Achievement
         fields = ('id', 'name', 'description', 'icon')
 
-class UserAchievementSerializer(serializers.ModelSerializer):
+class UserAchievementSerializer(ModelSerializer):
     """Сериализатор для списка достижений пользователя."""
     achievement = AchievementSerializer(read_only=True)
 
@@ -60,7 +83,7 @@ class UserAchievementSerializer(serializers.ModelSerializer):
         model = UserAchievement
         fields = ('achievement', 'created_at')
 
-class ChallengeSerializer(serializers.ModelSerializer):
+class ChallengeSerializer(ModelSerializer):
     """Сериализатор вызовов."""
     from_username = serializers.CharField(source='from_user.username', read_only=True)
     to_username = serializers.CharField(write_only=True)
@@ -0,0 +1,7 @@
+"""Сигналы игры."""
+from django.dispatch import Signal
+
+# Отправляется после коммита транзакции, в которой сессия стала завершённой.
+# Аргументы: session — экземпляр GameSession; newly_completed — False, если у уже
+# завершённой сессии изменились только очки.
+session_completed = Signal()
@@ -0,0 +1,342 @@
+"""Оптимальный решатель пазла: IDA* с эвристикой «Манхэттен + линейные конфликты».
+
+Если для размера доски построены базы шаблонов (см. game.patterns), эвристика —
+максимум из их суммы и «Манхэттена + конфликтов».
+
+Ответы кэшируются по состояниям: после решения каждое состояние на оптимальном пути
+получает свой следующий ход и оставшееся расстояние, поэтому игрок, следующий
+подсказкам, дальше получает их без поиска.
+
+Поиск идёт в пуле процессов (HINT_WORKERS): он занимает процессор целиком и в потоке
+веб-воркера держал бы GIL, останавливая остальные запросы этого процесса.
+"""
+import multiprocessing
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+
+from . import patterns
+from .engine import Board, neighbours
+
+FOUND = -1
+CHECK_EVERY = 2048
+
+
+class SolverTimeout(Exception):
+    """Поиск не уложился в отведённое время."""
+
+
+class UnsolvableError(ValueError):
+    """Раскладка не решается (неверная чётность)."""
+
+
+@lru_cache(maxsize=None)
+def manhattan_table(size):
+    """``table[tile][pos]`` — манхэттенское расстояние плитки от позиции до её места."""
+    cells = size * size
+    table = []
+    for tile in range(cells):
+        if tile == cells - 1:
+            table.append((0,) * cells)
+            continue
+        goal_row, goal_col = divmod(tile, size)
+        table.append(tuple(
+            abs(pos // size - goal_row) + abs(pos % size - goal_col) for pos in range(cells)
+        ))
+    return tuple(table)
+
+
+def _line_conflict(goals):
+    """2 × (минимум плиток, которые нужно убрать с линии, чтобы остальные шли по порядку)."""
+    if len(goals) < 2:
+        return 0
+    # Длина наибольшей возрастающей подпоследовательности; линии короткие (≤ 5)
+    best = []
+    for i, goal in enumerate(goals):
+        best.append(1 + max((best[j] for j in range(i) if goals[j] < goal), default=0))
+    return 2 * (len(goals) - max(best))
+
+
+class _LineConflicts:
+    """Линейные конфликты строк и столбцов с кэшем по содержимому линии.
+
+    Кэш живёт один вызов solve(): на 5x5 за поиск набираются сотни тысяч линий.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.blank = size * size - 1
+        self.rows = {}
+        self.cols = {}
+
+    def row(self, index, line):
+        key = (index, line)
+        value = self.rows.get(key)
+        if value is None:
+            size = self.size
+            goals = [tile % size for tile in line if tile != self.blank and tile // size == index]
+            value = self.rows[key] = _line_conflict(goals)
+        return value
+
+    def col(self, index, line):
+        key = (index, line)
+        value = self.cols.get(key)
+        if value is None:
+            size = self.size
+            goals = [tile // size for tile in line if tile != self.blank and tile % size == index]
+            value = self.cols[key] = _line_conflict(goals)
+        return value
+
+
+def _manhattan_conflicts(board):
+    size, tiles = board.size, board.tiles
+    table = manhattan_table(size)
+    conflicts = _LineConflicts(size)
+    value = sum(table[tile][pos] for pos, tile in enumerate(tiles))
+    for i in range(size):
+        value += conflicts.row(i, bytes(tiles[i * size:(i + 1) * size]))
+        value += conflicts.col(i, bytes(tiles[i::size]))
+    return value
+
+
+def heuristic(board, databases=()):
+    """Допустимая оценка расстояния до решения."""
+    pattern = sum(database.value(database.index(board.tiles)) for database in databases)
+    return max(_manhattan_conflicts(board), pattern)
+
+
+def solve(board, deadline=None, databases=()):
+    """Оптимальная последовательность ходов (позиции сдвигаемых плиток).
+
+    Бросает UnsolvableError для нерешаемой раскладки и SolverTimeout по истечении
+    ``deadline`` (значение time.monotonic()). У исключения SolverTimeout атрибут
+    ``lower_bound`` — нижняя оценка расстояния по последней завершённой итерации.
+    """
+    if not board.is_solvable():
+        raise UnsolvableError("Эта раскладка не решается")
+    size = board.size
+    cells = size * size
+    tiles = bytearray(board.tiles)
+    table = manhattan_table(size)
+    conflicts = _LineConflicts(size)
+    adjacent = neighbours(size)
+    row_lc = [conflicts.row(i, bytes(tiles[i * size:(i + 1) * size])) for i in range(size)]
+    col_lc = [conflicts.col(i, bytes(tiles[i::size])) for i in range(size)]
+    # Для каждой плитки: (номер базы, вес её позиции в индексе базы)
+    owner = [None] * cells
+    for number, database in enumerate(databases):
+        for tile, weight in zip(database.tiles, database.weights):
+            owner[tile] = (number, weight)
+    pattern_index = [database.index(tiles) for database in databases]
+    pattern_value = [database.value(index) for database, index in zip(databases, pattern_index)]
+    path = []
+    counter = [0]
+
+    def search(blank, previous, g, md, pd, bound):
+        h = md if md > pd else pd
+        f = g + h
+        if f > bound:
+            return f
+        if h == 0:
+            return FOUND
+        counter[0] += 1
+        if deadline is not None and counter[0] % CHECK_EVERY == 0 and time.monotonic() > deadline:
+            raise SolverTimeout
+        minimum = None
+        for pos in adjacent[blank]:
+            if pos == previous:
+                continue
+            tile = tiles[pos]
+            distance = table[tile]
+            tiles[blank] = tile
+            tiles[pos] = cells - 1
+            new_md = md - distance[pos] + distance[blank]
+            new_pd = pd
+            own = owner[tile]
+            if own is not None:
+                number, weight = own
+                old_index, old_value = pattern_index[number], pattern_value[number]
+                pattern_index[number] = old_index + (blank - pos) * weight
+                pattern_value[number] = databases[number].value(pattern_index[number])
+                new_pd += pattern_value[number] - old_value
+            if pos // size == blank // size:
+                # Горизонтальный ход меняет состав двух столбцов
+                a, b = pos % size, blank % size
+                la, lb = conflicts.col(a, bytes(tiles[a::size])), conflicts.col(b, bytes(tiles[b::size]))
+                new_md += la + lb - col_lc[a] - col_lc[b]
+                saved = col_lc[a], col_lc[b]
+                col_lc[a], col_lc[b] = la, lb
+                lines, index = col_lc, (a, b)
+            else:
+                a, b = pos // size, blank // size
+                la = conflicts.row(a, bytes(tiles[a * size:(a + 1) * size]))
+                lb = conflicts.row(b, bytes(tiles[b * size:(b + 1) * size]))
+                new_md += la + lb - row_lc[a] - row_lc[b]
+                saved = row_lc[a], row_lc[b]
+                row_lc[a], row_lc[b] = la, lb
+                lines, index = row_lc, (a, b)
+            path.append(pos)
+            result = search(pos, blank, g + 1, new_md, new_pd, bound)
+            if result == FOUND:
+                return FOUND
+            path.pop()
+            lines[index[0]], lines[index[1]] = saved
+            if own is not None:
+                pattern_index[number], pattern_value[number] = old_index, old_value
+            tiles[pos] = tile
+            tiles[blank] = cells - 1
+            if minimum is None or result < minimum:
+                minimum = result
+        return minimum
+
+    md = _manhattan_conflicts(board)
+    pd = sum(pattern_value)
+    bound = max(md, pd)
+    while True:
+        try:
+            result = search(board.blank, None, 0, md, pd, bound)
+        except SolverTimeout as exc:
+            exc.lower_bound = bound
+            raise
+        if result == FOUND:
+            return path
+        bound = result
+
+
+def greedy_move(board, databases=()):
+    """Ход, сильнее всего уменьшающий эвристику (для режима best-effort)."""
+    best = None
+    for pos in board.legal_moves():
+        candidate = board.copy()
+        candidate.move(pos)
+        value = heuristic(candidate, databases)
+        if best is None or value < best[0]:
+            best = (value, pos)
+    return best[1]
+
+
+class HintCache:
+    """LRU-кэш результатов решателя: ключ — состояние, значение — (ход, расстояние)."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.items.get(key)
+            if value is not None:
+                self.items.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            self.items[key] = value
+            self.items.move_to_end(key)
+            while len(self.items) > self.max_size:
+                self.items.popitem(last=False)
+
+    def store_path(self, board, path):
+        state = board.copy()
+        for done, pos in enumerate(path):
+            self.put((state.size, state.key()), (pos, len(path) - done))
+            state.move(pos)
+        self.put((state.size, state.key()), (None, 0))
+
+
+_cache = None
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _hint_cache():
+    global _cache
+    if _cache is None:
+        from django.conf import settings
+        _cache = HintCache(settings.HINT_CACHE_SIZE)
+    return _cache
+
+
+def _get_executor():
+    global _executor
+    from django.conf import settings
+    with _executor_lock:
+        if _executor is None:
+            # spawn: веб-воркер многопоточный, fork из него небезопасен
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.HINT_WORKERS, mp_context=multiprocessing.get_context('spawn')
+            )
+        return _executor
+
+
+def _drop_executor(executor):
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _search(size, tiles, timeout, pattern_dir):
+    """Поиск в процессе пула: ('path', ходы) или ('timeout', нижняя оценка)."""
+    board = Board(size, tiles)
+    try:
+        path = solve(board, deadline=time.monotonic() + timeout, databases=patterns._open(pattern_dir, size))
+    except SolverTimeout as exc:
+        return 'timeout', exc.lower_bound
+    return 'path', path
+
+
+def _run_search(board, timeout):
+    """_search в пуле HINT_WORKERS (0 — в текущем потоке).
+
+    Ожидание ответа ограничено timeout + HINT_QUEUE_SECONDS: если пул занят, запрос
+    получает best-effort ход, а не ждёт очереди. Нижняя оценка тогда — None.
+    """
+    from django.conf import settings
+    args = (board.size, bytes(board.tiles), timeout, str(settings.PATTERN_DB_DIR))
+    if not settings.HINT_WORKERS:
+        return _search(*args)
+    executor = _get_executor()
+    try:
+        future = executor.submit(_search, *args)
+        return future.result(timeout + settings.HINT_QUEUE_SECONDS)
+    except FutureTimeout:
+        future.cancel()
+    except BrokenProcessPool:
+        _drop_executor(executor)
+    return 'timeout', None
+
+
+def hint(board, timeout):
+    """Следующий ход для доски.
+
+    Возвращает словарь: move (позиция плитки или None для собранной доски), tile,
+    distance (точное оставшееся число ходов или None в режиме best-effort),
+    lower_bound и optimal.
+    """
+    cache = _hint_cache()
+    cached = cache.get((board.size, board.key()))
+    if cached is None:
+        if not board.is_solvable():
+            raise UnsolvableError("Эта раскладка не решается")
+        outcome, value = _run_search(board, timeout)
+        if outcome == 'timeout':
+            databases = patterns.databases(board.size)
+            move = greedy_move(board, databases)
+            return {
+                'move': move, 'tile': board.tiles[move], 'distance': None,
+                'lower_bound': heuristic(board, databases) if value is None else value, 'optimal': False,
+            }
+        cache.store_path(board, value)
+        cached = (value[0] if value else None, len(value))
+    move, distance = cached
+    return {
+        'move': move, 'tile': board.tiles[move] if move is not None else None,
+        'distance': distance, 'lower_bound': distance, 'optimal': True,
+    }
@@ -13,6 +13,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 django.setup()
 
 from django.test import Client
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.contrib.auth.models import User
 from rest_framework.test import APIClient
@@ -126,4 +127,11 @@ def test_image():
 @pytest.fixture(autouse=True)
 def enable_db_access_for_all_tests(db):
     """Включаем доступ к базе данных для всех тестов"""
-    pass
\ No newline at end of file
+    pass
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Кэш не откатывается вместе с БД — очищаем его между тестами"""
+    cache.clear()
+    yield
+    cache.clear()
@@ -0,0 +1,88 @@
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from game import achievements
+from game.models import GameSession, PlayerStats, UserAchievement
+from game.tests.test_query_counts import statements
+
+def complete(user, difficulty=4, moves=200, timer=300, score=5000):
+    return GameSession.objects.create(
+        user=user, difficulty=difficulty, score=score, is_completed=True,
+        game_state={'tiles': [], 'moves': moves, 'timer': timer},
+    )
+
+def codes(user):
+    return set(UserAchievement.objects.filter(user=user).values_list('achievement__code', flat=True))
+
+@pytest.mark.django_db
+class TestAchievementRules:
+    """Тесты инкрементальной выдачи достижений"""
+
+    def test_first_win(self, user, django_capture_on_commit_callbacks):
+        """Первое завершение даёт «Первую победу» и заводит счётчики"""
+        with django_capture_on_commit_callbacks(execute=True):
+            complete(user, difficulty=4)
+        assert codes(user) == {'first_win'}
+        stats = PlayerStats.objects.get(user=user)
+        assert (stats.completions, stats.completions_4, stats.completions_5) == (1, 1, 0)
+
+    def test_threshold_crossed_once(self, user, django_capture_on_commit_callbacks):
+        """Пороговое достижение выдаётся на десятой победе"""
+        for _ in range(9):
+            with django_capture_on_commit_callbacks(execute=True):
+                complete(user)
+        assert 'ten_wins' not in codes(user)
+        with django_capture_on_commit_callbacks(execute=True):
+            complete(user)
+        assert 'ten_wins' in codes(user)
+        assert PlayerStats.objects.get(user=user).completions == 10
+
+    def test_session_conditions(self, user, django_capture_on_commit_callbacks):
+        """Условия на одну игру: 5x5, мало ходов, быстрее минуты"""
+        with django_capture_on_commit_callbacks(execute=True):
+            complete(user, difficulty=3, moves=25, timer=40)
+            complete(user, difficulty=5, moves=500)
+        assert codes(user) == {'first_win', 'first_5x5', 'quick_3x3', 'speedrun'}
+
+    def test_no_award_without_new_rules(self, user, django_capture_on_commit_callbacks):
+        """Завершение без новых достижений — UPDATE счётчиков и их чтение, без истории и вставок"""
+        with django_capture_on_commit_callbacks(execute=True):
+            complete(user)
+        session = complete(user)
+        with CaptureQueriesContext(connection) as ctx:
+            achievements.award_on_completion(GameSession, session=session)
+        sql = statements(ctx)
+        assert len(sql) == 2
+        assert sql[0].upper().startswith('UPDATE') and 'game_playerstats' in sql[0]
+        assert sql[1].upper().startswith('SELECT') and 'game_gamesession' not in sql[1]
+
+    def test_abandoned_and_rescored_ignored(self, user, django_capture_on_commit_callbacks):
+        """Брошенные игры и повторное сохранение завершённой не считаются"""
+        with django_capture_on_commit_callbacks(execute=True):
+            complete(user, score=0)
+        assert not PlayerStats.objects.filter(user=user).exists()
+
+        with django_capture_on_commit_callbacks(execute=True):
+            session = complete(user)
+        with django_capture_on_commit_callbacks(execute=True):
+            session = GameSession.objects.get(pk=session.pk)
+            session.score = 6000
+            session.save()
+        assert PlayerStats.objects.get(user=user).completions == 1
+
+    def test_backfill_command(self, user, another_user):
+        """Пакетная проверка истории восстанавливает счётчики и выдаёт достижения"""
+        for _ in range(10):
+            complete(user, difficulty=3, moves=20)
+        complete(another_user, difficulty=5)
+        PlayerStats.objects.all().delete()
+        UserAchievement.objects.all().delete()
+
+        call_command('backfill_achievements', '--chunk-size', '1')
+        call_command('backfill_achievements')
+
+        assert codes(user) == {'first_win', 'ten_wins', 'quick_3x3'}
+        assert codes(another_user) == {'first_win', 'first_5x5'}
+        assert PlayerStats.objects.get(user=user).completions_3 == 10
+        assert UserAchievement.objects.count() == 5
@@ -0,0 +1,95 @@
+import pytest
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from game import pagination
+from game.models import GameSession, Leaderboard
+
+def add_sessions(users, per_user=2):
+    for user in users:
+        for score in range(per_user):
+            GameSession.objects.create(user=user, difficulty=3, score=score * 700, game_state={})
+
+def changelist_queries(client, url):
+    with CaptureQueriesContext(connection) as ctx:
+        response = client.get(url)
+    assert response.status_code == 200
+    return len(ctx.captured_queries)
+
+@pytest.mark.django_db
+class TestAdminScaling:
+    """Тесты списков админки на больших таблицах"""
+
+    def test_session_changelist_no_n_plus_one(self, client, admin_user, create_user):
+        """Имя игрока в списке сессий — через JOIN: число запросов не зависит от строк"""
+        client.force_login(admin_user)
+        url = reverse('admin:game_gamesession_changelist')
+        add_sessions([create_user(username=f'p{i}', password='x') for i in range(2)])
+        few = changelist_queries(client, url)
+        add_sessions([create_user(username=f'q{i}', password='x') for i in range(8)])
+        assert changelist_queries(client, url) == few
+
+    def test_user_inline_bounded(self, client, admin_user, user, settings):
+        """На странице пользователя — только последние игры, только для просмотра"""
+        settings.ADMIN_INLINE_SESSIONS = 3
+        add_sessions([user], per_user=7)
+        client.force_login(admin_user)
+        response = client.get(reverse('admin:auth_user_change', args=[user.pk]))
+        assert response.status_code == 200
+        formset = next(f for f in response.context['inline_admin_formsets'] if f.opts.model is GameSession)
+        assert len(formset.formset.forms) == 3
+        assert not formset.has_add_permission and not formset.has_change_permission
+
+    def test_user_change_form_saves_with_inline(self, client, admin_user, user):
+        """Сохранение пользователя не трогает игры из ограниченного списка"""
+        add_sessions([user], per_user=2)
+        client.force_login(admin_user)
+        url = reverse('admin:auth_user_change', args=[user.pk])
+        page = client.get(url)
+        data = {
+            'username': user.username, 'email': 'changed@example.com',
+            'date_joined_0': user.date_joined.strftime('%Y-%m-%d'),
+            'date_joined_1': user.date_joined.strftime('%H:%M:%S'),
+        }
+        # Управляющие формы и скрытые поля всех инлайнов — как их отрисовала страница
+        for inline in page.context['inline_admin_formsets']:
+            formset = inline.formset
+            data.update({f'{formset.prefix}-{name}': value
+                         for name, value in formset.management_form.initial.items()})
+            if inline.has_change_permission:
+                for form in formset.forms:
+                    data.update({form.add_prefix(name): form[name].value() or ''
+                                 for name in form.fields if form[name].value() is not None})
+        response = client.post(url, data)
+        assert response.status_code == 302
+        assert User.objects.get(pk=user.pk).email == 'changed@example.com'
+        assert GameSession.objects.filter(user=user).count() == 2
+
+    def test_best_score_range_filter(self, client, admin_user, user, another_user):
+        """Фильтр лучших очков — по диапазонам, а не по каждому значению"""
+        Leaderboard.objects.filter(user=user).update(best_score=1234)
+        Leaderboard.objects.filter(user=another_user).update(best_score=12345)
+        client.force_login(admin_user)
+        url = reverse('admin:game_leaderboard_changelist')
+        response = client.get(url + '?best_score_range=10000%2B')
+        assert list(response.context['cl'].result_list.values_list('user__username', flat=True)) == ['anotheruser']
+        choices = [spec for spec in response.context['cl'].filter_specs if spec.parameter_name == 'best_score_range']
+        assert len(list(choices[0].lookup_choices)) == 4
+
+    def test_estimated_count_used_for_big_tables(self, client, admin_user, user, monkeypatch, settings):
+        """Большая таблица — число строк из оценки, без COUNT(*)"""
+        add_sessions([user], per_user=1)
+        settings.ADMIN_ESTIMATED_COUNT_THRESHOLD = 1000
+        monkeypatch.setattr(pagination, 'estimated_count', lambda queryset: 2_000_000)
+        client.force_login(admin_user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get(reverse('admin:game_gamesession_changelist'))
+        assert response.context['cl'].result_count == 2_000_000
+        assert not any('COUNT(' in q['sql'].upper() for q in ctx.captured_queries)
+
+    def test_small_tables_counted_exactly(self, user):
+        """Без оценки (не PostgreSQL) или ниже порога — точный COUNT"""
+        add_sessions([user], per_user=3)
+        assert pagination.estimated_count(GameSession.objects.all()) is None
+        assert pagination.EstimatedCountPaginator(GameSession.objects.order_by('pk'), 2).count == 3
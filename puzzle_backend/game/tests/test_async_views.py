@@ -0,0 +1,118 @@
+import asyncio
+import json
+
+import pytest
+from django.core.cache import cache
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+from game.management.commands import bench_endpoints
+from game.models import Achievement, Friendship, GameSession, UserAchievement
+
+def auth(user):
+    return {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(user)}'}
+
+def complete(user, difficulty, score):
+    GameSession.objects.create(user=user, difficulty=difficulty, game_state={}, score=score, is_completed=True)
+
+@pytest.fixture
+def players(user, another_user, create_user):
+    third = create_user(username='thirduser', password='x')
+    for player, score in ((user, 700), (another_user, 900), (third, 800)):
+        complete(player, 3, score)
+    Friendship.objects.create(from_user=user, to_user=another_user)
+    Friendship.objects.create(from_user=user, to_user=third)
+    return user, another_user, third
+
+@pytest.mark.django_db
+class TestAsyncViews:
+    """Тесты асинхронных версий read-only эндпоинтов"""
+
+    @pytest.mark.parametrize('query', [
+        {}, {'difficulty': '3'}, {'friends': 'true'}, {'date_from': '2000-01-01', 'difficulty': '3'},
+    ])
+    def test_leaderboard_matches_sync(self, client, players, query):
+        """Ответ лидерборда совпадает с синхронным"""
+        sync = client.get(reverse('leaderboard'), query, **auth(players[0]))
+        # Ключ кэша у обеих версий общий — считаем ответ заново
+        cache.clear()
+        async_ = client.get(reverse('async-leaderboard'), query, **auth(players[0]))
+        assert async_.status_code == 200
+        assert json.loads(async_.content) == sync.json()
+
+    def test_leaderboard_bad_difficulty(self, client):
+        """Недопустимая сложность — 400 с тем же текстом ошибки"""
+        sync = client.get(reverse('leaderboard'), {'difficulty': '9'})
+        response = client.get(reverse('async-leaderboard'), {'difficulty': '9'})
+        assert response.status_code == 400
+        assert json.loads(response.content) == sync.json()
+
+    def test_public_profile(self, client, user):
+        """Публичный профиль совпадает с синхронным; неизвестный игрок — 404"""
+        sync = client.get(reverse('public-profile', args=[user.username]))
+        async_ = client.get(reverse('async-public-profile', args=[user.username]))
+        assert json.loads(async_.content) == sync.json()
+        assert client.get(reverse('async-public-profile', args=['nobody'])).status_code == 404
+
+    def test_friends_paginated_like_sync(self, client, players, settings):
+        """Список друзей постраничный: те же страницы и курсоры вперёд и назад"""
+        user = players[0]
+        pages = []
+        for name in ('friends-list', 'async-friends'):
+            response = client.get(reverse(name), {'page_size': 1}, **auth(user))
+            first = json.loads(response.content)
+            second = json.loads(client.get(first['next'], **auth(user)).content)
+            assert second['next'] is None
+            back = json.loads(client.get(second['previous'], **auth(user)).content)
+            assert back['previous'] is None
+            pages.append([row['username'] for row in first['results'] + second['results'] + back['results']])
+        assert pages[0] == pages[1] == ['thirduser', 'anotheruser', 'thirduser']
+
+    def test_achievements(self, client, user):
+        """Достижения пользователя совпадают с синхронным списком"""
+        achievement = Achievement.objects.create(name='Тест', description='Описание')
+        UserAchievement.objects.create(user=user, achievement=achievement)
+        sync = client.get(reverse('achievements'), **auth(user))
+        async_ = client.get(reverse('async-achievements'), **auth(user))
+        assert json.loads(async_.content) == sync.json()
+
+    def test_requires_token(self, client):
+        """Без токена или с неверным токеном — 401; запись — 405"""
+        response = client.get(reverse('async-friends'))
+        assert response.status_code == 401
+        assert response['WWW-Authenticate'].startswith('Bearer')
+        bad = client.get(reverse('async-achievements'), HTTP_AUTHORIZATION='Bearer garbage')
+        assert bad.status_code == 401
+        assert client.post(reverse('async-leaderboard')).status_code == 405
+
+    def test_inactive_user_rejected(self, client, user):
+        """Токен отключённого пользователя не принимается"""
+        headers = auth(user)
+        user.is_active = False
+        user.save()
+        assert client.get(reverse('async-friends'), **headers).status_code == 401
+
+@pytest.mark.django_db(transaction=True)
+def test_bench_command_runs(live_server, capsys):
+    """Команда нагрузки отрабатывает на живом сервере и печатает строки для обоих путей"""
+    call_command('bench_endpoints', '--wsgi', live_server.url, '--asgi', live_server.url,
+                 '--connections', '4', '--duration', '0.5', '--warmup', '0')
+    lines = capsys.readouterr().out.splitlines()
+    assert [line.split()[:2] for line in lines[1:]] == [['leaderboard', 'wsgi'], ['leaderboard', 'asgi']]
+    assert all(line.split()[-2:] == ['0', '0'] for line in lines[1:])
+
+def test_bench_counts_timeouts():
+    """Запрос без ответа за --timeout — таймаут с этим временем в перцентилях, а не пропуск"""
+    async def run():
+        async def silent(reader, writer):
+            await reader.read()
+        server = await asyncio.start_server(silent, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            return await bench_endpoints.load(f'http://127.0.0.1:{port}/', 3, 0.3, timeout=0.2)
+
+    result = asyncio.run(run())
+    assert result['timeouts'] == 6
+    assert result['errors'] == 0
+    assert result['rps'] == 0
+    assert result['p50'] == result['p99'] == 200
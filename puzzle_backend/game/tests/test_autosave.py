@@ -0,0 +1,232 @@
+import time
+
+import pytest
+from django.urls import reverse
+from rest_framework import status
+from game import autosave
+from game.models import GameSession
+from game.signals import session_completed
+
+@pytest.fixture
+def session(authenticated_client):
+    """Сессия 3x3, созданная через API (пустая клетка в правом нижнем углу)"""
+    response = authenticated_client.post(reverse('gamesession-list'), {
+        'difficulty': 3,
+        'game_state': {
+            'tiles': [{'index': i} for i in range(9)],
+            'emptyIndex': 8,
+            'moves': 0,
+            'timer': 0,
+        },
+        'score': 0,
+        'is_completed': False,
+    }, format='json')
+    assert response.status_code == status.HTTP_201_CREATED
+    return GameSession.objects.get(pk=response.data['id'])
+
+@pytest.mark.django_db
+class TestMoveBatchAutosave:
+    """Тесты пакетного автосохранения ходов"""
+
+    def url(self, session):
+        return reverse('gamesession-moves', kwargs={'pk': session.pk})
+
+    def test_initial_tiles_recorded_on_create(self, session):
+        """При создании запоминается начальная раскладка"""
+        assert session.game_state['initialTiles'] == list(range(9))
+        assert session.game_state['moveLog'] == []
+
+    def test_batch_is_buffered_until_threshold(self, authenticated_client, session, settings):
+        """Небольшой пакет не пишется в БД до порога"""
+        settings.AUTOSAVE_SNAPSHOT_MOVES = 10
+        settings.AUTOSAVE_SNAPSHOT_SECONDS = 3600
+        settings.AUTOSAVE_BUFFER_MOVES = True
+
+        response = authenticated_client.post(self.url(session), {'moves': [7, 4], 'timer': 5}, format='json')
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data == {'moves': 2, 'timer': 5, 'emptyIndex': 4, 'saved': False}
+
+        session.refresh_from_db()
+        assert session.game_state['moves'] == 0
+
+    def test_snapshot_written_after_n_moves(self, authenticated_client, session, settings):
+        """После N ходов состояние записывается в БД"""
+        settings.AUTOSAVE_SNAPSHOT_MOVES = 4
+        settings.AUTOSAVE_SNAPSHOT_SECONDS = 3600
+        settings.AUTOSAVE_BUFFER_MOVES = True
+
+        authenticated_client.post(self.url(session), {'moves': [7, 4], 'timer': 5}, format='json')
+        response = authenticated_client.post(self.url(session), {'moves': [5, 8], 'timer': 9}, format='json')
+        assert response.data['saved'] is True
+
+        session.refresh_from_db()
+        state = session.game_state
+        assert state['moves'] == 4
+        assert state['timer'] == 9
+        assert state['emptyIndex'] == 8
+        assert state['moveLog'] == [7, 4, 5, 8]
+        assert [t['index'] for t in state['tiles']] == [0, 1, 2, 3, 5, 7, 6, 4, 8]
+
+    def test_flush_forces_snapshot(self, authenticated_client, session):
+        """flush=true сохраняет сразу"""
+        response = authenticated_client.post(
+            self.url(session), {'moves': [5], 'timer': 1, 'flush': True}, format='json'
+        )
+        assert response.data['saved'] is True
+        session.refresh_from_db()
+        assert session.game_state['emptyIndex'] == 5
+
+    def test_illegal_move_rejects_whole_batch(self, authenticated_client, session):
+        """Недопустимый ход отклоняет весь пакет с кодом 409"""
+        response = authenticated_client.post(self.url(session), {'moves': [7, 0], 'timer': 1}, format='json')
+        assert response.status_code == status.HTTP_409_CONFLICT
+        assert response.data['game_state']['emptyIndex'] == 8
+
+        response = authenticated_client.post(
+            self.url(session), {'moves': [7], 'timer': 2, 'flush': True}, format='json'
+        )
+        assert response.data['moves'] == 1
+
+    def test_full_patch_keeps_move_log(self, authenticated_client, session):
+        """Полный PATCH после пакета сохраняет лог ходов из буфера"""
+        authenticated_client.post(self.url(session), {'moves': [7, 4], 'timer': 3}, format='json')
+        response = authenticated_client.patch(
+            reverse('gamesession-detail', kwargs={'pk': session.pk}),
+            {'game_state': {
+                'tiles': [{'index': i} for i in [0, 1, 2, 3, 8, 5, 6, 4, 7]],
+                'emptyIndex': 4, 'moves': 2, 'timer': 4,
+            }},
+            format='json'
+        )
+        assert response.status_code == status.HTTP_200_OK
+        session.refresh_from_db()
+        assert session.game_state['moveLog'] == [7, 4]
+        assert session.game_state['initialTiles'] == list(range(9))
+
+    def test_foreign_session_not_found(self, api_client, another_user, session):
+        """Чужую сессию нельзя дополнять ходами"""
+        api_client.force_authenticate(user=another_user)
+        response = api_client.post(self.url(session), {'moves': [7], 'timer': 1}, format='json')
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_unsaved_moves_outlive_buffer_timeout(self, authenticated_client, session, settings, monkeypatch):
+        """Буфер с незаписанными ходами не истекает; записанный — истекает через BUFFER_TIMEOUT"""
+        settings.AUTOSAVE_SNAPSHOT_MOVES = 10
+        settings.AUTOSAVE_SNAPSHOT_SECONDS = 3600
+        settings.AUTOSAVE_BUFFER_MOVES = True
+        monkeypatch.setattr(autosave, 'BUFFER_TIMEOUT', 1)
+        authenticated_client.post(self.url(session), {'moves': [7, 4], 'timer': 5}, format='json')
+        time.sleep(1.1)
+        assert autosave.load_buffer(session.pk, session.user_id)['pending'] == 2
+
+        authenticated_client.post(self.url(session), {'moves': [], 'timer': 6, 'flush': True}, format='json')
+        time.sleep(1.1)
+        assert autosave.load_buffer(session.pk, session.user_id) is None
+        session.refresh_from_db()
+        assert session.game_state['moveLog'] == [7, 4]
+        assert session.game_state['timer'] == 6
+
+    def test_buffer_evicted_between_flushes(self, authenticated_client, session, settings):
+        """Без общего кэша каждый пакет в БД: вытеснение буфера не теряет и не путает ходы"""
+        settings.AUTOSAVE_BUFFER_MOVES = False
+        response = authenticated_client.post(self.url(session), {'moves': [7, 4], 'timer': 5, 'base': 0},
+                                             format='json')
+        assert response.data['saved'] is True
+        autosave.discard_buffer(session.pk)
+
+        response = authenticated_client.post(self.url(session), {'moves': [5], 'timer': 6, 'base': 2},
+                                             format='json')
+        assert response.status_code == status.HTTP_200_OK
+        session.refresh_from_db()
+        assert session.game_state['moveLog'] == [7, 4, 5]
+        assert session.game_state['emptyIndex'] == 5
+
+    def test_evicted_buffer_rejects_continuation(self, authenticated_client, session, settings):
+        """Пропавший буфер с незаписанными ходами: пакет не ложится на старую доску, а получает 409"""
+        settings.AUTOSAVE_SNAPSHOT_MOVES = 10
+        settings.AUTOSAVE_SNAPSHOT_SECONDS = 3600
+        settings.AUTOSAVE_BUFFER_MOVES = True
+        authenticated_client.post(self.url(session), {'moves': [7, 4], 'timer': 5, 'base': 0}, format='json')
+        autosave.discard_buffer(session.pk)
+
+        response = authenticated_client.post(self.url(session), {'moves': [5], 'timer': 6, 'base': 2},
+                                             format='json')
+        assert response.status_code == status.HTTP_409_CONFLICT
+        assert response.data['game_state']['moves'] == 0
+        session.refresh_from_db()
+        assert session.game_state['moveLog'] == []
+
+    def test_session_read_includes_buffered_moves(self, authenticated_client, session, settings):
+        """Список и карточка сессии отдают состояние с ещё не записанными ходами"""
+        settings.AUTOSAVE_SNAPSHOT_MOVES = 10
+        settings.AUTOSAVE_SNAPSHOT_SECONDS = 3600
+        settings.AUTOSAVE_BUFFER_MOVES = True
+        authenticated_client.post(self.url(session), {'moves': [7, 4], 'timer': 5}, format='json')
+
+        listed = authenticated_client.get(reverse('gamesession-list')).data['results'][0]
+        detail = authenticated_client.get(reverse('gamesession-detail', kwargs={'pk': session.pk})).data
+        for state in (listed['game_state'], detail['game_state']):
+            assert state['moves'] == 2
+            assert state['moveLog'] == [7, 4]
+
+    def test_patch_cannot_rewrite_board(self, authenticated_client, session):
+        """PATCH не подменяет раскладку и лог ходов: они только из API ходов"""
+        authenticated_client.post(self.url(session), {'moves': [7], 'timer': 3}, format='json')
+        for moves in (2, 0):
+            authenticated_client.patch(
+                reverse('gamesession-detail', kwargs={'pk': session.pk}),
+                {'game_state': {
+                    'tiles': [{'index': i} for i in [0, 1, 2, 3, 4, 5, 6, 8, 7]],
+                    'emptyIndex': 8, 'moves': moves, 'timer': 4,
+                    'initialTiles': [0, 1, 2, 3, 4, 5, 6, 8, 7], 'moveLog': [8],
+                }},
+                format='json'
+            )
+            session.refresh_from_db()
+            assert session.game_state['moveLog'] == [7]
+            assert session.game_state['initialTiles'] == list(range(9))
+            assert session.game_state['emptyIndex'] == 7
+            assert session.game_state['moves'] == 1
+            assert session.game_state['timer'] == 4
+        assert autosave.load_buffer(session.pk, session.user_id) is None
+
+    def test_create_ignores_client_log(self, authenticated_client):
+        """При создании лог ходов пуст, начальная раскладка — присланная доска"""
+        response = authenticated_client.post(reverse('gamesession-list'), {
+            'difficulty': 3,
+            'game_state': {
+                'tiles': [{'index': i} for i in range(9)], 'emptyIndex': 8, 'moves': 2, 'timer': 0,
+                'initialTiles': [0, 1, 2, 3, 4, 5, 6, 8, 7], 'moveLog': [8],
+            },
+        }, format='json')
+        game_state = GameSession.objects.get(pk=response.data['id']).game_state
+        assert (game_state['initialTiles'], game_state['moveLog'], game_state['moves']) == (list(range(9)), [], 0)
+
+@pytest.mark.django_db
+class TestNewGameAbandonsPrevious:
+    """Тесты закрытия незавершённой игры при старте новой"""
+
+    def test_abandoned_without_completion(self, authenticated_client, session, settings,
+                                          django_capture_on_commit_callbacks):
+        """Брошенная игра закрывается без очков, сигнала завершения и буфера ходов"""
+        settings.AUTOSAVE_SNAPSHOT_MOVES = 10
+        settings.AUTOSAVE_SNAPSHOT_SECONDS = 3600
+        settings.AUTOSAVE_BUFFER_MOVES = True
+        authenticated_client.post(reverse('gamesession-moves', kwargs={'pk': session.pk}),
+                                  {'moves': [7], 'timer': 2}, format='json')
+        completed = []
+        session_completed.connect(lambda sender, session, **kwargs: completed.append(session),
+                                  weak=False, dispatch_uid='test-abandon')
+        try:
+            with django_capture_on_commit_callbacks(execute=True):
+                response = authenticated_client.post(reverse('gamesession-list'), {
+                    'difficulty': 4, 'game_state': {'tiles': [{'index': i} for i in range(16)], 'emptyIndex': 15},
+                }, format='json')
+        finally:
+            session_completed.disconnect(dispatch_uid='test-abandon')
+        assert response.status_code == status.HTTP_201_CREATED
+        assert completed == []
+        session.refresh_from_db()
+        assert session.is_completed and session.score == 0
+        assert session.time_played is not None
+        assert autosave.load_buffer(session.pk, session.user_id) is None
@@ -0,0 +1,72 @@
+import random
+import pytest
+from game.engine import Board, IllegalMoveError, InvalidBoardError, first_illegal_move, replay
+
+class TestBoard:
+    """Тесты игрового движка"""
+
+    def test_solved_board(self):
+        """Собранная доска: пустая клетка в правом нижнем углу"""
+        board = Board.solved(4)
+        assert board.is_solved()
+        assert board.blank == 15
+        assert sorted(board.legal_moves()) == [11, 14]
+
+    def test_from_state_and_back(self):
+        """Преобразование из формата фронтенда и обратно"""
+        state = {'tiles': [{'index': i} for i in [0, 1, 2, 3, 4, 5, 6, 8, 7]]}
+        board = Board.from_state(state)
+        assert board.blank == 7
+        assert board.state_tiles() == state['tiles']
+
+    def test_invalid_state_rejected(self):
+        """Не перестановка — ошибка"""
+        with pytest.raises(InvalidBoardError):
+            Board.from_state({'tiles': [{'index': 0}] * 9})
+        with pytest.raises(InvalidBoardError):
+            Board.from_state({'tiles': [{'index': i} for i in range(8)]})
+
+    def test_apply_moves_matches_single_moves(self):
+        """Пакетное применение равно последовательным ходам"""
+        rng = random.Random(7)
+        board = Board.solved(5)
+        moves = []
+        for _ in range(200):
+            moves.append(rng.choice(board.legal_moves()))
+            board.move(moves[-1])
+        batch = Board.solved(5)
+        batch.apply_moves(moves)
+        assert batch == board
+        assert batch.blank == board.blank
+
+    def test_illegal_batch_leaves_board_unchanged(self):
+        """Недопустимый ход отклоняет весь пакет"""
+        board = Board.solved(3)
+        with pytest.raises(IllegalMoveError) as exc:
+            board.apply_moves([7, 4, 0])
+        assert exc.value.offset == 2
+        assert board.is_solved()
+
+    def test_first_illegal_move(self):
+        """Проверка пакета по пути пустой клетки"""
+        assert first_illegal_move(3, 8, [7, 6, 3, 4]) == -1
+        assert first_illegal_move(3, 8, [7, 8, 2]) == 2
+        assert first_illegal_move(3, 8, [9]) == 0
+        assert first_illegal_move(3, 8, []) == -1
+
+    def test_solvability_parity(self):
+        """Решаемость: случайные ходы сохраняют, обмен двух плиток ломает"""
+        rng = random.Random(3)
+        for size in (3, 4, 5):
+            board = Board.solved(size)
+            for _ in range(100):
+                board.move(rng.choice(board.legal_moves()))
+            assert board.is_solvable()
+            swapped = board.copy()
+            a, b = [pos for pos in range(size * size) if pos != board.blank][:2]
+            swapped.tiles[a], swapped.tiles[b] = swapped.tiles[b], swapped.tiles[a]
+            assert not swapped.is_solvable()
+
+    def test_replay(self):
+        """Повтор лога ходов от начальной раскладки"""
+        assert replay([0, 1, 2, 3, 4, 5, 6, 8, 7], [8]).is_solved()
@@ -0,0 +1,115 @@
+import csv
+import io
+from datetime import timedelta
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from openpyxl import load_workbook
+from game import exports
+from game.models import GameSession
+
+@pytest.fixture(autouse=True)
+def export_settings(tmp_path, settings):
+    """Файлы выгрузок — во временном каталоге, задачи выполняются синхронно"""
+    settings.EXPORT_DIR = tmp_path / 'exports'
+    settings.EXPORT_WORKERS = 0
+    settings.EXPORT_CHUNK_SIZE = 2
+
+@pytest.fixture
+def sessions(user, another_user):
+    GameSession.objects.create(user=user, difficulty=3, score=900, is_completed=True, game_state={},
+                               time_played=timedelta(seconds=95))
+    GameSession.objects.create(user=user, difficulty=4, score=0, game_state={})
+    GameSession.objects.create(user=another_user, difficulty=5, score=4000, is_completed=True, game_state={},
+                               time_played=timedelta(seconds=300))
+
+def read_csv(response):
+    content = b''.join(response.streaming_content).decode('utf-8')
+    return list(csv.reader(io.StringIO(content)))
+
+@pytest.mark.django_db
+class TestStreamingExport:
+    """Тесты потоковой и фоновой выгрузки сессий из админки"""
+
+    def test_csv_streamed(self, client, admin_user, sessions):
+        """CSV отдаётся потоком: заголовок и строки в формате ресурса"""
+        client.force_login(admin_user)
+        response = client.get(reverse('admin:game_gamesession_export_csv'))
+        assert response.status_code == 200
+        assert response.streaming
+        rows = read_csv(response)
+        assert rows[0] == list(exports.HEADERS)
+        assert ['anotheruser', '5x5', '4000', 'Да', '300'] in [row[:5] for row in rows[1:]]
+        assert len(rows) == 4
+
+    def test_csv_respects_filters(self, client, admin_user, sessions):
+        """Фильтры списка применяются к выгрузке"""
+        client.force_login(admin_user)
+        response = client.get(reverse('admin:game_gamesession_export_csv') + '?is_completed__exact=0')
+        rows = read_csv(response)
+        assert len(rows) == 2
+        assert rows[1][:4] == ['testuser', '4x4', '0', 'Нет']
+
+    def test_rows_single_query(self, sessions):
+        """Имя игрока читается через JOIN: один запрос на пачку, а не на строку"""
+        with CaptureQueriesContext(connection) as ctx:
+            rows = list(exports.rows(GameSession.objects.all()))
+        assert len(rows) == 3
+        assert len(ctx.captured_queries) == 1
+
+    def test_xlsx_job(self, client, admin_user, sessions):
+        """Фоновая выгрузка XLSX: прогресс в кэше и готовый файл для скачивания"""
+        client.force_login(admin_user)
+        response = client.post(reverse('admin:game_gamesession_export_xlsx'))
+        assert response.status_code == 302
+        progress_url = response['Location']
+
+        state = client.get(progress_url + '?format=json').json()
+        assert state == {'status': 'done', 'rows': 3, 'total': 3}
+        page = client.get(progress_url)
+        assert 'Скачать XLSX' in page.content.decode('utf-8')
+
+        download = client.get(progress_url + 'download/')
+        assert download.status_code == 200
+        workbook = load_workbook(io.BytesIO(b''.join(download.streaming_content)), read_only=True)
+        values = list(workbook.active.values)
+        assert values[0] == exports.HEADERS
+        assert len(values) == 4
+
+    def test_xlsx_splits_sheets(self, monkeypatch, sessions):
+        """Сверх лимита строк листа начинается новый лист с тем же заголовком"""
+        monkeypatch.setattr(exports, 'SHEET_ROWS', 2)
+        exports.write_xlsx('split', GameSession.objects.order_by('pk'))
+        workbook = load_workbook(exports.path('split'), read_only=True)
+        assert workbook.sheetnames == ['Сессии', 'Сессии 2']
+        first, second = (list(sheet.values) for sheet in workbook.worksheets)
+        assert first[0] == second[0] == exports.HEADERS
+        assert (len(first), len(second)) == (3, 2)
+        assert exports.state('split') == {'status': 'done', 'rows': 3, 'total': 3}
+
+    def test_interrupted_job_fails(self, sessions):
+        """Задача running без аренды (процесс погиб) помечается failed"""
+        exports._set_state('job', status='running', rows=2, total=3)
+        exports._track('job')
+        assert exports.state('job')['status'] == 'running'
+
+        with exports._active_lock:
+            exports._active.discard('job')
+        cache.delete(exports._lease_key('job'))
+        assert exports.state('job') == {'status': 'failed', 'rows': 2, 'total': 3}
+        assert cache.get(exports._key('job'))['status'] == 'failed'
+
+    def test_unknown_job(self, client, admin_user):
+        """Неизвестная задача — 404"""
+        client.force_login(admin_user)
+        url = reverse('admin:game_gamesession_export_progress', args=['00000000-0000-0000-0000-000000000000'])
+        assert client.get(url).status_code == 404
+
+    def test_requires_staff(self, client, user, sessions):
+        """Выгрузка недоступна обычному пользователю"""
+        client.force_login(user)
+        response = client.get(reverse('admin:game_gamesession_export_csv'))
+        assert response.status_code == 302
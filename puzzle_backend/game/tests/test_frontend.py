@@ -0,0 +1,76 @@
+import json
+
+import pytest
+from django.core.management import call_command
+from django.test import Client, override_settings
+from game import frontend
+
+MANIFEST_STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage'},
+}
+
+@pytest.fixture(autouse=True)
+def fresh_shell():
+    """Оболочка кэшируется на процесс — между тестами рендерим заново"""
+    frontend._render.cache_clear()
+    yield
+    frontend._render.cache_clear()
+
+@pytest.fixture(scope='module')
+def collected(tmp_path_factory):
+    """Статика, собранная как в production: хэши в именах, .gz и .br"""
+    root = tmp_path_factory.mktemp('static')
+    with override_settings(STATIC_ROOT=root, STORAGES=MANIFEST_STORAGES):
+        call_command('collectstatic', interactive=False, verbosity=0)
+        yield root
+
+class TestShell:
+    """Тесты HTML-оболочки фронтенда"""
+
+    def test_shell_without_inline_code(self, client):
+        """Скрипт и стили — отдельными файлами, оболочка перепроверяется по ETag"""
+        response = client.get('/')
+        assert response.status_code == 200
+        html = response.content.decode()
+        assert 'game.js' in html and 'game.css' in html
+        assert '<style>' not in html and 'function updateAuthUI' not in html
+        assert response['ETag']
+        assert 'no-cache' in response['Cache-Control']
+
+    def test_repeat_visit_not_modified(self, client):
+        """Повторный визит с ETag — 304 без тела, в том числе после сжатия ответа"""
+        first = client.get('/', HTTP_ACCEPT_ENCODING='gzip')
+        assert first['Content-Encoding'] == 'gzip'
+        repeat = client.get('/', HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=first['ETag'])
+        assert repeat.status_code == 304
+        assert repeat.content == b''
+
+    def test_post_not_allowed(self, client):
+        """Оболочка отдаётся только на GET/HEAD"""
+        assert client.post('/').status_code == 405
+
+class TestCollectedStatic:
+    """Тесты статики, собранной collectstatic"""
+
+    def test_hashed_and_precompressed(self, collected):
+        """В манифесте — имена с хэшем; рядом лежат .gz и .br"""
+        paths = json.loads((collected / 'staticfiles.json').read_text())['paths']
+        for name in ('game.js', 'game.css', 'styles.css'):
+            hashed = collected / paths[name]
+            assert hashed.name != name
+            assert hashed.with_name(hashed.name + '.gz').exists()
+            assert hashed.with_name(hashed.name + '.br').exists()
+
+    def test_shell_links_hashed_files_served_immutable(self, collected):
+        """Оболочка ссылается на хэшированные файлы, они отдаются с immutable и brotli"""
+        paths = json.loads((collected / 'staticfiles.json').read_text())['paths']
+        client = Client()
+        html = client.get('/').content.decode()
+        url = f'/static/{paths["game.js"]}'
+        assert url in html
+        response = client.get(url, HTTP_ACCEPT_ENCODING='gzip, br')
+        assert response.status_code == 200
+        assert 'immutable' in response['Cache-Control']
+        assert response['Content-Encoding'] == 'br'
+        response.close()
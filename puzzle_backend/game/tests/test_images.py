@@ -0,0 +1,134 @@
+import io
+import json
+import os
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from PIL import Image
+from game import images
+from game.management.commands import fill_image_pool
+
+@pytest.fixture
+def pool(tmp_path, settings):
+    """Пул из двух картинок и пустой кэш спрайтов; плитка 20 px"""
+    settings.PUZZLE_IMAGE_POOL_DIR = tmp_path / 'pool'
+    settings.PUZZLE_IMAGE_CACHE_DIR = tmp_path / 'cache'
+    settings.PUZZLE_IMAGE_TILE_SIZE = 20
+    settings.PUZZLE_IMAGE_POOL_DIR.mkdir()
+    Image.new('RGB', (120, 90), 'red').save(settings.PUZZLE_IMAGE_POOL_DIR / 'cat1.jpg')
+    Image.new('RGB', (90, 120), 'blue').save(settings.PUZZLE_IMAGE_POOL_DIR / 'cat2.png')
+    return settings.PUZZLE_IMAGE_POOL_DIR
+
+def sprite_url(source_id, difficulty):
+    return reverse('puzzle-image-sprite', kwargs={'source_id': source_id, 'difficulty': difficulty})
+
+class TestPuzzleImageApi:
+    """Тесты API картинок пазла"""
+
+    def test_describes_sprite(self, api_client, pool):
+        """Описание содержит URL спрайта и смещения плиток"""
+        response = api_client.get(reverse('puzzle-image'), {'difficulty': 4})
+        assert response.status_code == 200
+        assert response.data['id'] in ('cat1', 'cat2')
+        assert response.data['url'] == sprite_url(response.data['id'], 4)
+        assert response.data['width'] == response.data['height'] == 80
+        assert response.data['tiles'][5] == [20, 20]
+        assert len(response.data['tiles']) == 16
+
+    def test_empty_pool(self, api_client, tmp_path, settings):
+        """Без пула — 404, фронтенд берёт внешнюю картинку"""
+        settings.PUZZLE_IMAGE_POOL_DIR = tmp_path / 'missing'
+        assert api_client.get(reverse('puzzle-image')).status_code == 404
+
+    def test_invalid_difficulty(self, api_client, pool):
+        """Неизвестная сложность — ошибка валидации"""
+        assert api_client.get(reverse('puzzle-image'), {'difficulty': 7}).status_code == 400
+
+    def test_sprite_rendered_once(self, api_client, pool, monkeypatch):
+        """Спрайт строится при первом запросе, затем отдаётся с диска"""
+        response = api_client.get(sprite_url('cat1', 3))
+        assert response.status_code == 200
+        assert response['Content-Type'] == 'image/jpeg'
+        assert 'immutable' in response['Cache-Control']
+        with Image.open(io.BytesIO(b''.join(response.streaming_content))) as sprite:
+            assert sprite.size == (60, 60)
+
+        monkeypatch.setattr(images, 'render', lambda *args: pytest.fail("спрайт уже в кэше"))
+        assert api_client.get(sprite_url('cat1', 3)).status_code == 200
+
+    def test_unknown_source(self, api_client, pool):
+        """Неизвестный исходник — 404"""
+        assert api_client.get(sprite_url('nope', 3)).status_code == 404
+        assert api_client.get(sprite_url('cat1', 6)).status_code == 404
+
+class TestImageCache:
+    """Тесты дискового LRU-кэша спрайтов"""
+
+    def test_evicts_least_recently_used(self, pool, settings):
+        """При переполнении удаляются давно не использованные спрайты"""
+        old = images.sprite('cat1', 3)
+        recent = images.sprite('cat2', 3)
+        os.utime(old, (1, 1))
+        removed = images.evict(limit=recent.stat().st_size)
+        assert removed == 1
+        assert not old.exists()
+        assert recent.exists()
+
+    def test_cache_hit_refreshes_mtime(self, pool):
+        """Обращение к спрайту продлевает его жизнь в кэше"""
+        path = images.sprite('cat1', 3)
+        os.utime(path, (1, 1))
+        images.sprite('cat1', 3)
+        assert path.stat().st_mtime > 1
+
+    def test_sprite_evicted_before_open(self, api_client, pool, monkeypatch):
+        """Спрайт, удалённый другим воркером до open(), строится заново"""
+        sprite = images.sprite
+
+        def evicted(*args):
+            path = sprite(*args)
+            if not hasattr(evicted, 'done'):
+                evicted.done = True
+                os.remove(path)
+            return path
+
+        monkeypatch.setattr(images, 'sprite', evicted)
+        response = api_client.get(sprite_url('cat1', 3))
+        assert response.status_code == 200
+        assert b''.join(response.streaming_content)
+
+    def test_pool_listing_cached(self, pool, monkeypatch):
+        """Каталог пула перечитывается только после его изменения"""
+        assert images.random_source() in ('cat1', 'cat2')
+        iterdir = images.Path.iterdir
+        monkeypatch.setattr(images.Path, 'iterdir', lambda self: pytest.fail("список не изменился"))
+        assert set(images.sources()) == {'cat1', 'cat2'}
+        monkeypatch.setattr(images.Path, 'iterdir', iterdir)
+        Image.new('RGB', (50, 50), 'green').save(pool / 'cat3.jpg')
+        assert set(images.sources()) == {'cat1', 'cat2', 'cat3'}
+
+class TestFillImagePool:
+    """Тесты команды пополнения пула"""
+
+    def test_downloads_and_prerenders(self, pool, monkeypatch):
+        """Картинки скачиваются, GIF пропускаются, спрайты строятся заранее"""
+        buffer = io.BytesIO()
+        Image.new('RGB', (200, 100), 'green').save(buffer, 'JPEG')
+        responses = {
+            'api-jpg': json.dumps([{'url': 'https://cats/a.jpg'}]).encode(),
+            'api-gif': json.dumps([{'url': 'https://cats/b.gif'}]).encode(),
+            'https://cats/a.jpg': buffer.getvalue(),
+        }
+        calls = iter(['api-jpg', 'api-gif'])
+        monkeypatch.setattr(fill_image_pool, 'download',
+                            lambda url: responses[next(calls) if url == 'api' else url])
+
+        call_command('fill_image_pool', '--count', '2', '--api-url', 'api', '--workers', '1')
+
+        added = set(images.sources()) - {'cat1', 'cat2'}
+        assert len(added) == 1
+        source_id = added.pop()
+        with Image.open(images.sources()[source_id]) as image:
+            assert image.size == (100, 100)
+        assert all(images.sprite_path(source_id, d).exists() for d in (3, 4, 5))
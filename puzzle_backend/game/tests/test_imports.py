@@ -0,0 +1,83 @@
+import pytest
+import tablib
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from game.admin import GameSessionResource
+from game.models import GameSession, Leaderboard, LeaderboardEntry, UserAchievement
+from game.tests.test_query_counts import statements
+
+HEADERS = ('Игрок', 'Сложность', 'Очки', 'Завершена', 'Время игры', 'Обновлено')
+
+def dataset(rows):
+    return tablib.Dataset(*rows, headers=HEADERS)
+
+def sessions_of(user, count, difficulty='3x3', score=500):
+    return [(user.username, difficulty, score + i, 'Да', 90, '') for i in range(count)]
+
+@pytest.mark.django_db
+class TestBulkImport:
+    """Тесты пакетного импорта сессий"""
+
+    def test_import_and_recompute(self, user, another_user):
+        """Строки вставляются, рекорды и достижения пересчитываются в конце"""
+        rows = sessions_of(user, 3) + [(another_user.username, '5x5', 7000, 'Да', 400, ''),
+                                      (another_user.username, '4x4', 0, 'Нет', '', '')]
+        result = GameSessionResource().import_data(dataset(rows), dry_run=False)
+        assert not result.has_errors() and not result.has_validation_errors()
+        assert GameSession.objects.count() == 5
+
+        session = GameSession.objects.get(user=another_user, difficulty=5)
+        assert session.is_completed and session.time_played.total_seconds() == 400
+        assert Leaderboard.objects.get(user=user).best_score == 502
+        assert Leaderboard.objects.get(user=another_user).best_score == 7000
+        assert LeaderboardEntry.objects.filter(user=another_user).count() == 1
+        assert set(UserAchievement.objects.filter(user=another_user)
+                   .values_list('achievement__code', flat=True)) == {'first_win', 'first_5x5'}
+
+    def test_queries_independent_of_rows(self, user, another_user):
+        """Число запросов не растёт с числом строк (кроме деления INSERT по лимиту параметров БД)"""
+        def count(rows):
+            GameSession.objects.all().delete()
+            with CaptureQueriesContext(connection) as ctx:
+                GameSessionResource().import_data(dataset(rows), dry_run=False)
+            return len([sql for sql in statements(ctx) if not sql.startswith('INSERT INTO "game_gamesession"')])
+
+        small = count(sessions_of(user, 2) + sessions_of(another_user, 2))
+        large = count(sessions_of(user, 60) + sessions_of(another_user, 60))
+        assert small == large
+
+    def test_records_written_in_one_pass(self, user, another_user):
+        """Рекорды по сложности пишутся одним проходом, а не на каждую завершённую строку"""
+        rows = sessions_of(user, 30) + sessions_of(another_user, 30, difficulty='4x4')
+        with CaptureQueriesContext(connection) as ctx:
+            GameSessionResource().import_data(dataset(rows), dry_run=False)
+        table = '"game_leaderboardentry"'
+        writes = [sql.split()[0] for sql in statements(ctx)
+                  if sql.startswith((f'INSERT INTO {table}', f'UPDATE {table}', f'DELETE FROM {table}'))]
+        assert writes == ['DELETE', 'INSERT']
+        assert LeaderboardEntry.objects.get(user=another_user, difficulty=4).best_score == 529
+
+    def test_unknown_player_and_difficulty(self, user):
+        """Неизвестный игрок или сложность — ошибка строки, ничего не вставляется"""
+        rows = [('ghost', '3x3', 100, 'Да', 10, ''), (user.username, '7x7', 100, 'Да', 10, '')]
+        result = GameSessionResource().import_data(dataset(rows), dry_run=False)
+        assert result.has_validation_errors()
+        assert [row.number for row in result.invalid_rows] == [1, 2]
+        assert not GameSession.objects.exists()
+
+    def test_dry_run(self, user):
+        """Пробный импорт ничего не сохраняет и не пересчитывает"""
+        GameSessionResource().import_data(dataset(sessions_of(user, 2)), dry_run=True)
+        assert not GameSession.objects.exists()
+        assert Leaderboard.objects.get(user=user).best_score == 0
+
+    def test_export_round_trip(self, user):
+        """Выгрузка ресурса читается обратно импортом"""
+        GameSession.objects.create(user=user, difficulty=4, score=1500, is_completed=True, game_state={})
+        exported = GameSessionResource().export()
+        assert exported.dict[0]['Сложность'] == '4x4'
+        assert exported.dict[0]['Завершена'] == 'Да'
+
+        result = GameSessionResource().import_data(exported, dry_run=False)
+        assert not result.has_validation_errors()
+        assert GameSession.objects.filter(user=user, difficulty=4, score=1500).count() == 2
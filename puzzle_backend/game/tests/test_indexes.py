@@ -0,0 +1,33 @@
+import pytest
+from game.management.commands.explain_hot_queries import hot_queries, sequential_scans
+
+PG_PLAN = """Limit  (cost=0.29..4.51 rows=50 width=12)
+  ->  Index Scan using game_entry_rank_idx on game_leaderboardentry  (cost=0.29..84.31 rows=995 width=12)
+        Index Cond: ((difficulty = 4) AND (best_score > 0))"""
+
+PG_SEQ_PLAN = """Sort  (cost=1.05..1.06 rows=3 width=8)
+  ->  Seq Scan on game_challenge  (cost=0.00..1.03 rows=3 width=8)"""
+
+SQLITE_PLAN = """4 0 0 SEARCH game_challenge USING INDEX game_challenge_inbox_idx (to_user_id=?)
+6 0 0 SCAN game_leaderboard USING INDEX game_leaderboard_rank_idx"""
+
+@pytest.mark.django_db
+class TestHotQueryPlans:
+    """Тесты проверки планов горячих запросов"""
+
+    def test_postgres_plan_parsing(self):
+        """Seq Scan в плане PostgreSQL считается ошибкой"""
+        assert sequential_scans(PG_PLAN, 'postgresql') == []
+        assert sequential_scans(PG_SEQ_PLAN, 'postgresql') == [
+            '->  Seq Scan on game_challenge  (cost=0.00..1.03 rows=3 width=8)'
+        ]
+
+    def test_sqlite_plan_parsing(self):
+        """SCAN без индекса в плане SQLite считается ошибкой"""
+        assert sequential_scans(SQLITE_PLAN, 'sqlite') == []
+        assert sequential_scans('2 0 0 SCAN game_challenge', 'sqlite') == ['2 0 0 SCAN game_challenge']
+
+    def test_hot_queries_are_explainable(self, user):
+        """Все горячие запросы строятся и выполняются"""
+        for name, queryset in hot_queries(user):
+            assert queryset.explain(), name
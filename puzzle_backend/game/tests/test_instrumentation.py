@@ -0,0 +1,88 @@
+import json
+import logging
+
+import pytest
+from django.contrib.auth.models import User
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+from game import instrumentation
+from game.models import Friendship
+
+@pytest.fixture
+def records(settings, caplog):
+    """Замеры включены; строки логгера game.requests (он не передаёт записи корню)"""
+    settings.REQUEST_INSTRUMENTATION = True
+    instrumentation.logger.addHandler(caplog.handler)
+    caplog.set_level(logging.INFO, logger='game.requests')
+    yield lambda: [json.loads(record.getMessage()) for record in caplog.records if record.name == 'game.requests']
+    instrumentation.logger.removeHandler(caplog.handler)
+
+@pytest.fixture
+def friends(user, create_user):
+    others = [create_user(username=f'friend{i:02d}', password='x') for i in range(30)]
+    Friendship.objects.bulk_create([Friendship(from_user=user, to_user=other) for other in others])
+    return others
+
+def middleware(get_response):
+    return instrumentation.RequestInstrumentationMiddleware(get_response)
+
+@pytest.mark.django_db
+class TestRequestInstrumentation:
+    """Тесты замеров запросов"""
+
+    def test_disabled_by_default(self, client):
+        """Без настройки заголовка Server-Timing нет"""
+        assert 'Server-Timing' not in client.get(reverse('leaderboard'))
+
+    def test_server_timing_and_log_line(self, authenticated_client, friends, records):
+        """Заголовок Server-Timing и строка JSON с представлением и замерами"""
+        response = authenticated_client.get(reverse('friends-list'))
+        assert response.status_code == 200
+        timing = response['Server-Timing']
+        assert timing.startswith('db;dur=') and 'ser;dur=' in timing and 'app;dur=' in timing
+        line = records()[0]
+        assert line['view'] == 'friends-list'
+        assert line['status'] == 200
+        assert line['db_queries'] >= 1
+        assert line['serializer_ms'] > 0
+        assert line['response_bytes'] == len(response.content)
+
+    def test_async_view_queries_counted(self, client, user, friends, records):
+        """Запросы асинхронного представления (в потоках sync_to_async) тоже считаются"""
+        response = client.get(reverse('async-friends'), HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+        assert response.status_code == 200
+        line = records()[0]
+        assert line['view'] == 'async-friends'
+        # Пользователь по токену и страница друзей
+        assert line['db_queries'] == 2
+
+    def test_n_plus_one_flagged(self, user, settings, records):
+        """Один и тот же запрос больше порога раз — предупреждение с текстом запроса"""
+        settings.N_PLUS_ONE_THRESHOLD = 5
+
+        def view(request):
+            for pk in range(8):
+                User.objects.filter(pk=pk).exists()
+            User.objects.filter(username__in=['a', 'b']).exists()
+            return HttpResponse('ok')
+
+        middleware(view)(RequestFactory().get('/loop/'))
+        warnings = [line for line in records() if line.get('n_plus_one')]
+        assert len(warnings) == 1
+        assert warnings[0]['count'] == 8
+        assert 'auth_user' in warnings[0]['sql']
+
+    def test_no_warning_below_threshold(self, user, settings, records):
+        """Разные запросы и повторы до порога предупреждений не дают"""
+        settings.N_PLUS_ONE_THRESHOLD = 10
+        response = middleware(lambda request: HttpResponse(str(User.objects.count())))(RequestFactory().get('/'))
+        assert not [line for line in records() if line.get('n_plus_one')]
+        assert 'desc="1 queries"' in response['Server-Timing']
+
+    def test_shape_ignores_parameters(self):
+        """Форма запроса не зависит от значений и длины списков IN"""
+        assert instrumentation.shape('SELECT 1 FROM t WHERE id IN (%s, %s) AND n = 5') == \
+            instrumentation.shape('SELECT 1 FROM t WHERE id IN (%s, %s, %s) AND n = 7')
+        assert instrumentation.shape("SELECT 'a''b'") == 'SELECT ?'
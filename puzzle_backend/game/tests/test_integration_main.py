@@ -170,7 +170,7 @@ class TestIntegrationMain:
         # Получаем входящие вызовы
         response = api_client.get(challenges_url)
         assert response.status_code == status.HTTP_200_OK
-        assert len(response.data) > 0
+        assert len(response.data['results']) > 0
         
         print("Сценарий дружбы и вызова выполнен успешно!")
         
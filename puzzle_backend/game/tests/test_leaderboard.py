@@ -0,0 +1,177 @@
+import pytest
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.urls import reverse
+from game.models import Friendship, GameSession, Leaderboard, LeaderboardEntry
+
+def complete(user, difficulty, score):
+    return GameSession.objects.create(
+        user=user, difficulty=difficulty, game_state={'tiles': []}, score=score, is_completed=True
+    )
+
+@pytest.mark.django_db
+class TestLeaderboardEntries:
+    """Тесты рекордов по сложностям"""
+
+    def test_entries_track_best_per_difficulty(self, user):
+        """Рекорд хранится отдельно для каждой сложности"""
+        complete(user, 3, 5000)
+        complete(user, 3, 7000)
+        complete(user, 3, 6000)
+        complete(user, 4, 2000)
+
+        entries = dict(LeaderboardEntry.objects.filter(user=user).values_list('difficulty', 'best_score'))
+        assert entries == {3: 7000, 4: 2000}
+        assert Leaderboard.objects.get(user=user).best_score == 7000
+
+    def test_view_reads_per_difficulty_top(self, api_client, user, another_user):
+        """Топ по сложности берётся из таблицы рекордов"""
+        complete(user, 3, 5000)
+        complete(another_user, 3, 8000)
+        complete(another_user, 4, 9500)
+
+        response = api_client.get(reverse('leaderboard'), {'difficulty': 3})
+        assert response.status_code == 200
+        assert response.data == [
+            {'user__username': 'anotheruser', 'best_score': 8000, 'rank': 1},
+            {'user__username': 'testuser', 'best_score': 5000, 'rank': 2},
+        ]
+
+        response = api_client.get(reverse('leaderboard'))
+        assert [e['best_score'] for e in response.data] == [9500, 5000]
+
+    def test_invalid_difficulty_rejected(self, api_client):
+        """Неизвестная сложность — ошибка валидации"""
+        response = api_client.get(reverse('leaderboard'), {'difficulty': 'abc'})
+        assert response.status_code == 400
+
+    def test_rebuild_command_restores_entries(self, user, another_user):
+        """Команда пересобирает таблицу рекордов из истории"""
+        complete(user, 3, 5000)
+        complete(user, 5, 3000)
+        complete(another_user, 3, 4000)
+        LeaderboardEntry.objects.all().delete()
+        Leaderboard.objects.update(best_score=0)
+
+        call_command('rebuild_leaderboard')
+
+        assert LeaderboardEntry.objects.count() == 3
+        entry = LeaderboardEntry.objects.get(user=user, difficulty=3)
+        assert entry.best_score == 5000
+        assert entry.date_achieved is not None
+        assert Leaderboard.objects.get(user=user).best_score == 5000
+        assert Leaderboard.objects.get(user=another_user).best_score == 4000
+
+    def test_rebuild_for_selected_users(self, user, another_user):
+        """Пересборка только для указанных пользователей"""
+        complete(user, 3, 5000)
+        complete(another_user, 3, 4000)
+        LeaderboardEntry.objects.filter(user=another_user).update(best_score=1)
+
+        call_command('rebuild_leaderboard', '--user', str(user.pk))
+
+        assert LeaderboardEntry.objects.get(user=another_user).best_score == 1
+        assert User.objects.count() == 2
+
+@pytest.mark.django_db
+class TestLeaderboardCache:
+    """Тесты кэширования ответов таблицы лидеров"""
+
+    def test_repeat_request_needs_no_queries(self, api_client, user, django_assert_num_queries):
+        """Повторный анонимный запрос обслуживается из кэша"""
+        complete(user, 3, 5000)
+        url = reverse('leaderboard')
+        first = api_client.get(url, {'difficulty': 3})
+        with django_assert_num_queries(0):
+            second = api_client.get(url, {'difficulty': 3})
+        assert second.data == first.data
+
+    def test_completion_invalidates(self, api_client, user, another_user, django_capture_on_commit_callbacks):
+        """Завершение игры сбрасывает закэшированные ответы"""
+        complete(user, 3, 5000)
+        url = reverse('leaderboard')
+        assert len(api_client.get(url, {'difficulty': 3}).data) == 1
+
+        with django_capture_on_commit_callbacks(execute=True):
+            complete(another_user, 3, 6000)
+
+        response = api_client.get(url, {'difficulty': 3})
+        assert [e['user__username'] for e in response.data] == ['anotheruser', 'testuser']
+
+    def test_friend_scope_keyed_per_user(self, api_client, user, another_user):
+        """Ответ «только друзья» кэшируется отдельно и сбрасывается при изменении друзей"""
+        complete(another_user, 3, 5000)
+        url = reverse('leaderboard')
+        api_client.force_authenticate(user=user)
+        assert api_client.get(url, {'friends': 'true'}).data == []
+
+        Friendship.objects.create(from_user=user, to_user=another_user)
+        response = api_client.get(url, {'friends': 'true'})
+        assert [e['user__username'] for e in response.data] == ['anotheruser']
+        assert len(api_client.get(url).data) == 1
+
+@pytest.mark.django_db
+class TestLeaderboardPosition:
+    """Тесты места пользователя в рейтинге"""
+
+    @pytest.fixture
+    def players(self, create_user):
+        players = [create_user(username=f'player{i:02d}', password='x') for i in range(12)]
+        for i, player in enumerate(players):
+            complete(player, 3, 1000 + 100 * i)
+        return players
+
+    def get(self, api_client, player, **params):
+        api_client.force_authenticate(user=player)
+        response = api_client.get(reverse('leaderboard-me'), params)
+        assert response.status_code == 200
+        return response.data
+
+    def test_rank_and_neighbours(self, api_client, players):
+        """Место и по две строки сверху и снизу; совпадает с топом"""
+        data = self.get(api_client, players[5], difficulty=3)
+        assert (data['rank'], data['best_score']) == (7, 1500)
+        assert [(e['user__username'], e['rank']) for e in data['entries']] == [
+            ('player07', 5), ('player06', 6), ('player05', 7), ('player04', 8), ('player03', 9),
+        ]
+        top = api_client.get(reverse('leaderboard'), {'difficulty': 3}).data
+        assert top[6] == data['entries'][2]
+
+    def test_window_at_edges(self, api_client, players):
+        """У первого и последнего места окно сдвигается, оставаясь из пяти строк"""
+        first = self.get(api_client, players[-1], difficulty=3)
+        assert first['rank'] == 1
+        assert [e['rank'] for e in first['entries']] == [1, 2, 3, 4, 5]
+        last = self.get(api_client, players[0], difficulty=3)
+        assert last['rank'] == 12
+        assert [e['rank'] for e in last['entries']] == [8, 9, 10, 11, 12]
+
+    def test_ties_ordered_like_top(self, api_client, user, another_user):
+        """При равных очках выше тот, кто достиг рекорда раньше"""
+        complete(user, 4, 3000)
+        complete(another_user, 4, 3000)
+        data = self.get(api_client, another_user, difficulty=4)
+        assert data['rank'] == 2
+        top = api_client.get(reverse('leaderboard'), {'difficulty': 4}).data
+        assert [e['user__username'] for e in top] == [e['user__username'] for e in data['entries']]
+
+    def test_friends_scope(self, api_client, players):
+        """В рейтинге друзей — только друзья и сам пользователь"""
+        Friendship.objects.create(from_user=players[0], to_user=players[3])
+        data = self.get(api_client, players[0], difficulty=3, friends='true')
+        assert data['rank'] == 2
+        assert [e['user__username'] for e in data['entries']] == ['player03', 'player00']
+
+    def test_overall_and_no_record(self, api_client, players, user):
+        """Общий рейтинг — по лучшему результату; без рекорда места нет"""
+        assert self.get(api_client, players[11])['rank'] == 1
+        assert self.get(api_client, user) == {'rank': None, 'best_score': 0, 'entries': []}
+
+    def test_query_count_constant(self, api_client, players, django_assert_max_num_queries):
+        """Число запросов не зависит от размера рейтинга"""
+        api_client.force_authenticate(user=players[5])
+        with django_assert_max_num_queries(4):
+            api_client.get(reverse('leaderboard-me'), {'difficulty': 3})
+
+    def test_requires_auth(self, api_client):
+        assert api_client.get(reverse('leaderboard-me')).status_code == 401
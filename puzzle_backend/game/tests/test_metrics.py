@@ -0,0 +1,179 @@
+import multiprocessing
+import os
+
+import pytest
+from django.core.cache import cache
+from django.urls import reverse
+from game import metrics
+from game.models import Challenge, GameSession
+
+@pytest.fixture(autouse=True)
+def fresh_store():
+    """Каждый тест начинает с пустых счётчиков"""
+    metrics.store.cache_clear()
+    yield
+    metrics.store.cache_clear()
+
+@pytest.fixture
+def metrics_dir(settings, tmp_path):
+    settings.METRICS_DIR = str(tmp_path)
+    metrics.store.cache_clear()
+    return tmp_path
+
+def value(sample, **labels):
+    key = (sample, tuple(sorted((name, str(label)) for name, label in labels.items())))
+    return metrics.store().values().get(key, 0)
+
+def bump(times):
+    for _ in range(times):
+        metrics.CHALLENGES_CREATED.inc()
+
+class TestStorage:
+    """Тесты хранения счётчиков в файлах воркеров"""
+
+    def test_processes_aggregated(self, metrics_dir):
+        """Каждый процесс пишет в свой файл, при чтении значения суммируются"""
+        context = multiprocessing.get_context('fork')
+        workers = [context.Process(target=bump, args=(50,)) for _ in range(2)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+            assert worker.exitcode == 0
+        bump(5)
+        assert len(list(metrics_dir.glob('metrics-*.db'))) == 3
+        assert value('puzzle_challenges_created_total') == 105
+
+    def test_archive_keeps_totals_without_pid(self, metrics_dir):
+        """Счётчики завершившегося воркера — в архив, ряды с pid отбрасываются"""
+        dead = metrics.MmapFile(metrics_dir / 'metrics-999999.db')
+        dead.inc(('puzzle_challenges_created_total', ()), 7)
+        dead.inc(('puzzle_db_queries_total', (('pid', '999999'),)), 3)
+        dead.close()
+        bump(1)
+        metrics.archive(metrics_dir, 999999)
+        assert not (metrics_dir / 'metrics-999999.db').exists()
+        assert value('puzzle_challenges_created_total') == 8
+        assert value('puzzle_db_queries_total', pid=999999) == 0
+
+        metrics.reset_dir(metrics_dir)
+        assert not list(metrics_dir.glob('metrics-*.db'))
+
+    def test_file_grows_and_reopens(self, tmp_path):
+        """Файл растёт под новые ключи, при повторном открытии значения сохраняются"""
+        path = tmp_path / 'metrics-1.db'
+        mapped = metrics.MmapFile(path)
+        for i in range(3000):
+            mapped.inc(('puzzle_test_total', (('view', f'view-{i}'),)), i)
+        mapped.close()
+        assert os.path.getsize(path) > 64 * 1024
+        reopened = metrics.MmapFile(path)
+        reopened.inc(('puzzle_test_total', (('view', 'view-2999'),)), 1)
+        reopened.close()
+        values = dict(metrics.read_file(path))
+        assert len(values) == 3000
+        assert values[('puzzle_test_total', (('view', 'view-2999'),))] == 3000
+
+@pytest.mark.django_db
+class TestExposition:
+    """Тесты /metrics и счётчиков запросов"""
+
+    def test_histogram_cumulative(self):
+        """Корзины выдаются накопленными, +Inf равно числу наблюдений"""
+        for seconds in (0.003, 0.2, 20):
+            metrics.REQUEST_DURATION.observe(seconds, view='index')
+        lines = metrics.render().splitlines()
+        assert 'puzzle_http_request_duration_seconds_bucket{le="0.005",view="index"} 1' in lines
+        assert 'puzzle_http_request_duration_seconds_bucket{le="0.25",view="index"} 2' in lines
+        assert 'puzzle_http_request_duration_seconds_bucket{le="10",view="index"} 2' in lines
+        assert 'puzzle_http_request_duration_seconds_bucket{le="+Inf",view="index"} 3' in lines
+        assert 'puzzle_http_request_duration_seconds_count{view="index"} 3' in lines
+        assert '# TYPE puzzle_http_request_duration_seconds histogram' in lines
+
+    def test_requests_counted_by_view(self, client):
+        """Запросы считаются по имени представления, методу и статусу"""
+        client.get('/healthz')
+        client.get('/healthz')
+        client.get('/no-such-page/')
+        assert value('puzzle_http_requests_total', view='healthz', method='GET', status=200) == 2
+        assert value('puzzle_http_requests_total', view='unmatched', method='GET', status=404) == 1
+        assert value('puzzle_http_request_duration_seconds_count', view='healthz') == 2
+
+    def test_scrape(self, client):
+        """Текстовый формат Prometheus, без кэширования"""
+        client.get('/healthz')
+        response = client.get('/metrics')
+        assert response.status_code == 200
+        assert response['Content-Type'] == metrics.CONTENT_TYPE
+        assert 'no-cache' in response['Cache-Control']
+        assert 'puzzle_http_requests_total{method="GET",status="200",view="healthz"} 1' in response.content.decode()
+
+    def test_scrape_restricted(self, client, settings):
+        """С адреса вне METRICS_ALLOWED_IPS — 403"""
+        assert client.get('/metrics', REMOTE_ADDR='203.0.113.5').status_code == 403
+        settings.METRICS_ALLOWED_IPS = ['203.0.113.5']
+        assert client.get('/metrics', REMOTE_ADDR='203.0.113.5').status_code == 200
+
+    def test_scrape_allowed_network(self, client, settings):
+        """Сеть CIDR пускает адреса из неё; X-Forwarded-For от proxy не учитывается"""
+        settings.METRICS_ALLOWED_IPS = ['127.0.0.1', '172.28.0.0/24']
+        assert client.get('/metrics', REMOTE_ADDR='172.28.0.7').status_code == 200
+        assert client.get('/metrics', REMOTE_ADDR='172.29.0.7').status_code == 403
+        assert client.get('/metrics', REMOTE_ADDR='::1').status_code == 403
+        proxied = client.get('/metrics', REMOTE_ADDR='172.18.0.4', HTTP_X_FORWARDED_FOR='127.0.0.1')
+        assert proxied.status_code == 403
+
+    def test_db_queries_per_process(self, user):
+        """SQL-запросы считаются с pid процесса"""
+        list(GameSession.objects.all())
+        assert value('puzzle_db_queries_total', pid=os.getpid()) >= 1
+        assert value('puzzle_db_query_seconds_total', pid=os.getpid()) > 0
+
+@pytest.mark.django_db
+class TestDomainCounters:
+    """Тесты игровых счётчиков"""
+
+    def test_autosaves(self, authenticated_client, settings):
+        """Каждый пакет ходов; snapshot — записан ли снимок в БД"""
+        settings.AUTOSAVE_SNAPSHOT_MOVES = 4
+        settings.AUTOSAVE_SNAPSHOT_SECONDS = 3600
+        settings.AUTOSAVE_BUFFER_MOVES = True
+        session = authenticated_client.post(reverse('gamesession-list'), {
+            'difficulty': 3,
+            'game_state': {'tiles': [{'index': i} for i in range(9)], 'emptyIndex': 8, 'moves': 0, 'timer': 0},
+            'score': 0,
+            'is_completed': False,
+        }, format='json').data
+        url = reverse('gamesession-moves', kwargs={'pk': session['id']})
+        authenticated_client.post(url, {'moves': [7, 4], 'timer': 5}, format='json')
+        authenticated_client.post(url, {'moves': [5, 8], 'timer': 9}, format='json')
+        assert value('puzzle_autosaves_total', snapshot='false') == 1
+        assert value('puzzle_autosaves_total', snapshot='true') == 1
+
+    def test_sessions_completed_by_difficulty(self, user, django_capture_on_commit_callbacks):
+        """Завершённая игра — один раз, по её сложности"""
+        with django_capture_on_commit_callbacks(execute=True):
+            session = GameSession.objects.create(user=user, difficulty=4, game_state={}, score=900, is_completed=True)
+        with django_capture_on_commit_callbacks(execute=True):
+            session.score = 950
+            session.save()
+        assert value('puzzle_sessions_completed_total', difficulty=4) == 1
+        assert value('puzzle_sessions_completed_total', difficulty=3) == 0
+
+    def test_challenges_counted_on_commit(self, user, another_user, django_capture_on_commit_callbacks):
+        """Вызов считается после коммита, изменение вызова — нет"""
+        with django_capture_on_commit_callbacks(execute=True):
+            challenge = Challenge.objects.create(from_user=user, to_user=another_user, difficulty=3, target_score=500)
+        with django_capture_on_commit_callbacks(execute=True):
+            challenge.is_accepted = True
+            challenge.save()
+        assert value('puzzle_challenges_created_total') == 1
+
+    def test_leaderboard_cache_hit_ratio(self, client):
+        """Промах при первом запросе, попадание при повторном; доля попаданий"""
+        cache.clear()
+        client.get(reverse('leaderboard'))
+        client.get(reverse('leaderboard'))
+        assert value('puzzle_leaderboard_cache_requests_total', result='miss') == 1
+        assert value('puzzle_leaderboard_cache_requests_total', result='hit') == 1
+        assert 'puzzle_leaderboard_cache_hit_ratio 0.5' in metrics.render().splitlines()
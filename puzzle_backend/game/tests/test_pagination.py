@@ -0,0 +1,48 @@
+import pytest
+from django.contrib.auth.models import User
+from django.urls import reverse
+from game.models import Challenge, Friendship
+
+@pytest.mark.django_db
+class TestCursorPagination:
+    """Тесты курсорной пагинации списков"""
+
+    def test_friends_paginated_with_cursor(self, authenticated_client, user):
+        """Список друзей отдаётся страницами, курсор ведёт на следующую"""
+        for i in range(5):
+            friend = User.objects.create_user(username=f'pagefriend{i}', password='pass')
+            Friendship.objects.create(from_user=user, to_user=friend)
+
+        response = authenticated_client.get(reverse('friends-list'), {'page_size': 2})
+        assert response.status_code == 200
+        assert set(response.data) == {'next', 'previous', 'results'}
+        assert [f['username'] for f in response.data['results']] == ['pagefriend4', 'pagefriend3']
+
+        seen = []
+        url = reverse('friends-list') + '?page_size=2'
+        while url:
+            page = authenticated_client.get(url).data
+            seen += [f['username'] for f in page['results']]
+            url = page['next']
+        assert seen == [f'pagefriend{i}' for i in reversed(range(5))]
+
+    def test_page_size_is_capped(self, authenticated_client, user):
+        """page_size не может превышать максимум"""
+        sender = User.objects.create_user(username='sender', password='pass')
+        for _ in range(4):
+            Challenge.objects.create(from_user=sender, to_user=user, difficulty=3, target_score=100)
+
+        from game.pagination import CursorPagination
+        CursorPagination.max_page_size, old = 3, CursorPagination.max_page_size
+        try:
+            response = authenticated_client.get(reverse('challenge-list'), {'page_size': 100})
+        finally:
+            CursorPagination.max_page_size = old
+        assert len(response.data['results']) == 3
+        assert response.data['next'] is not None
+
+    def test_sessions_and_achievements_paginated(self, authenticated_client):
+        """Сессии и достижения тоже постраничные"""
+        for name in ('gamesession-list', 'achievements'):
+            response = authenticated_client.get(reverse(name))
+            assert response.data['results'] == []
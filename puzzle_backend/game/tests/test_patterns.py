@@ -0,0 +1,52 @@
+import pytest
+from django.core.management import call_command
+from game import patterns, solver
+from game.engine import Board
+from game.tests.test_solver import bfs_distances, scrambled
+
+@pytest.fixture
+def databases_3x3(tmp_path, settings):
+    """Базы шаблонов 3x3 (группы 0-3 и 4-7), построенные командой"""
+    settings.PATTERN_DB_DIR = tmp_path
+    call_command('build_pattern_databases', '--size', '3', '--workers', '2')
+    return patterns.databases(3)
+
+class TestPatternDatabases:
+    """Тесты баз шаблонов"""
+
+    def test_files_written(self, databases_3x3, tmp_path):
+        """Команда пишет по файлу на группу с заголовком и N^k байт"""
+        assert sorted(p.name for p in tmp_path.iterdir()) == ['3x3-0_1_2_3.pdb', '3x3-4_5_6_7.pdb']
+        assert [db.tiles for db in databases_3x3] == [(0, 1, 2, 3), (4, 5, 6, 7)]
+        assert (tmp_path / '3x3-0_1_2_3.pdb').stat().st_size == databases_3x3[0].offset + 9 ** 4
+
+    def test_solved_board_is_zero(self, databases_3x3):
+        """Для собранной доски все значения нулевые"""
+        tiles = Board.solved(3).tiles
+        assert [db.value(db.index(tiles)) for db in databases_3x3] == [0, 0]
+
+    def test_heuristic_admissible(self, databases_3x3):
+        """Сумма по базам не превышает точного расстояния"""
+        distances = bfs_distances()
+        for key, distance in list(distances.items())[::50]:
+            board = Board(3, key)
+            assert solver.heuristic(board, databases_3x3) <= distance
+
+    def test_solver_stays_optimal(self, databases_3x3):
+        """С базами решатель находит решения той же длины"""
+        for seed in range(10):
+            board = scrambled(3, 60, seed)
+            with_db = solver.solve(board, databases=databases_3x3)
+            assert len(with_db) == len(solver.solve(board))
+            board.apply_moves(with_db)
+            assert board.is_solved()
+
+    def test_missing_directory(self, tmp_path, settings):
+        """Без файлов решатель работает на эвристике"""
+        settings.PATTERN_DB_DIR = tmp_path / 'missing'
+        assert patterns.databases(4) == ()
+
+    def test_invalid_partition(self):
+        """Разбиение должно покрывать все плитки"""
+        with pytest.raises(ValueError):
+            patterns.partition_groups(4, (6, 6))
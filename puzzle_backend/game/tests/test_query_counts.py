@@ -0,0 +1,112 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from game.models import GameSession, Leaderboard, LeaderboardEntry
+
+TRANSACTION_CONTROL = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK', 'BEGIN', 'COMMIT')
+
+def statements(context):
+    """SQL-операторы без управления транзакцией (SAVEPOINT/BEGIN/COMMIT)"""
+    return [q['sql'] for q in context.captured_queries if not q['sql'].upper().startswith(TRANSACTION_CONTROL)]
+
+@pytest.fixture
+def in_progress_session(user):
+    session = GameSession.objects.create(
+        user=user,
+        difficulty=3,
+        game_state={'tiles': [{'index': i} for i in range(9)], 'emptyIndex': 8, 'moves': 0, 'timer': 0},
+    )
+    return GameSession.objects.get(pk=session.pk)
+
+@pytest.mark.django_db
+class TestGameSessionSaveQueryCount:
+    """Регрессионные тесты количества запросов при сохранении сессий"""
+
+    def test_autosave_is_single_update(self, in_progress_session):
+        """Автосохранение незавершённой игры — ровно один UPDATE"""
+        in_progress_session.game_state['moves'] = 5
+        with CaptureQueriesContext(connection) as ctx:
+            in_progress_session.save()
+        sql = statements(ctx)
+        assert len(sql) == 1
+        assert sql[0].upper().startswith('UPDATE')
+
+    def test_completion_is_single_transaction(self, in_progress_session, user):
+        """Завершение — UPDATE сессии, общего рекорда и рекорда по сложности в одной транзакции"""
+        LeaderboardEntry.objects.create(user=user, difficulty=3, best_score=100)
+        in_progress_session.is_completed = True
+        in_progress_session.score = 9000
+        with CaptureQueriesContext(connection) as ctx:
+            in_progress_session.save()
+        sql = statements(ctx)
+        assert len(sql) == 3
+        assert all(s.upper().startswith('UPDATE') for s in sql)
+        assert len(ctx.captured_queries) > len(sql)  # обёрнуто в транзакцию/savepoint
+
+        in_progress_session.refresh_from_db()
+        assert in_progress_session.time_played is not None
+        assert Leaderboard.objects.get(user=user).best_score == 9000
+
+    def test_first_completion_on_difficulty_inserts_entry(self, in_progress_session):
+        """Первое завершение на сложности добавляет один INSERT рекорда"""
+        in_progress_session.is_completed = True
+        in_progress_session.score = 9000
+        with CaptureQueriesContext(connection) as ctx:
+            in_progress_session.save()
+        sql = statements(ctx)
+        assert len(sql) == 4
+        assert sql[-1].upper().startswith('INSERT')
+
+    def test_difficulty_record_keeps_best(self, in_progress_session, user):
+        """Рекорд по сложности появляется, не понижается и растёт вместе с датой"""
+        in_progress_session.is_completed = True
+        in_progress_session.score = 9000
+        in_progress_session.save()
+        entry = LeaderboardEntry.objects.get(user=user, difficulty=3)
+        assert entry.best_score == 9000
+        assert entry.date_achieved == in_progress_session.updated_at
+
+        in_progress_session.score = 8000
+        in_progress_session.save()
+        assert LeaderboardEntry.objects.get(user=user, difficulty=3).best_score == 9000
+        later = GameSession.objects.create(user=user, difficulty=3, game_state={}, score=9500, is_completed=True)
+        entry = LeaderboardEntry.objects.get(user=user, difficulty=3)
+        assert (entry.best_score, entry.date_achieved) == (9500, later.updated_at)
+
+    def test_lower_score_keeps_record(self, user):
+        """Худший результат не понижает рекорд"""
+        for score in (5000, 3000):
+            GameSession.objects.create(user=user, difficulty=3, game_state={}, score=score, is_completed=True)
+        leaderboard = Leaderboard.objects.get(user=user)
+        assert leaderboard.best_score == 5000
+        assert leaderboard.date_achieved is not None
+
+    def test_resaving_completed_session_skips_leaderboard(self, in_progress_session):
+        """Повторное сохранение завершённой игры не трогает рекорд"""
+        in_progress_session.is_completed = True
+        in_progress_session.score = 9000
+        in_progress_session.save()
+        session = GameSession.objects.get(pk=in_progress_session.pk)
+        with CaptureQueriesContext(connection) as ctx:
+            session.save()
+        assert len(statements(ctx)) == 1
+
+    def test_patch_autosave_query_count(self, authenticated_client, in_progress_session, django_assert_num_queries):
+        """PATCH автосохранения — SELECT сессии и один UPDATE"""
+        url = reverse('gamesession-detail', kwargs={'pk': in_progress_session.pk})
+        with django_assert_num_queries(2):
+            response = authenticated_client.patch(url, {'score': 0}, format='json')
+        assert response.status_code == 200
+
+    def test_buffered_moves_need_no_queries(self, authenticated_client, in_progress_session,
+                                            settings, django_assert_num_queries):
+        """Пакет ходов, попавший в буфер, не обращается к БД"""
+        settings.AUTOSAVE_SNAPSHOT_MOVES = 100
+        settings.AUTOSAVE_SNAPSHOT_SECONDS = 3600
+        settings.AUTOSAVE_BUFFER_MOVES = True
+        url = reverse('gamesession-moves', kwargs={'pk': in_progress_session.pk})
+        authenticated_client.post(url, {'moves': [7], 'timer': 1}, format='json')
+        with django_assert_num_queries(0):
+            response = authenticated_client.post(url, {'moves': [8], 'timer': 2}, format='json')
+        assert response.status_code == 200
@@ -0,0 +1,160 @@
+import bisect
+import random
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.management import call_command
+from django.urls import reverse
+from game import leaderboard, ranking
+from game.models import GameSession, LeaderboardEntry
+
+def complete(user, difficulty, score):
+    return GameSession.objects.create(
+        user=user, difficulty=difficulty, game_state={'tiles': []}, score=score, is_completed=True
+    )
+
+@pytest.fixture(autouse=True)
+def rank_index(settings):
+    """Индекс включён и синхронизируется при каждом обращении; между тестами — холодный"""
+    settings.LEADERBOARD_RANK_INDEX = True
+    settings.RANK_INDEX_SYNC_SECONDS = 0
+    ranking.reset()
+    yield
+    ranking.reset()
+
+@pytest.fixture
+def players(create_user):
+    players = [create_user(username=f'player{i:02d}', password='x') for i in range(8)]
+    for i, player in enumerate(players):
+        complete(player, 3, 1000 + 100 * (i % 4))
+        complete(player, 4, 500 + 10 * i)
+    return players
+
+class TestSortedKeys:
+    """Тесты блочного отсортированного списка индекса"""
+
+    def test_matches_sorted_list(self, monkeypatch):
+        """Вставки, удаления, места и срезы совпадают с обычным отсортированным списком"""
+        monkeypatch.setattr(ranking.SortedKeys, 'LOAD', 4)
+        rng = random.Random(7)
+        expected = sorted(rng.sample(range(1000), 30))
+        keys = ranking.SortedKeys(expected)
+        for _ in range(600):
+            if expected and rng.random() < 0.4:
+                value = expected.pop(rng.randrange(len(expected)))
+                keys.remove(value)
+            else:
+                value = rng.randrange(1000)
+                bisect.insort(expected, value)
+                keys.add(value)
+            probe = rng.randrange(1000)
+            assert keys.bisect_left(probe) == bisect.bisect_left(expected, probe)
+            assert len(keys) == len(expected)
+        assert keys[:] == expected
+        assert keys[5:17] == expected[5:17]
+        assert [keys[i] for i in range(len(expected))] == expected
+        assert keys[-1] == expected[-1]
+
+@pytest.mark.django_db
+class TestRankIndex:
+    """Тесты индекса рейтинга в памяти"""
+
+    def test_matches_sql(self, players):
+        """Топ и места из индекса совпадают с SQL, включая равные очки"""
+        ranking.load()
+        for difficulty in ranking.SCOPES:
+            assert ranking.top_entries(difficulty) == leaderboard.top_entries(difficulty=difficulty)
+            for player in players:
+                assert ranking.position(player.pk, difficulty) == leaderboard.position(player.pk, difficulty=difficulty)
+
+    def test_no_queries_when_warm(self, players, django_assert_num_queries):
+        """Загруженный индекс отвечает без запросов к БД"""
+        ranking.load()
+        with django_assert_num_queries(0):
+            assert ranking.position(players[0].pk, 4)['rank'] == 8
+            assert len(ranking.top_entries(3)) == 8
+
+    def test_async_top_from_index(self, players, django_assert_num_queries):
+        """Асинхронный топ берётся из загруженного индекса без запросов"""
+        ranking.load()
+        with django_assert_num_queries(0):
+            assert async_to_sync(leaderboard.aresults)(3) == ranking.top_entries(3)
+
+    def test_completion_applied_from_journal(self, players, django_capture_on_commit_callbacks,
+                                             django_assert_num_queries):
+        """Новый рекорд попадает в индекс через журнал изменений, без перечитывания БД"""
+        ranking.load()
+        with django_capture_on_commit_callbacks(execute=True):
+            complete(players[0], 4, 9000)
+        with django_assert_num_queries(0):
+            assert ranking.position(players[0].pk, 4)['rank'] == 1
+            assert ranking.position(players[0].pk)['best_score'] == 9000
+        assert ranking.check(4, live=True) == []
+
+    def test_completion_then_cached_read(self, players, settings, api_client,
+                                         django_capture_on_commit_callbacks):
+        """После завершения игры кэш ответов не получает топ из недочитанного индекса"""
+        settings.RANK_INDEX_SYNC_SECONDS = 3600
+        ranking.load()
+        url = reverse('leaderboard')
+        assert api_client.get(url, {'difficulty': 4}).data[0]['user__username'] == 'player07'
+        with django_capture_on_commit_callbacks(execute=True):
+            complete(players[0], 4, 9000)
+        top = api_client.get(url, {'difficulty': 4}).data
+        assert top[0] == {'user__username': 'player00', 'best_score': 9000, 'rank': 1}
+        assert api_client.get(url, {'difficulty': 4}).data == top
+
+    def test_lower_score_ignored(self, players, django_capture_on_commit_callbacks):
+        """Результат ниже рекорда место не меняет"""
+        ranking.load()
+        before = ranking.position(players[7].pk, 4)
+        with django_capture_on_commit_callbacks(execute=True):
+            complete(players[7], 4, 10)
+        assert ranking.position(players[7].pk, 4) == before
+
+    def test_cold_index_falls_back_to_sql(self, players, monkeypatch, api_client):
+        """Пока индекс не загружен, ответ строится SQL-запросом, а загрузка запускается в фоне"""
+        started = []
+        monkeypatch.setattr(ranking, 'warm', lambda: started.append(True))
+        api_client.force_authenticate(user=players[0])
+        response = api_client.get(reverse('leaderboard-me'), {'difficulty': 4})
+        assert response.data['rank'] == 8
+        assert started
+
+    def test_rebuild_resets_index(self, players, django_capture_on_commit_callbacks):
+        """Пересчёт рекордов из истории делает индекс холодным"""
+        ranking.load()
+        LeaderboardEntry.objects.filter(user=players[0], difficulty=4).update(best_score=99999)
+        with django_capture_on_commit_callbacks(execute=True):
+            leaderboard.rebuild()
+        assert ranking.index(4) is None
+
+    def test_lost_journal_entry_reloads(self, players, settings, monkeypatch):
+        """Номер в журнале без записи: сначала ожидание, затем полная перезагрузка"""
+        ranking.load()
+        monkeypatch.setattr(ranking, 'warm', lambda: None)
+        settings.RANK_INDEX_SYNC_SECONDS = 0.0001
+        ranking.cache.set(ranking.SEQ_KEY, ranking._current_seq() + 1, None)
+        assert ranking.index(3) is not None
+        # «Прошла» секунда: пропуск держится дольше пяти синхронизаций
+        ranking._state.gap_since -= 1
+        ranking._state.synced_at -= 1
+        assert ranking.index(3) is None
+
+    def test_percentile(self, players):
+        """Перцентиль: первое место — 100, последнее — доля одного игрока"""
+        index = ranking.load()[4]
+        assert index.percentile(players[7].pk) == 100
+        assert index.percentile(players[0].pk) == 12.5
+        assert index.percentile(-1) is None
+
+    def test_check_command(self, players, capsys):
+        """Команда сверки проходит на согласованных данных"""
+        call_command('check_rank_index', '--sample', '5')
+        assert 'согласован' in capsys.readouterr().out
+
+    def test_live_check_detects_drift(self, players):
+        """Изменение в БД в обход журнала видно при сверке живого индекса"""
+        ranking.load()
+        LeaderboardEntry.objects.filter(user=players[0], difficulty=4).update(best_score=99999)
+        assert ranking.check(4, live=True)
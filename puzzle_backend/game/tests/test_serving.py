@@ -0,0 +1,64 @@
+import multiprocessing
+import runpy
+from pathlib import Path
+
+import pytest
+from game import ranking
+
+GUNICORN_CONF = Path(__file__).resolve().parents[2] / 'gunicorn.conf.py'
+
+@pytest.mark.django_db
+class TestHealthChecks:
+    """Тесты /healthz и /readyz"""
+
+    def test_healthz_without_queries(self, client, django_assert_num_queries):
+        """Проверка жизни не обращается к БД"""
+        with django_assert_num_queries(0):
+            response = client.get('/healthz')
+        assert response.status_code == 200
+        assert response.json() == {'status': 'ok'}
+        assert 'no-cache' in response['Cache-Control']
+
+    def test_readyz_without_queries(self, client, django_assert_num_queries):
+        """Готовность проверяет кэш, но не БД"""
+        with django_assert_num_queries(0):
+            response = client.get('/readyz')
+        assert response.status_code == 200
+        assert response.json()['checks'] == {'cache': True}
+
+    def test_not_ready_while_rank_index_cold(self, client, settings, monkeypatch):
+        """Пока индекс рейтинга не загружен — 503 и фоновая загрузка"""
+        settings.LEADERBOARD_RANK_INDEX = True
+        started = []
+        monkeypatch.setattr(ranking, 'warm', lambda: started.append(True))
+        ranking.reset()
+        response = client.get('/readyz')
+        assert response.status_code == 503
+        assert response.json()['checks']['rank_index'] is False
+        assert started
+        ranking.load()
+        assert client.get('/readyz').status_code == 200
+        ranking.reset()
+
+class TestGunicornConfig:
+    """Тесты gunicorn.conf.py"""
+
+    def test_defaults_from_cpu_count(self, monkeypatch):
+        """По умолчанию: воркеры 2×CPU+1 с потоками (WSGI), предзагрузка приложения"""
+        monkeypatch.delenv('WEB_CONCURRENCY', raising=False)
+        monkeypatch.delenv('GUNICORN_RELOAD', raising=False)
+        conf = runpy.run_path(str(GUNICORN_CONF))
+        assert conf['workers'] == multiprocessing.cpu_count() * 2 + 1
+        assert conf['preload_app'] is True
+        assert conf['worker_class'] == 'gthread'
+        assert conf['threads'] >= 1
+
+    def test_overrides(self, monkeypatch):
+        """WEB_CONCURRENCY из окружения; пустое значение — как не заданное; reload выключает предзагрузку"""
+        monkeypatch.setenv('WEB_CONCURRENCY', '3')
+        monkeypatch.setenv('GUNICORN_RELOAD', 'True')
+        conf = runpy.run_path(str(GUNICORN_CONF))
+        assert conf['workers'] == 3
+        assert conf['preload_app'] is False
+        monkeypatch.setenv('WEB_CONCURRENCY', '')
+        assert runpy.run_path(str(GUNICORN_CONF))['workers'] == multiprocessing.cpu_count() * 2 + 1
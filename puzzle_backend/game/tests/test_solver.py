@@ -0,0 +1,170 @@
+import random
+import time
+from collections import deque
+
+import pytest
+from django.urls import reverse
+from rest_framework import status
+from game import solver
+from game.engine import Board
+from game.models import GameSession
+
+def scrambled(size, steps, seed):
+    rng = random.Random(seed)
+    board = Board.solved(size)
+    previous = None
+    for _ in range(steps):
+        pos = rng.choice([p for p in board.legal_moves() if p != previous])
+        previous = board.blank
+        board.move(pos)
+    return board
+
+def bfs_distances():
+    """Точные расстояния до решения для всех состояний 3x3"""
+    start = Board.solved(3)
+    distances = {start.key(): 0}
+    queue = deque([start])
+    while queue:
+        board = queue.popleft()
+        for pos in board.legal_moves():
+            nxt = board.copy()
+            nxt.move(pos)
+            if nxt.key() not in distances:
+                distances[nxt.key()] = distances[board.key()] + 1
+                queue.append(nxt)
+    return distances
+
+@pytest.fixture(autouse=True)
+def fresh_hint_cache(monkeypatch):
+    monkeypatch.setattr(solver, '_cache', None)
+
+class TestSolver:
+    """Тесты оптимального решателя"""
+
+    def test_optimal_on_3x3(self):
+        """Длина решения совпадает с точным расстоянием BFS, эвристика допустима"""
+        distances = bfs_distances()
+        for seed in range(20):
+            board = scrambled(3, 60, seed)
+            path = solver.solve(board)
+            assert len(path) == distances[board.key()]
+            assert solver.heuristic(board) <= len(path)
+            board.apply_moves(path)
+            assert board.is_solved()
+
+    def test_solves_4x4(self):
+        """Решение 4x4 приводит к собранной доске"""
+        board = scrambled(4, 40, 1)
+        path = solver.solve(board)
+        board.apply_moves(path)
+        assert board.is_solved()
+
+    def test_unsolvable_rejected(self):
+        """Раскладка с неверной чётностью не решается"""
+        board = Board(3, [1, 0, 2, 3, 4, 5, 6, 7, 8])
+        with pytest.raises(solver.UnsolvableError):
+            solver.solve(board)
+
+    def test_timeout_falls_back_to_best_effort(self):
+        """По таймауту возвращается неоптимальный, но допустимый ход"""
+        board = scrambled(5, 300, 2)
+        result = solver.hint(board, timeout=0)
+        assert result['optimal'] is False
+        assert result['distance'] is None
+        assert result['move'] in board.legal_moves()
+        assert result['lower_bound'] >= solver.heuristic(board)
+
+    def test_path_states_are_cached(self, monkeypatch):
+        """После решения подсказки по оптимальному пути отдаются без поиска"""
+        board = scrambled(3, 40, 3)
+        first = solver.hint(board, timeout=5)
+        monkeypatch.setattr(solver, '_run_search', lambda *args, **kwargs: pytest.fail("поиск не нужен"))
+        distance = first['distance']
+        while first['move'] is not None:
+            board.move(first['move'])
+            distance -= 1
+            first = solver.hint(board, timeout=5)
+            assert first['distance'] == distance
+        assert board.is_solved()
+
+    def test_4x4_latency_is_bounded(self, settings):
+        """Случайные 4x4: ответ не позже бюджета, даже если оптимальный ход не найден"""
+        settings.HINT_WORKERS = 0
+        for seed in range(5):
+            board = scrambled(4, 500, seed)
+            started = time.monotonic()
+            result = solver.hint(board, timeout=0.5)
+            assert time.monotonic() - started < 1.0
+            assert result['move'] in board.legal_moves()
+            assert result['lower_bound'] >= solver.heuristic(board)
+
+    def test_search_runs_in_process_pool(self, settings, monkeypatch):
+        """Поиск идёт в процессе пула; без свободного процесса — best-effort ход"""
+        settings.HINT_WORKERS = 1
+        monkeypatch.setattr(solver, '_executor', None)
+        board = scrambled(3, 40, 4)
+        result = solver.hint(board, timeout=5)
+        assert result['optimal'] is True
+        board.apply_moves([result['move']])
+        assert result['distance'] - 1 == len(solver.solve(board))
+
+        settings.HINT_QUEUE_SECONDS = 0
+        busy = solver._get_executor().submit(solver._search, 5, bytes(scrambled(5, 300, 5).tiles), 2, '')
+        result = solver.hint(scrambled(3, 40, 6), timeout=0.2)
+        assert result['optimal'] is False
+        assert result['lower_bound'] > 0
+        busy.result()
+        solver._get_executor().shutdown()
+
+@pytest.mark.django_db
+class TestHintEndpoint:
+    """Тесты API подсказок"""
+
+    def create(self, user, tiles):
+        return GameSession.objects.create(
+            user=user, difficulty=3,
+            game_state={'tiles': [{'index': i} for i in tiles], 'moves': 0, 'timer': 0},
+        )
+
+    def url(self, session):
+        return reverse('gamesession-hint', kwargs={'pk': session.pk})
+
+    def test_hint_for_saved_state(self, authenticated_client, user):
+        """Подсказка по сохранённому состоянию"""
+        session = self.create(user, [0, 1, 2, 3, 4, 5, 6, 8, 7])
+        response = authenticated_client.get(self.url(session))
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data == {'move': 8, 'tile': 7, 'distance': 1, 'lower_bound': 1, 'optimal': True}
+
+    def test_hint_uses_buffered_moves(self, authenticated_client, user, settings):
+        """Ходы из буфера автосохранения учитываются до записи снимка"""
+        settings.AUTOSAVE_SNAPSHOT_MOVES = 100
+        settings.AUTOSAVE_SNAPSHOT_SECONDS = 3600
+        settings.AUTOSAVE_BUFFER_MOVES = True
+        session = self.create(user, range(9))
+        authenticated_client.post(
+            reverse('gamesession-moves', kwargs={'pk': session.pk}), {'moves': [7, 4], 'timer': 1}, format='json'
+        )
+        response = authenticated_client.get(self.url(session))
+        assert response.data['move'] == 7
+        assert response.data['distance'] == 2
+
+    def test_solved_board(self, authenticated_client, user):
+        """Для собранной доски хода нет"""
+        session = self.create(user, range(9))
+        response = authenticated_client.get(self.url(session))
+        assert response.data['move'] is None
+        assert response.data['distance'] == 0
+
+    def test_unsolvable_board(self, authenticated_client, user):
+        """Нерешаемая раскладка — конфликт"""
+        session = self.create(user, [1, 0, 2, 3, 4, 5, 6, 7, 8])
+        response = authenticated_client.get(self.url(session))
+        assert response.status_code == status.HTTP_409_CONFLICT
+
+    def test_other_users_session(self, api_client, user, another_user):
+        """Чужая сессия недоступна"""
+        session = self.create(user, range(9))
+        api_client.force_authenticate(user=another_user)
+        response = api_client.get(self.url(session))
+        assert response.status_code == status.HTTP_404_NOT_FOUND
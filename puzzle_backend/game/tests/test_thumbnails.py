@@ -0,0 +1,84 @@
+import io
+
+import pytest
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.urls import reverse
+from PIL import Image
+from game.models import UserProfile
+
+@pytest.fixture(autouse=True)
+def media(tmp_path, settings):
+    """Файлы — во временном каталоге, миниатюры строятся синхронно"""
+    settings.MEDIA_ROOT = tmp_path
+    settings.AVATAR_THUMBNAIL_WORKERS = 0
+
+def phone_photo():
+    """Фото 400x200 (слева красное, справа синее) с EXIF-поворотом на 90° и GPS"""
+    image = Image.new('RGB', (400, 200), 'red')
+    image.paste(Image.new('RGB', (200, 200), 'blue'), (200, 0))
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    exif[0x8825] = {1: 'N'}
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', exif=exif)
+    return SimpleUploadedFile('photo.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+def upload(client, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        return client.patch(reverse('profile'), {'avatar': phone_photo()}, format='multipart')
+
+class TestAvatarThumbnails:
+    """Тесты миниатюр аватаров"""
+
+    def test_upload_builds_all_sizes(self, authenticated_client, user, django_capture_on_commit_callbacks):
+        """После загрузки есть WebP и JPEG 64/128/256"""
+        assert upload(authenticated_client, django_capture_on_commit_callbacks).status_code == 200
+
+        thumbs = UserProfile.objects.get(user=user).avatar_thumbs
+        assert set(thumbs) == {'64', '128', '256'}
+        for size, paths in thumbs.items():
+            assert set(paths) == {'webp', 'jpeg'}
+            for fmt, path in paths.items():
+                with default_storage.open(path) as handle, Image.open(handle) as image:
+                    assert image.size == (int(size), int(size))
+                    assert image.format == fmt.upper()
+                    assert not image.getexif()
+
+    def test_orientation_applied(self, authenticated_client, user, django_capture_on_commit_callbacks):
+        """EXIF-поворот применяется до обрезки"""
+        upload(authenticated_client, django_capture_on_commit_callbacks)
+        path = UserProfile.objects.get(user=user).avatar_thumbs['256']['jpeg']
+        with default_storage.open(path) as handle, Image.open(handle) as image:
+            top, bottom = image.getpixel((128, 10)), image.getpixel((128, 245))
+        assert top[0] > 200 and top[2] < 60
+        assert bottom[2] > 200 and bottom[0] < 60
+
+    def test_serializer_urls(self, authenticated_client, user, django_capture_on_commit_callbacks):
+        """Профиль отдаёт URL по размерам"""
+        upload(authenticated_client, django_capture_on_commit_callbacks)
+        data = authenticated_client.get(reverse('profile')).data
+        assert data['avatar_urls']['128']['webp'].startswith('/media/avatars/thumbs/')
+        assert data['avatar_urls']['64']['jpeg'].endswith('.jpeg')
+
+    def test_reupload_replaces_thumbs(self, authenticated_client, user, django_capture_on_commit_callbacks):
+        """Новый аватар заменяет миниатюры, старые файлы удаляются"""
+        upload(authenticated_client, django_capture_on_commit_callbacks)
+        old = UserProfile.objects.get(user=user).avatar_thumbs
+        upload(authenticated_client, django_capture_on_commit_callbacks)
+        new = UserProfile.objects.get(user=user).avatar_thumbs
+        assert new['128']['webp'] != old['128']['webp']
+        assert not default_storage.exists(old['128']['webp'])
+        assert default_storage.exists(new['128']['webp'])
+
+    def test_backfill_command(self, user):
+        """Команда строит миниатюры для старых аватаров"""
+        profile = UserProfile.objects.get(user=user)
+        profile.avatar.save('old.jpg', phone_photo())
+        assert profile.avatar_thumbs == {}
+
+        call_command('build_avatar_thumbnails', '--workers', '1')
+
+        profile.refresh_from_db()
+        assert set(profile.avatar_thumbs) == {'64', '128', '256'}
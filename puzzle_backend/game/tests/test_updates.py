@@ -0,0 +1,168 @@
+import asyncio
+import json
+from datetime import timedelta
+
+import pytest
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+from rest_framework_simplejwt.tokens import AccessToken
+from game import pubsub, updates
+from game.models import Challenge, GameSession
+from game.signals import session_completed
+
+def connect(token):
+    query = f'token={token}'.encode() if token else b''
+    return ApplicationCommunicator(updates.websocket_updates, {
+        'type': 'websocket', 'path': '/ws/updates/', 'query_string': query,
+    })
+
+def run(scenario):
+    """Сценарий целиком в одном цикле событий (подписка привязана к циклу)"""
+    return async_to_sync(scenario)()
+
+@pytest.fixture
+def published(monkeypatch):
+    sent = []
+    monkeypatch.setattr(pubsub, 'publish', lambda topic, message: sent.append((topic, message)))
+    return sent
+
+@pytest.mark.django_db
+class TestUpdatesSocket:
+    """Тесты WebSocket /ws/updates/"""
+
+    def test_rejects_bad_token(self):
+        """Без токена или с испорченным токеном — закрытие с кодом 4401 до accept"""
+        async def scenario():
+            for token in (None, 'garbage'):
+                communicator = connect(token)
+                await communicator.send_input({'type': 'websocket.connect'})
+                assert await communicator.receive_output(1) == {'type': 'websocket.close', 'code': 4401}
+                await communicator.wait(1)
+        run(scenario)
+
+    def test_delivers_own_and_leaderboard_topics(self, user, another_user):
+        """Доставляются сообщения личной темы и рейтинга, чужие — нет"""
+        token = str(AccessToken.for_user(user))
+
+        async def scenario():
+            communicator = connect(token)
+            await communicator.send_input({'type': 'websocket.connect'})
+            assert await communicator.receive_output(1) == {'type': 'websocket.accept'}
+            pubsub.publish(pubsub.user_topic(another_user.pk), {'type': 'challenge.created'})
+            pubsub.publish(pubsub.user_topic(user.pk), {'type': 'challenge.created', 'challenge': {'id': 1}})
+            pubsub.publish(pubsub.LEADERBOARD_TOPIC, {'type': 'leaderboard.changed', 'difficulty': 3})
+            first = json.loads((await communicator.receive_output(1))['text'])
+            second = json.loads((await communicator.receive_output(1))['text'])
+            await communicator.send_input({'type': 'websocket.disconnect', 'code': 1000})
+            await communicator.wait(1)
+            return first, second, pubsub.broker()._subscribers
+
+        first, second, subscribers = run(scenario)
+        assert first == {'type': 'challenge.created', 'challenge': {'id': 1}}
+        assert second == {'type': 'leaderboard.changed', 'difficulty': 3}
+        assert pubsub.user_topic(user.pk) not in subscribers
+
+    def test_ping_pong(self, user):
+        """На ping клиента приходит pong"""
+        token = str(AccessToken.for_user(user))
+
+        async def scenario():
+            communicator = connect(token)
+            await communicator.send_input({'type': 'websocket.connect'})
+            await communicator.receive_output(1)
+            await communicator.send_input({'type': 'websocket.receive', 'text': '{"type":"ping"}'})
+            reply = await communicator.receive_output(1)
+            await communicator.send_input({'type': 'websocket.disconnect', 'code': 1000})
+            await communicator.wait(1)
+            return reply
+
+        assert run(scenario) == {'type': 'websocket.send', 'text': '{"type":"pong"}'}
+
+    def test_closes_when_token_expires(self, user):
+        """Истёкший за время соединения токен закрывает его с кодом 4401"""
+        access = AccessToken.for_user(user)
+        # exp — целые секунды: токен истекает в течение ближайшей секунды
+        access.set_exp(lifetime=timedelta(seconds=1))
+        token = str(access)
+
+        async def scenario():
+            communicator = connect(token)
+            await communicator.send_input({'type': 'websocket.connect'})
+            assert await communicator.receive_output(1) == {'type': 'websocket.accept'}
+            return await communicator.receive_output(3)
+
+        assert run(scenario) == {'type': 'websocket.close', 'code': 4401}
+
+    def test_slow_client_gets_resync(self, settings):
+        """Переполненная очередь заменяется одной командой resync"""
+        settings.PUBSUB_QUEUE_SIZE = 2
+        broker = pubsub.LocalBroker()
+
+        async def scenario():
+            subscription = broker.subscribe(['t'])
+            for n in range(3):
+                broker.publish('t', {'n': n})
+            await asyncio.sleep(0)
+            messages = [subscription.queue.get_nowait() for _ in range(subscription.queue.qsize())]
+            subscription.close()
+            return messages
+
+        assert run(scenario) == [{'type': 'resync'}]
+        assert not broker._subscribers
+
+@pytest.mark.django_db
+class TestUpdateEvents:
+    """Тесты публикации событий после коммита"""
+
+    def test_challenge_created_and_answered(self, user, another_user, published, django_capture_on_commit_callbacks):
+        """Новый вызов — получателю, ответ на него — отправителю"""
+        with django_capture_on_commit_callbacks(execute=True):
+            challenge = Challenge.objects.create(from_user=user, to_user=another_user, difficulty=3, target_score=500)
+        with django_capture_on_commit_callbacks(execute=True):
+            challenge.is_completed, challenge.response_score = True, 700
+            challenge.save()
+        (created_topic, created), (updated_topic, updated) = published
+        assert created_topic == pubsub.user_topic(another_user.pk)
+        assert created['type'] == 'challenge.created'
+        assert created['challenge']['from_username'] == user.username
+        assert updated_topic == pubsub.user_topic(user.pk)
+        assert updated['challenge'] == {'id': challenge.pk, 'is_accepted': False,
+                                        'is_completed': True, 'response_score': 700}
+
+    def test_nothing_published_on_rollback(self, user, another_user, published):
+        """Без коммита событие не уходит"""
+        Challenge.objects.create(from_user=user, to_user=another_user, difficulty=3, target_score=500)
+        assert published == []
+
+    def test_completed_game_changes_leaderboard(self, user, published, django_capture_on_commit_callbacks):
+        """Завершённая игра с очками сообщает об изменении рейтинга её сложности"""
+        with django_capture_on_commit_callbacks(execute=True):
+            GameSession.objects.create(user=user, difficulty=4, game_state={}, score=900, is_completed=True)
+        assert (pubsub.LEADERBOARD_TOPIC, {'type': 'leaderboard.changed', 'difficulty': 4}) in published
+
+    def test_broker_failure_after_commit_is_logged(self, user, another_user, monkeypatch, caplog,
+                                                   django_capture_on_commit_callbacks):
+        """Сбой брокера после коммита пишется в лог, а не поднимается из запроса"""
+        def broken(topic, message):
+            raise ConnectionError("redis недоступен")
+        monkeypatch.setattr(pubsub, 'publish', broken)
+        with django_capture_on_commit_callbacks(execute=True):
+            Challenge.objects.create(from_user=user, to_user=another_user, difficulty=3, target_score=500)
+        assert 'challenge.created' in caplog.text
+
+    def test_failing_receiver_does_not_stop_others(self, user, django_capture_on_commit_callbacks):
+        """Исключение одного получателя session_completed не мешает следующим"""
+        received = []
+        def broken(sender, **kwargs):
+            raise ConnectionError("кэш недоступен")
+        session_completed.connect(broken, dispatch_uid='test-broken-receiver')
+        session_completed.connect(lambda sender, session, **kwargs: received.append(session.pk),
+                                  weak=False, dispatch_uid='test-next-receiver')
+        try:
+            with django_capture_on_commit_callbacks(execute=True):
+                session = GameSession.objects.create(user=user, difficulty=4, game_state={}, score=900,
+                                                     is_completed=True)
+        finally:
+            session_completed.disconnect(dispatch_uid='test-broken-receiver')
+            session_completed.disconnect(dispatch_uid='test-next-receiver')
+        assert received == [session.pk]
@@ -0,0 +1,59 @@
+import pytest
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from game.models import Leaderboard, UserProfile, bulk_create_users
+from game.tests.test_query_counts import statements
+
+@pytest.mark.django_db
+class TestUserBootstrap:
+    """Тесты создания связанных строк пользователя"""
+
+    def test_create_makes_rows_once(self):
+        """Создание пользователя — INSERT пользователя, профиля и рекорда, без UPDATE"""
+        with CaptureQueriesContext(connection) as ctx:
+            user = User.objects.create_user(username='fresh', password='pass12345')
+        sql = [q.upper() for q in statements(ctx)]
+        assert len(sql) == 3
+        assert all(q.startswith('INSERT') for q in sql)
+        assert UserProfile.objects.filter(user=user).count() == 1
+        assert Leaderboard.objects.filter(user=user).count() == 1
+
+    def test_register_single_profile(self, api_client):
+        """Регистрация через API не создаёт профиль повторно"""
+        response = api_client.post(reverse('register'), {'username': 'newbie', 'password': 'pass12345'})
+        assert response.status_code == 201
+        assert UserProfile.objects.filter(user__username='newbie').count() == 1
+
+    def test_save_skips_unchanged_related(self, user):
+        """Сохранение пользователя с загруженными, но не изменёнными профилем и рекордом — один UPDATE"""
+        user = User.objects.get(pk=user.pk)
+        user.profile, user.leaderboard
+        with CaptureQueriesContext(connection) as ctx:
+            user.save()
+        sql = statements(ctx)
+        assert len(sql) == 1
+        assert 'auth_user' in sql[0]
+
+    def test_save_writes_changed_related(self, user):
+        """Изменённый через user.profile профиль сохраняется только по изменённым полям"""
+        user = User.objects.get(pk=user.pk)
+        user.profile.bio = 'Собираю пазлы'
+        user.leaderboard
+        with CaptureQueriesContext(connection) as ctx:
+            user.save()
+        sql = statements(ctx)
+        assert len(sql) == 2
+        assert 'game_userprofile' in sql[1] and 'avatar' not in sql[1]
+        assert UserProfile.objects.get(user=user).bio == 'Собираю пазлы'
+
+    def test_bulk_create_users(self):
+        """Массовое создание: три INSERT на пачку, сигналы не нужны"""
+        users = [User(username=f'import{i}', password=make_password(None)) for i in range(5)]
+        with CaptureQueriesContext(connection) as ctx:
+            bulk_create_users(users)
+        assert len(statements(ctx)) == 3
+        assert UserProfile.objects.filter(user__username__startswith='import').count() == 5
+        assert Leaderboard.objects.filter(user__username__startswith='import').count() == 5
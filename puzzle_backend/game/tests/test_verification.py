@@ -0,0 +1,134 @@
+from datetime import timedelta
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework import status
+from game import verification
+from game.models import GameSession
+
+# От собранной доски пустая клетка уходит на две позиции влево и возвращается
+SOLUTION = [7, 8]
+
+def initial_tiles():
+    return [0, 1, 2, 3, 4, 5, 8, 6, 7]
+
+def completed(user, move_log=SOLUTION, timer=30, score=None):
+    game_state = {
+        'tiles': [{'index': i} for i in range(9)],
+        'initialTiles': initial_tiles(), 'moveLog': move_log, 'timer': timer,
+    }
+    if score is None:
+        score = verification.expected_score(len(move_log), timer)
+    return GameSession.objects.create(
+        user=user, difficulty=3, game_state=game_state, score=score, is_completed=True,
+        time_played=timedelta(minutes=5),
+    )
+
+class TestVerify:
+    """Тесты проверки одной игры"""
+
+    def test_valid(self):
+        """Лог собирает пазл, очки совпадают"""
+        state = {'initialTiles': initial_tiles(), 'moveLog': SOLUTION, 'timer': 30}
+        assert verification.verify(state, 9950, 300) == (verification.VALID, 9950)
+
+    def test_inflated_score(self):
+        """Завышенные очки — несовпадение"""
+        state = {'initialTiles': initial_tiles(), 'moveLog': SOLUTION, 'timer': 30}
+        assert verification.verify(state, 10000, 300) == (verification.SCORE_MISMATCH, 9950)
+
+    def test_log_does_not_solve(self):
+        """«Пасхалка»: доска собрана без ходов в логе"""
+        state = {'initialTiles': initial_tiles(), 'moveLog': [], 'timer': 5}
+        assert verification.verify(state, 9995, 300) == (verification.NOT_SOLVED, None)
+
+    def test_illegal_move(self):
+        """Недопустимый ход в логе"""
+        state = {'initialTiles': initial_tiles(), 'moveLog': [0], 'timer': 5}
+        assert verification.verify(state, 9985, 300)[0] == verification.NOT_SOLVED
+
+    def test_timer_longer_than_session(self):
+        """Таймер больше реального времени игры"""
+        state = {'initialTiles': initial_tiles(), 'moveLog': SOLUTION, 'timer': 1000}
+        assert verification.verify(state, 8980, 300)[0] == verification.SCORE_MISMATCH
+
+    def test_no_log(self):
+        """Старые игры без лога"""
+        assert verification.verify({'tiles': []}, 5000) == (verification.NO_LOG, None)
+
+@pytest.mark.django_db
+class TestVerifyCommand:
+    """Тесты команды verify_sessions"""
+
+    @pytest.mark.parametrize('workers', ['1', '2'])
+    def test_flags_sessions(self, user, workers):
+        """Статусы проставляются всем завершённым играм с очками"""
+        valid = completed(user)
+        cheated = completed(user, score=10000)
+        easter_egg = completed(user, move_log=[])
+        abandoned = GameSession.objects.create(user=user, difficulty=3, game_state={}, is_completed=True)
+        updated_at = GameSession.objects.get(pk=valid.pk).updated_at
+
+        call_command('verify_sessions', '--workers', workers, '--chunk-size', '2')
+
+        statuses = dict(GameSession.objects.values_list('pk', 'replay_status'))
+        assert statuses == {
+            valid.pk: 'valid', cheated.pk: 'score_mismatch',
+            easter_egg.pk: 'not_solved', abandoned.pk: 'pending',
+        }
+        assert GameSession.objects.get(pk=cheated.pk).replay_score == 9950
+        assert GameSession.objects.get(pk=valid.pk).updated_at == updated_at
+
+    def test_skips_verified_unless_all(self, user):
+        """Повторный запуск проверяет только новые сессии"""
+        session = completed(user)
+        GameSession.objects.filter(pk=session.pk).update(replay_status='not_solved')
+        call_command('verify_sessions', '--workers', '1')
+        assert GameSession.objects.get(pk=session.pk).replay_status == 'not_solved'
+        call_command('verify_sessions', '--workers', '1', '--all')
+        assert GameSession.objects.get(pk=session.pk).replay_status == 'valid'
+
+    def test_moves_endpoint_log_verifies(self, authenticated_client, user):
+        """Игра, сыгранная через API ходов, проходит проверку"""
+        # Начальная раскладка — после двух ходов от собранной доски
+        response = authenticated_client.post(reverse('gamesession-list'), {
+            'difficulty': 3,
+            'game_state': {'tiles': [{'index': i} for i in initial_tiles()], 'emptyIndex': 6, 'moves': 0, 'timer': 0},
+        }, format='json')
+        session_id = response.data['id']
+        authenticated_client.post(reverse('gamesession-moves', kwargs={'pk': session_id}),
+                                  {'moves': SOLUTION, 'timer': 12, 'flush': True}, format='json')
+        authenticated_client.patch(reverse('gamesession-detail', kwargs={'pk': session_id}), {
+            'game_state': {'tiles': [{'index': i} for i in range(9)], 'emptyIndex': 8, 'moves': 2, 'timer': 12},
+            'score': 9968, 'is_completed': True,
+        }, format='json')
+
+        call_command('verify_sessions', '--workers', '1')
+        assert GameSession.objects.get(pk=session_id).replay_status == 'valid'
+
+@pytest.mark.django_db
+class TestVerifyEndpoint:
+    """Тесты API проверки"""
+
+    def test_admin_verifies(self, authenticated_admin_client, user):
+        """Администратор получает результат проверки"""
+        session = completed(user, score=10000)
+        response = authenticated_admin_client.post(reverse('session-verify', kwargs={'pk': session.pk}))
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['replay_status'] == 'score_mismatch'
+        assert response.data['replay_score'] == 9950
+        assert GameSession.objects.get(pk=session.pk).replay_status == 'score_mismatch'
+
+    def test_regular_user_forbidden(self, authenticated_client, user):
+        """Обычному пользователю проверка недоступна"""
+        session = completed(user)
+        response = authenticated_client.post(reverse('session-verify', kwargs={'pk': session.pk}))
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_status_is_read_only(self, authenticated_client, user):
+        """Клиент не может сам выставить статус проверки"""
+        session = GameSession.objects.create(user=user, difficulty=3, game_state={'tiles': []})
+        authenticated_client.patch(reverse('gamesession-detail', kwargs={'pk': session.pk}),
+                                   {'replay_status': 'valid'}, format='json')
+        assert GameSession.objects.get(pk=session.pk).replay_status == 'pending'
@@ -0,0 +1,107 @@
+"""Миниатюры аватаров: квадрат 64/128/256 в WebP и JPEG без метаданных.
+
+Обработка идёт в пуле потоков после коммита транзакции, поэтому ответ на загрузку
+аватара не ждёт Pillow. Пути к готовым файлам хранятся в UserProfile.avatar_thumbs
+в виде ``{"128": {"webp": "...", "jpeg": "..."}, ...}``.
+"""
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from PIL import Image, ImageOps
+
+from .models import UserProfile
+
+logger = logging.getLogger(__name__)
+
+SIZES = (64, 128, 256)
+FORMATS = {'webp': ('WEBP', {'quality': 80, 'method': 4}), 'jpeg': ('JPEG', {'quality': 85, 'optimize': True})}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.AVATAR_THUMBNAIL_WORKERS, thread_name_prefix='avatar-thumbs'
+            )
+        return _executor
+
+
+def render(source):
+    """Миниатюры из файла-источника: {(размер, формат): байты}."""
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image).convert('RGB')
+        # Новое изображение без info — EXIF, GPS и ICC не переносятся
+        square = ImageOps.fit(image, (max(SIZES), max(SIZES)), Image.LANCZOS)
+    result = {}
+    for size in SIZES:
+        thumb = square if size == square.width else square.resize((size, size), Image.LANCZOS)
+        for extension, (fmt, options) in FORMATS.items():
+            buffer = io.BytesIO()
+            thumb.save(buffer, fmt, **options)
+            result[size, extension] = buffer.getvalue()
+    return result
+
+
+def _delete(thumbs):
+    for paths in (thumbs or {}).values():
+        for path in paths.values():
+            default_storage.delete(path)
+
+
+def process(profile_id, previous=None):
+    """Строит миниатюры текущего аватара профиля; возвращает словарь путей или None.
+
+    ``previous`` — миниатюры прежнего аватара, которые удаляются после успешной замены.
+    """
+    profile = UserProfile.objects.filter(pk=profile_id).only('avatar', 'avatar_thumbs').first()
+    if profile is None or not profile.avatar:
+        return None
+    name = profile.avatar.name
+    with profile.avatar.open('rb') as source:
+        rendered = render(source)
+
+    stem = PurePosixPath(name).stem
+    thumbs = {}
+    for (size, extension), content in rendered.items():
+        path = default_storage.save(f'avatars/thumbs/{profile_id}/{stem}-{size}.{extension}', ContentFile(content))
+        thumbs.setdefault(str(size), {})[extension] = path
+
+    # Пока строили, могли загрузить новый аватар — тогда эти миниатюры не нужны
+    updated = UserProfile.objects.filter(pk=profile_id, avatar=name).update(avatar_thumbs=thumbs)
+    if not updated:
+        _delete(thumbs)
+        return None
+    _delete(profile.avatar_thumbs)
+    _delete(previous)
+    return thumbs
+
+
+def _run(profile_id, previous):
+    try:
+        process(profile_id, previous)
+    except Exception:
+        logger.exception("Не удалось построить миниатюры аватара профиля %s", profile_id)
+    finally:
+        # У потоков пула свои соединения с БД
+        connection.close()
+
+
+def schedule(profile_id, previous=None):
+    """Ставит построение миниатюр в пул после коммита (синхронно, если пул выключен)."""
+    def submit():
+        if settings.AVATAR_THUMBNAIL_WORKERS <= 0:
+            process(profile_id, previous)
+        else:
+            _get_executor().submit(_run, profile_id, previous)
+    transaction.on_commit(submit)
@@ -0,0 +1,118 @@
+"""Push-обновления: события вызовов и рейтинга и WebSocket-обработчик /ws/updates/.
+
+Клиент подключается с JWT access-токеном в ``?token=`` и получает JSON-сообщения:
+
+* ``challenge.created`` — новый вызов (получателю);
+* ``challenge.updated`` — вызов принят или завершён (отправителю);
+* ``leaderboard.changed`` — завершена игра с очками на сложности ``difficulty``;
+* ``resync`` — сообщения были пропущены, нужно перечитать списки.
+
+Соединение закрывается с кодом 4401 при неверном токене и когда токен истекает.
+"""
+import asyncio
+import json
+import logging
+import time
+from urllib.parse import parse_qs
+
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import pubsub
+from .models import Challenge
+from .signals import session_completed
+
+logger = logging.getLogger(__name__)
+
+CLOSE_UNAUTHORIZED = 4401
+
+
+def _publish(topic, message):
+    """Публикация после коммита: сбой брокера не должен давать 500 уже сохранённому запросу."""
+    try:
+        pubsub.publish(topic, message)
+    except Exception:
+        logger.exception("Не удалось опубликовать %s в %s", message['type'], topic)
+
+
+@receiver(post_save, sender=Challenge)
+def publish_challenge(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        topic = pubsub.user_topic(instance.to_user_id)
+        message = {'type': 'challenge.created', 'challenge': {
+            'id': instance.pk, 'from_username': instance.from_user.username,
+            'difficulty': instance.difficulty, 'target_score': instance.target_score,
+            'message': instance.message,
+        }}
+    else:
+        topic = pubsub.user_topic(instance.from_user_id)
+        message = {'type': 'challenge.updated', 'challenge': {
+            'id': instance.pk, 'is_accepted': instance.is_accepted,
+            'is_completed': instance.is_completed, 'response_score': instance.response_score,
+        }}
+    transaction.on_commit(lambda: _publish(topic, message))
+
+
+@receiver(session_completed)
+def publish_leaderboard_change(sender, session, **kwargs):
+    # Уже после коммита (сигнал отправляется из on_commit)
+    if session.score > 0:
+        _publish(pubsub.LEADERBOARD_TOPIC, {'type': 'leaderboard.changed', 'difficulty': session.difficulty})
+
+
+def authenticate(scope):
+    """(id пользователя, время истечения токена) из ``?token=``; без обращения к БД."""
+    query = parse_qs(scope.get('query_string', b'').decode())
+    raw = (query.get('token') or [''])[0]
+    if not raw:
+        return None
+    try:
+        token = AccessToken(raw)
+    except TokenError:
+        return None
+    return token[api_settings.USER_ID_CLAIM], token['exp']
+
+
+async def websocket_updates(scope, receive, send):
+    """ASGI-приложение WebSocket: подписка на личную тему пользователя и тему рейтинга."""
+    if (await receive())['type'] != 'websocket.connect':
+        return
+    credentials = authenticate(scope)
+    if credentials is None:
+        await send({'type': 'websocket.close', 'code': CLOSE_UNAUTHORIZED})
+        return
+    user_id, expires = credentials
+
+    subscription = pubsub.broker().subscribe([pubsub.user_topic(user_id), pubsub.LEADERBOARD_TOPIC])
+    await send({'type': 'websocket.accept'})
+    receiving = asyncio.ensure_future(receive())
+    delivering = asyncio.ensure_future(subscription.get())
+    try:
+        while True:
+            remaining = expires - time.time()
+            if remaining <= 0:
+                await send({'type': 'websocket.close', 'code': CLOSE_UNAUTHORIZED})
+                return
+            done, _ = await asyncio.wait(
+                {receiving, delivering}, timeout=remaining, return_when=asyncio.FIRST_COMPLETED
+            )
+            if receiving in done:
+                event = receiving.result()
+                if event['type'] == 'websocket.disconnect':
+                    return
+                if event.get('text') == '{"type":"ping"}':
+                    await send({'type': 'websocket.send', 'text': '{"type":"pong"}'})
+                receiving = asyncio.ensure_future(receive())
+            if delivering in done:
+                await send({'type': 'websocket.send', 'text': json.dumps(delivering.result())})
+                delivering = asyncio.ensure_future(subscription.get())
+    finally:
+        subscription.close()
+        receiving.cancel()
+        delivering.cancel()
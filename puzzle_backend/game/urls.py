@@ -1,10 +1,12 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from . import async_views
 from .views import (
     RegisterView, ProfileView, PublicProfileView, LeaderboardView,
     GameSessionViewSet, FriendListCreateView, FriendDeleteView,
-    ChallengeViewSet, UserAchievementListView
+    LeaderboardPositionView, ChallengeViewSet, UserAchievementListView, SessionVerifyView,
+    PuzzleImageView, PuzzleImageSpriteView
 )
 
 router = DefaultRouter()
@@ -17,8 +19,18 @@ urlpatterns = [
     path('profile/<str:username>/', PublicProfileView.as_view(), name='public-profile'), 
     path('achievements/', UserAchievementListView.as_view(), name='achievements'),
     path('leaderboard/', LeaderboardView.as_view(), name='leaderboard'),
+    path('leaderboard/me/', LeaderboardPositionView.as_view(), name='leaderboard-me'),
+    path('puzzle-image/', PuzzleImageView.as_view(), name='puzzle-image'),
+    path('puzzle-image/<str:source_id>/<int:difficulty>/', PuzzleImageSpriteView.as_view(),
+         name='puzzle-image-sprite'),
     path('friends/', FriendListCreateView.as_view(), name='friends-list'),
     path('friends/<int:pk>/', FriendDeleteView.as_view(), name='friend-delete'),
+    path('sessions/<int:pk>/verify/', SessionVerifyView.as_view(), name='session-verify'),
+    # Асинхронные версии read-only эндпоинтов (под ASGI-сервером)
+    path('async/leaderboard/', async_views.leaderboard_view, name='async-leaderboard'),
+    path('async/profile/<str:username>/', async_views.public_profile_view, name='async-public-profile'),
+    path('async/achievements/', async_views.achievements_view, name='async-achievements'),
+    path('async/friends/', async_views.friends_view, name='async-friends'),
     path('token/', TokenObtainPairView.as_view(), name='token-obtain'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token-refresh'),
     path('', include(router.urls)),
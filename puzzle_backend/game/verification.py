@@ -0,0 +1,44 @@
+"""Проверка завершённых игр повтором лога ходов.
+
+Модуль не обращается к БД и не импортирует модели: функции проверки выполняются
+в процессах пула, куда передаются только простые кортежи строк.
+"""
+from .engine import IllegalMoveError, InvalidBoardError, replay
+
+PENDING = 'pending'
+VALID = 'valid'
+SCORE_MISMATCH = 'score_mismatch'
+NOT_SOLVED = 'not_solved'
+NO_LOG = 'no_log'
+
+# Таймер клиента не может превышать реальное время игры (с запасом на задержки сети)
+TIMER_SLACK_SECONDS = 60
+
+
+def expected_score(moves, timer):
+    """Формула очков фронтенда."""
+    return max(0, 10000 - moves * 10 - timer)
+
+
+def verify(game_state, score, seconds_played=None):
+    """Результат проверки одной игры: (статус, пересчитанные очки или None)."""
+    if not isinstance(game_state, dict) or 'initialTiles' not in game_state or 'moveLog' not in game_state:
+        return NO_LOG, None
+    try:
+        board = replay(game_state['initialTiles'], game_state['moveLog'])
+        timer = int(game_state.get('timer', 0))
+    except (IllegalMoveError, InvalidBoardError, TypeError, ValueError):
+        return NOT_SOLVED, None
+    if not board.is_solved():
+        return NOT_SOLVED, None
+    recomputed = expected_score(len(game_state['moveLog']), timer)
+    if recomputed != score:
+        return SCORE_MISMATCH, recomputed
+    if timer < 0 or (seconds_played is not None and timer > seconds_played + TIMER_SLACK_SECONDS):
+        return SCORE_MISMATCH, recomputed
+    return VALID, recomputed
+
+
+def verify_chunk(rows):
+    """Проверка пачки строк (id, game_state, score, секунды игры) в процессе пула."""
+    return [(pk, *verify(game_state, score, seconds)) for pk, game_state, score, seconds in rows]
@@ -1,12 +1,25 @@
 from rest_framework import viewsets, generics, permissions, status
+from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.exceptions import ValidationError
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.db.models import Max
+from django.db.models import DurationField, ExpressionWrapper, F
+from django.db.models.functions import Now
+from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
+from django.utils import timezone
 from django.utils.dateparse import parse_date
+from . import autosave, images, leaderboard, ranking, solver, thumbnails, verification
+from .engine import Board, IllegalMoveError, InvalidBoardError
 from .models import GameSession, Friendship, UserProfile, Challenge, UserAchievement, Achievement
-from .serializers import RegisterSerializer, ProfileSerializer, GameSessionSerializer, FriendSerializer, ChallengeSerializer, AchievementSerializer
+from .serializers import (
+    RegisterSerializer, ProfileSerializer, GameSessionSerializer, FriendSerializer,
+    ChallengeSerializer, AchievementSerializer, MoveBatchSerializer
+)
 
 class RegisterView(generics.CreateAPIView):
     queryset = User.objects.all()
@@ -25,16 +38,18 @@ class ProfileView(APIView):
         profile, created = UserProfile.objects.get_or_create(user=request.user)
         serializer = ProfileSerializer(profile, data=request.data, partial=True)
         if serializer.is_valid():
-            # Обработка аватара (файл из FormData)
+            # Обработка аватара (файл из FormData): старые миниатюры больше не подходят,
+            # новые строятся в фоне после ответа
             if 'avatar' in request.FILES:
-                profile.avatar = request.FILES['avatar']
-                profile.save()  # Сохраняем файл отдельно
-
-            serializer.save()
+                previous = profile.avatar_thumbs
+                serializer.save(avatar_thumbs={})
+                thumbnails.schedule(profile.pk, previous)
+            else:
+                serializer.save()
 
             if 'email' in request.data:
                 request.user.email = request.data.get('email', request.user.email)
-                request.user.save()
+                request.user.save(update_fields=['email'])
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -52,23 +67,121 @@ class GameSessionViewSet(viewsets.ModelViewSet):
     queryset = GameSession.objects.all()
     serializer_class = GameSessionSerializer
     permission_classes = [permissions.IsAuthenticated]
+    cursor_ordering = ('-updated_at', '-id')
 
     def get_queryset(self):
         return GameSession.objects.filter(user=self.request.user, is_completed=False).order_by('-updated_at')
 
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if page is not None:
+            autosave.overlay(page, self.request.user.id)
+        return page
+
+    def retrieve(self, request, *args, **kwargs):
+        session = self.get_object()
+        autosave.overlay([session], request.user.id)
+        return Response(self.get_serializer(session).data)
+
     def perform_create(self, serializer):
-        # При новой игре завершаем предыдущую незавершённую
-        previous = GameSession.objects.filter(user=self.request.user, is_completed=False).first()
-        if previous:
-            previous.is_completed = True
-            previous.score = 0  # Или рассчитай текущий, если нужно
-            previous.save()
+        # При новой игре закрываем предыдущую незавершённую без очков. Это не завершение:
+        # UPDATE в обход save() не трогает рекорды и не отправляет session_completed
+        abandoned = GameSession.objects.filter(user=self.request.user, is_completed=False)
+        autosave.drop_buffers(abandoned.values_list('pk', flat=True))
+        abandoned.update(
+            is_completed=True, score=0, updated_at=timezone.now(),
+            time_played=ExpressionWrapper(Now() - F('created_at'), output_field=DurationField()),
+        )
 
+        game_state = serializer.validated_data['game_state']
+        # Начальная раскладка нужна для последующей проверки лога ходов; лог ведёт только сервер
+        if isinstance(game_state, dict) and isinstance(game_state.get('tiles'), list):
+            game_state['initialTiles'] = [t.get('index') for t in game_state['tiles']]
+            game_state['moveLog'] = []
+            game_state['moves'] = 0
         serializer.save(user=self.request.user)
 
     def perform_update(self, serializer):
+        # PATCH вытесняет буфер ходов, но доску (раскладку, лог и число ходов) клиент не
+        # переписывает: она берётся из буфера или БД, иначе поддельный лог прошёл бы проверку
+        entry = autosave.discard_buffer(serializer.instance.pk)
+        current = entry['state'] if entry else serializer.instance.game_state
+        game_state = serializer.validated_data.get('game_state')
+        if game_state is None and entry is not None:
+            # Ходы из буфера не теряются и при PATCH без game_state
+            serializer.validated_data['game_state'] = current
+        elif isinstance(game_state, dict) and isinstance(current, dict):
+            autosave.keep_board(game_state, current)
         serializer.save()
 
+    @action(detail=True, methods=['post'])
+    def moves(self, request, pk=None):
+        """Пакет ходов: применяется к сохранённому состоянию, в БД пишется редкий снимок."""
+        serializer = MoveBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        entry = autosave.load_buffer(pk, request.user.id)
+        if entry is None:
+            entry = autosave.new_buffer(self.get_object())
+        if not autosave.check_base(entry, data.get('base')):
+            return Response(
+                {'detail': 'Состояние игры на сервере отличается от присланного.', 'game_state': entry['state']},
+                status=status.HTTP_409_CONFLICT
+            )
+        try:
+            autosave.apply_batch(entry, data['moves'], data['timer'])
+        except IllegalMoveError as exc:
+            return Response(
+                {'detail': str(exc), 'game_state': entry['state']},
+                status=status.HTTP_409_CONFLICT
+            )
+        except InvalidBoardError as exc:
+            raise ValidationError({"game_state": str(exc)})
+
+        saved = autosave.commit(pk, entry, flush=data['flush'])
+        if saved is None:
+            return Response({'detail': 'Игра уже завершена.'}, status=status.HTTP_404_NOT_FOUND)
+        state = entry['state']
+        return Response({
+            'moves': state['moves'],
+            'timer': state['timer'],
+            'emptyIndex': state['emptyIndex'],
+            'saved': saved,
+        })
+
+    @action(detail=True, methods=['get'])
+    def hint(self, request, pk=None):
+        """Следующий оптимальный ход для текущей доски (с учётом ещё не записанных ходов)."""
+        entry = autosave.load_buffer(pk, request.user.id)
+        state = entry['state'] if entry else self.get_object().game_state
+        try:
+            board = Board.from_state(state)
+        except InvalidBoardError as exc:
+            raise ValidationError({"game_state": str(exc)})
+        try:
+            result = solver.hint(board, settings.HINT_TIMEOUT_SECONDS[board.size])
+        except solver.UnsolvableError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_409_CONFLICT)
+        return Response(result)
+
+class SessionVerifyView(APIView):
+    """Проверка завершённой игры повтором лога ходов (для администраторов)."""
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request, pk):
+        session = get_object_or_404(GameSession, pk=pk, is_completed=True)
+        seconds = session.time_played.total_seconds() if session.time_played else None
+        replay_status, replay_score = verification.verify(session.game_state, session.score, seconds)
+        # update() не трогает updated_at, по которому строятся рейтинги за период
+        GameSession.objects.filter(pk=pk).update(replay_status=replay_status, replay_score=replay_score)
+        return Response({
+            'id': session.pk,
+            'score': session.score,
+            'replay_status': replay_status,
+            'replay_score': replay_score,
+        })
+
 class LeaderboardView(APIView):
     permission_classes = [permissions.AllowAny]
 
@@ -78,29 +191,41 @@ class LeaderboardView(APIView):
         date_from = parse_date(request.query_params.get('date_from', ''))
         date_to = parse_date(request.query_params.get('date_to', ''))
 
-        queryset = GameSession.objects.filter(is_completed=True)
-        if difficulty:
-            queryset = queryset.filter(difficulty=difficulty)
-        if date_from:
-            queryset = queryset.filter(updated_at__date__gte=date_from)
-        if date_to:
-            queryset = queryset.filter(updated_at__date__lte=date_to)
+        if difficulty and difficulty not in ('3', '4', '5'):
+            raise ValidationError({"difficulty": "Допустимые значения: 3, 4, 5."})
 
-        if friends and request.user.is_authenticated:
-            friend_ids = Friendship.objects.filter(from_user=request.user).values_list('to_user_id', flat=True)
-            queryset = queryset.filter(user__in=friend_ids)
+        friends_of = request.user.pk if friends and request.user.is_authenticated else None
+        key = leaderboard.cache_key(difficulty, date_from, date_to, friends_of)
+        return Response(leaderboard.cached(
+            key, lambda: leaderboard.results(difficulty, date_from, date_to, friends_of)
+        ))
 
-        results = queryset.values('user__username').annotate(best_score=Max('score')).order_by('-best_score')
+class LeaderboardPositionView(APIView):
+    """Место текущего пользователя и пять строк рейтинга вокруг него."""
+    permission_classes = [permissions.IsAuthenticated]
 
-        for rank, entry in enumerate(results, start=1):
-            entry['rank'] = rank
+    def get(self, request):
+        difficulty = request.query_params.get('difficulty')
+        friends = request.query_params.get('friends') == 'true'
+        if difficulty and difficulty not in ('3', '4', '5'):
+            raise ValidationError({"difficulty": "Допустимые значения: 3, 4, 5."})
 
-        return Response(list(results)[:50])
+        if friends:
+            user_ids = [request.user.pk, *Friendship.objects.filter(
+                from_user=request.user
+            ).values_list('to_user_id', flat=True)]
+            result = leaderboard.position(request.user.pk, difficulty=difficulty, user_ids=user_ids)
+        else:
+            result = ranking.position(request.user.pk, difficulty=difficulty)
+        if result is None:
+            return Response({'rank': None, 'best_score': 0, 'entries': []})
+        return Response(result)
 
 # Список достижений пользователя
 class UserAchievementListView(generics.ListAPIView):
     serializer_class = AchievementSerializer
     permission_classes = [permissions.IsAuthenticated]
+    cursor_ordering = '-id'
 
     def get_queryset(self):
         return Achievement.objects.filter(userachievement__user=self.request.user)
@@ -108,9 +233,10 @@ class UserAchievementListView(generics.ListAPIView):
 class FriendListCreateView(generics.ListCreateAPIView):
     serializer_class = FriendSerializer
     permission_classes = [permissions.IsAuthenticated]
+    cursor_ordering = ('-created_at', '-id')
 
     def get_queryset(self):
-        return Friendship.objects.filter(from_user=self.request.user)
+        return Friendship.objects.filter(from_user=self.request.user).select_related('to_user')
 
     def perform_create(self, serializer):
         username = self.request.data.get('username')
@@ -141,9 +267,10 @@ class ChallengeViewSet(viewsets.ModelViewSet):
     queryset = Challenge.objects.all()
     serializer_class = ChallengeSerializer
     permission_classes = [permissions.IsAuthenticated]
+    cursor_ordering = ('-created_at', '-id')
 
     def get_queryset(self):
-        return Challenge.objects.filter(to_user=self.request.user).order_by('-created_at')
+        return Challenge.objects.filter(to_user=self.request.user).select_related('from_user').order_by('-created_at')
 
     def perform_create(self, serializer):
         to_username = self.request.data.get('to_username')
@@ -175,4 +302,36 @@ class ChallengeViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(instance, data=request.data, partial=True)
         serializer.is_valid(raise_exception=True)
         serializer.save()
-        return Response(serializer.data)
\ No newline at end of file
+        return Response(serializer.data)
+
+class PuzzleImageView(APIView):
+    """Случайная картинка из локального пула: URL спрайта и смещения плиток."""
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request):
+        difficulty = request.query_params.get('difficulty', '3')
+        if difficulty not in ('3', '4', '5'):
+            raise ValidationError({"difficulty": "Допустимые значения: 3, 4, 5."})
+        try:
+            source_id = images.random_source()
+        except images.ImageNotFound as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_404_NOT_FOUND)
+        url = reverse('puzzle-image-sprite', kwargs={'source_id': source_id, 'difficulty': int(difficulty)})
+        return Response({'id': source_id, 'difficulty': int(difficulty), 'url': url,
+                         **images.layout(int(difficulty))})
+
+class PuzzleImageSpriteView(APIView):
+    """Спрайт картинки для сложности; строится при первом обращении и кэшируется на диске."""
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, source_id, difficulty):
+        if difficulty not in (3, 4, 5):
+            raise Http404
+        try:
+            sprite = images.open_sprite(source_id, difficulty)
+        except images.ImageNotFound:
+            raise Http404
+        response = FileResponse(sprite, content_type='image/jpeg')
+        # Спрайт однозначно задан исходником и сложностью, поэтому браузер берёт его из кэша
+        patch_cache_control(response, public=True, max_age=365 * 24 * 60 * 60, immutable=True)
+        return response
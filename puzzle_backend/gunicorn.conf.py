@@ -0,0 +1,79 @@
+"""Конфигурация gunicorn для production: gunicorn -c gunicorn.conf.py puzzle_backend.wsgi:application
+
+Приложение загружается в мастере до fork (preload_app): воркеры стартуют быстрее и делят
+страницы памяти с импортированным кодом. Воркер по умолчанию — gthread (WSGI с потоками):
+API почти целиком из синхронных представлений DRF, а под ASGI каждое из них выполняется
+в единственном потоке sync_to_async воркера, по одному запросу за раз.
+
+WebSocket /ws/updates/ и /api/async/... обслуживает отдельный сервис с uvicorn-воркерами:
+gunicorn -c gunicorn.conf.py -k uvicorn_worker.UvicornWorker -b 0.0.0.0:8001 puzzle_backend.asgi:application
+(маршрутизация — nginx.conf).
+
+Плавный перезапуск воркеров — SIGHUP мастеру; новый код при preload_app подхватывается
+только перезапуском мастера (docker compose restart web или USR2 + TERM старому мастеру).
+"""
+import multiprocessing
+import os
+
+cpu_count = multiprocessing.cpu_count()
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+# Процессов 2×CPU+1: пока один ждёт БД, другой занимает ядро
+workers = int(os.getenv('WEB_CONCURRENCY') or cpu_count * 2 + 1)
+# Потоков на gthread-воркер (uvicorn-воркер их не использует)
+threads = int(os.getenv('GUNICORN_THREADS') or min(cpu_count * 2, 8))
+
+# Разработка: перезапуск при изменении файлов; с предзагрузкой он не видел бы новый код
+reload = os.getenv('GUNICORN_RELOAD', 'False') == 'True'
+preload_app = not reload
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '30'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '5'))
+# Перезапуск воркера после N запросов (со сдвигом, чтобы не все сразу) ограничивает рост памяти
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '10000'))
+max_requests_jitter = max_requests // 10
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+forwarded_allow_ips = os.getenv('FORWARDED_ALLOW_IPS', '127.0.0.1')
+
+# Каталог файлов метрик воркеров (mmap), тот же, что METRICS_DIR в настройках Django
+metrics_dir = os.getenv('METRICS_DIR', '')
+
+
+def on_starting(server):
+    # Счётчики прошлого запуска не должны попасть в новый
+    if metrics_dir:
+        from game import metrics
+
+        metrics.reset_dir(metrics_dir)
+
+
+def child_exit(server, worker):
+    # Счётчики завершившегося воркера переносятся в архив, чтобы суммы не откатывались
+    if metrics_dir:
+        from game import metrics
+
+        metrics.archive(metrics_dir, worker.pid)
+
+
+def post_fork(server, worker):
+    from django.conf import settings
+
+    if not settings.configured:
+        # Без предзагрузки приложение ещё не импортировано — воркер загрузит его сам
+        return
+
+    # Соединения с БД мастера (если были) нельзя делить между процессами
+    from django.db import connections
+
+    connections.close_all()
+
+    # Индекс рейтинга в памяти загружается каждым воркером в фоне, до первых запросов
+    # (единственное место запуска; без предзагрузки его запустит первое обращение)
+    from game import ranking
+
+    if ranking.enabled():
+        ranking.warm()
@@ -2,6 +2,7 @@
 ASGI config for puzzle_backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+WebSocket /ws/updates/ обслуживается game.updates, остальное — Django.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -13,4 +14,28 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'puzzle_backend.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from game import updates  # noqa: E402  (после настройки Django)
+
+
+async def lifespan(scope, receive, send):
+    # Индекс рейтинга загружается в post_fork (gunicorn.conf.py), здесь — только протокол
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'websocket':
+        if scope['path'] == '/ws/updates/':
+            return await updates.websocket_updates(scope, receive, send)
+        await receive()
+        return await send({'type': 'websocket.close', 'code': 4404})
+    if scope['type'] == 'lifespan':
+        return await lifespan(scope, receive, send)
+    return await django_application(scope, receive, send)
@@ -30,6 +30,10 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # Статика: файлы с хэшем в имени — Cache-Control immutable на год, gzip/brotli заготовлены заранее
+    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'game.metrics.MetricsMiddleware',
+    'game.instrumentation.RequestInstrumentationMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -89,13 +93,123 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# collectstatic добавляет хэш содержимого в имена (манифест staticfiles.json) и сжимает файлы
+# в .gz и .br; в режиме отладки статика отдаётся как есть, без сборки
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+        else 'whitenoise.storage.CompressedManifestStaticFilesStorage',
+    },
+}
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# При нескольких воркерах нужен общий бэкенд (например, FileBasedCache)
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('DJANGO_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('DJANGO_CACHE_LOCATION', 'puzzle-cache'),
+    }
+}
+
+# Ответы /api/leaderboard/ кэшируются и сбрасываются при завершении игр
+LEADERBOARD_CACHE_TIMEOUT = int(os.getenv('LEADERBOARD_CACHE_TIMEOUT', '300'))
+
+# Индекс рейтинга в памяти каждого процесса (топ и место без запросов к БД); изменения
+# других процессов подтягиваются из журнала в кэше не чаще раза в RANK_INDEX_SYNC_SECONDS.
+# Журнал должен быть общим для процессов — нужен общий кэш (Redis/Memcached)
+LEADERBOARD_RANK_INDEX = os.getenv('LEADERBOARD_RANK_INDEX', 'False') == 'True'
+RANK_INDEX_SYNC_SECONDS = float(os.getenv('RANK_INDEX_SYNC_SECONDS', '1'))
+
+# Push-обновления по WebSocket (/ws/updates/): LocalBroker раздаёт события внутри процесса,
+# при нескольких процессах ASGI-сервера нужен game.pubsub.RedisBroker (пакет redis)
+PUBSUB_BACKEND = os.getenv('PUBSUB_BACKEND', 'game.pubsub.LocalBroker')
+PUBSUB_REDIS_URL = os.getenv('PUBSUB_REDIS_URL', 'redis://redis:6379/1')
+# Очередь неотправленных сообщений на соединение; при переполнении клиент получает resync
+PUBSUB_QUEUE_SIZE = int(os.getenv('PUBSUB_QUEUE_SIZE', '100'))
+
+# Замеры каждого запроса (число и время SQL, сериализация, размер ответа): заголовок
+# Server-Timing и строка JSON в логгер game.requests; один и тот же SQL больше
+# N_PLUS_ONE_THRESHOLD раз за запрос — предупреждение о N+1
+REQUEST_INSTRUMENTATION = os.getenv('REQUEST_INSTRUMENTATION', 'False') == 'True'
+N_PLUS_ONE_THRESHOLD = int(os.getenv('N_PLUS_ONE_THRESHOLD', '10'))
+
+# Метрики Prometheus (/metrics). METRICS_DIR — общий каталог файлов метрик воркеров (mmap);
+# пустой — счётчики в памяти процесса (runserver, один процесс). Отдаются только METRICS_ALLOWED_IPS
+# (адреса или сети CIDR); заголовкам X-Forwarded-For не доверяем — за proxy /metrics закрыт
+METRICS_DIR = os.getenv('METRICS_DIR', '')
+METRICS_ALLOWED_IPS = [ip.strip() for ip in os.getenv('METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',') if ip.strip()]
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'game.requests': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
+# Автосохранение: снимок game_state пишется в БД раз в N ходов или T секунд
+AUTOSAVE_SNAPSHOT_MOVES = int(os.getenv('AUTOSAVE_SNAPSHOT_MOVES', '20'))
+AUTOSAVE_SNAPSHOT_SECONDS = int(os.getenv('AUTOSAVE_SNAPSHOT_SECONDS', '15'))
+# Копить ходы в кэше можно только при общем для воркеров кэше (Redis): локальный кэш процесса
+# вытесняет записи, а следующий пакет может прийти в другой воркер. Иначе каждый пакет — в БД
+AUTOSAVE_BUFFER_MOVES = CACHES['default']['BACKEND'] not in (
+    'django.core.cache.backends.locmem.LocMemCache', 'django.core.cache.backends.dummy.DummyCache',
+)
+
+# Подсказки: бюджет оптимального поиска по размеру доски (секунды) и размер кэша состояний.
+# Достигнуто (замеры в README): 3x3 — миллисекунды; 4x4 и 5x5 — ответ не позже бюджета
+# + HINT_QUEUE_SECONDS, но оптимальный только если IDA* уложился: на случайных 4x4 с базами
+# 5-5-5 это 9 досок из 15 (6 — быстрее секунды), остальные получают жадный ход
+HINT_TIMEOUT_SECONDS = {
+    3: float(os.getenv('HINT_TIMEOUT_3', '1')),
+    4: float(os.getenv('HINT_TIMEOUT_4', '2')),
+    5: float(os.getenv('HINT_TIMEOUT_5', '2')),
+}
+HINT_CACHE_SIZE = int(os.getenv('HINT_CACHE_SIZE', '100000'))
+# Процессы поиска подсказок (0 — искать в потоке запроса) и сколько сверх бюджета
+# ждать свободного процесса, прежде чем отдать best-effort ход
+HINT_WORKERS = int(os.getenv('HINT_WORKERS', '2'))
+HINT_QUEUE_SECONDS = float(os.getenv('HINT_QUEUE_SECONDS', '0.5'))
+
+# Базы шаблонов решателя (manage.py build_pattern_databases); без файлов — только эвристика
+PATTERN_DB_DIR = Path(os.getenv('PATTERN_DB_DIR', BASE_DIR / 'pattern_db'))
+
+# Локальный пул картинок пазла и дисковый кэш спрайтов по сложностям
+PUZZLE_IMAGE_POOL_DIR = Path(os.getenv('PUZZLE_IMAGE_POOL_DIR', BASE_DIR / 'image_pool'))
+PUZZLE_IMAGE_CACHE_DIR = Path(os.getenv('PUZZLE_IMAGE_CACHE_DIR', MEDIA_ROOT / 'puzzle_images'))
+PUZZLE_IMAGE_CACHE_BYTES = int(os.getenv('PUZZLE_IMAGE_CACHE_BYTES', str(200 * 2 ** 20)))
+PUZZLE_IMAGE_TILE_SIZE = int(os.getenv('PUZZLE_IMAGE_TILE_SIZE', '160'))
+
+# Потоки для миниатюр аватаров (0 — строить синхронно после коммита)
+AVATAR_THUMBNAIL_WORKERS = int(os.getenv('AVATAR_THUMBNAIL_WORKERS', '2'))
+
+# Выгрузка сессий из админки: CSV потоком, XLSX фоновой задачей в файл (вне MEDIA_ROOT —
+# отдаётся только персоналу); 0 потоков — строить синхронно
+EXPORT_DIR = Path(os.getenv('EXPORT_DIR', BASE_DIR / 'exports'))
+EXPORT_WORKERS = int(os.getenv('EXPORT_WORKERS', '1'))
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', '2000'))
+EXPORT_RETENTION_SECONDS = int(os.getenv('EXPORT_RETENTION_SECONDS', str(24 * 3600)))
+# Аренда задачи выгрузки в кэше: без продления дольше этого срока задача считается прерванной
+EXPORT_LEASE_SECONDS = int(os.getenv('EXPORT_LEASE_SECONDS', '60'))
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
+    'DEFAULT_PAGINATION_CLASS': 'game.pagination.CursorPagination',
+    'PAGE_SIZE': int(os.getenv('API_PAGE_SIZE', '50')),
 }
+API_MAX_PAGE_SIZE = int(os.getenv('API_MAX_PAGE_SIZE', '200'))
+
+# Списки админки: начиная с этого числа строк (по статистике PostgreSQL) COUNT(*) не выполняется
+ADMIN_ESTIMATED_COUNT_THRESHOLD = int(os.getenv('ADMIN_ESTIMATED_COUNT_THRESHOLD', '100000'))
+# Сколько последних игр показывать на странице пользователя в админке
+ADMIN_INLINE_SESSIONS = int(os.getenv('ADMIN_INLINE_SESSIONS', '20'))
 
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=1),
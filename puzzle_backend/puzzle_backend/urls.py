@@ -2,10 +2,13 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
-from django.views.generic import TemplateView
+from game import frontend, health, metrics
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('healthz', health.healthz, name='healthz'),
+    path('readyz', health.readyz, name='readyz'),
+    path('metrics', metrics.scrape, name='metrics'),
     path('api/', include('game.urls')),
-    path('', TemplateView.as_view(template_name='index.html')),
+    path('', frontend.index, name='index'),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
@@ -0,0 +1,966 @@
+const board = document.getElementById('game-board');
+const movesDisplay = document.getElementById('moves');
+const timerDisplay = document.getElementById('timer');
+const playerNameInput = document.getElementById('player-name');
+const difficultySelect = document.getElementById('difficulty');
+const tutorial = document.getElementById('tutorial');
+const mainMenu = document.getElementById('main-menu');
+const newGameMenu = document.getElementById('new-game-menu');
+const gameMenu = document.getElementById('game-menu');
+const continueMainButton = document.getElementById('continue-main');
+const hint = document.getElementById('hint');
+const tutorialButton = document.getElementById('tutorial-button');
+const playerInfo = document.getElementById('player-info');
+const gameContainer = document.getElementById('game-container');
+let tiles = [];
+let size = 3;
+let moves = 0;
+let timer = 0;
+let timerInterval = null;
+let emptyIndex = size * size - 1;
+let isGameActive = false;
+let currentImageUrl = '';
+// Описание спрайта из /api/puzzle-image/ (смещения плиток), если картинка из пула
+let currentSprite = null;
+let hintTimeout = null;
+
+const moveSound = new Howl({src: ['https://www.soundjay.com/buttons/sounds/button-11.mp3'], volume: 1.0});
+const winSound = new Howl({src: ['https://www.soundjay.com/misc/sounds/dream-harp-08.mp3'], volume: 1.0});
+const easterSound = new Howl({src: ['https://www.soundjay.com/misc/sounds/magic-chime-01.mp3'], volume: 1.0});
+const buttonSound = new Howl({src: ['https://www.soundjay.com/buttons/button-1.mp3'], volume: 0.8});
+const hintSound = new Howl({src: ['https://www.soundjay.com/buttons/sounds/button-09a.mp3'], volume: 0.9});
+const backgroundMusic = new Howl({src: ['https://www.soundjay.com/free-music/sounds/heart-of-the-sea-01.mp3'], loop: true, volume: 0.5, preload: true});
+
+[moveSound, winSound, easterSound, buttonSound, hintSound, backgroundMusic].forEach(s => s.load());
+
+function playSound(sound) {
+    try { sound.play(); } catch (err) { console.error(err); }
+}
+function playButtonSound() { playSound(buttonSound); }
+
+let token = localStorage.getItem('token') || null;
+let currentSessionId = null;
+// Ходы копятся и уходят на сервер пакетами, а не полным состоянием раз в секунду
+const MOVE_BATCH_SIZE = 20;
+const AUTOSAVE_INTERVAL = 10;
+let pendingMoves = [];
+// Все ходы сессии: при расхождении с сервером уходят вместе с полным состоянием
+let moveLog = [];
+// Время, уже записанное на сервере: тикающий таймер сохраняется и без новых ходов
+let savedTimer = 0;
+let movesInFlight = null;
+
+function updateAuthUI() {
+    const loggedIn = !!token;
+    document.getElementById('login-btn').style.display = loggedIn ? 'none' : 'inline-block';
+    document.getElementById('register-btn').style.display = loggedIn ? 'none' : 'inline-block';
+    document.getElementById('logout-btn').style.display = loggedIn ? 'inline-block' : 'none';
+    document.getElementById('leaderboard-btn').style.display = loggedIn ? 'inline-block' : 'inline-block';
+    document.getElementById('friends-btn').style.display = loggedIn ? 'inline-block' : 'none';
+    document.getElementById('profile-btn').style.display = loggedIn ? 'inline-block' : 'none';
+    document.getElementById('username-display').style.display = loggedIn ? 'inline-block' : 'none';
+
+    if (loggedIn) {
+        fetch('/api/profile/', {headers: {Authorization: `Bearer ${token}`}})
+            .then(r => r.ok ? r.json() : null)
+            .then(data => {
+                if (data) {
+                    document.getElementById('username-display').textContent = data.username;
+                    playerNameInput.value = data.username;
+                }
+            });
+        connectUpdates();
+    }
+    checkContinueButton();
+}
+
+// Push-обновления: новые вызовы и изменения рейтинга приходят по WebSocket
+let updatesSocket = null;
+let updatesRetry = 0;
+
+function isModalOpen(id) { return document.getElementById(id).style.display === 'flex'; }
+
+function connectUpdates() {
+    if (!token || !window.WebSocket || updatesSocket) return;
+    const scheme = location.protocol === 'https:' ? 'wss' : 'ws';
+    const socket = new WebSocket(`${scheme}://${location.host}/ws/updates/?token=${encodeURIComponent(token)}`);
+    updatesSocket = socket;
+    socket.onopen = () => { updatesRetry = 0; };
+    socket.onmessage = event => handleUpdate(JSON.parse(event.data));
+    socket.onclose = event => {
+        if (updatesSocket !== socket) return;
+        updatesSocket = null;
+        // 4401 — токен неверен или истёк: переподключаться бессмысленно
+        if (!token || event.code === 4401) return;
+        const delay = Math.min(30000, 1000 * 2 ** updatesRetry++);
+        setTimeout(connectUpdates, delay);
+    };
+}
+
+function disconnectUpdates() {
+    if (!updatesSocket) return;
+    const socket = updatesSocket;
+    updatesSocket = null;
+    socket.close();
+}
+
+function handleUpdate(message) {
+    if (message.type === 'challenge.created' || message.type === 'challenge.updated') {
+        if (isModalOpen('friends-modal')) loadChallenges();
+        else document.getElementById('friends-btn').classList.add('has-updates');
+    } else if (message.type === 'leaderboard.changed') {
+        if (isModalOpen('leaderboard-modal')) loadLeaderboard();
+    } else if (message.type === 'resync') {
+        if (isModalOpen('friends-modal')) loadChallenges();
+        if (isModalOpen('leaderboard-modal')) loadLeaderboard();
+    }
+}
+
+async function login() {
+    const username = document.getElementById('login-username').value.trim();
+    const password = document.getElementById('login-password').value;
+    const resp = await fetch('/api/token/', {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify({username, password})
+    });
+    if (resp.ok) {
+        const data = await resp.json();
+        token = data.access;
+        localStorage.setItem('token', token);
+        localStorage.removeItem('puzzleProgress');
+        currentSessionId = null;
+        closeModal('login-modal');
+
+        location.reload();
+    } else {
+        document.getElementById('login-error').textContent = 'Неверные данные';
+    }
+}
+
+async function register() {
+    const username = document.getElementById('reg-username').value.trim();
+    const password = document.getElementById('reg-password').value;
+    const email = document.getElementById('reg-email').value.trim();
+    const resp = await fetch('/api/register/', {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify({username, password, email})
+    });
+    if (resp.ok) {
+        closeModal('register-modal');
+        alert('Регистрация успешна! Теперь войдите.');
+    } else {
+        const err = await resp.json();
+        document.getElementById('reg-error').textContent = Object.values(err).flat().join(' ');
+    }
+}
+
+function logout() {
+    token = null;
+    disconnectUpdates();
+    localStorage.removeItem('token');
+    currentSessionId = null;
+    updateAuthUI();
+    localStorage.removeItem('puzzleProgress');
+    alert('Вы вышли из аккаунта');
+    exitToMenu();
+}
+
+// Списки API постраничные (курсор в поле next): показываем первую страницу,
+// следующие подгружаются кнопкой «Ещё» в конце списка
+async function loadPages(url, listId, renderItem, emptyText, errorText) {
+    const list = document.getElementById(listId);
+    list.innerHTML = '';
+    async function loadPage(pageUrl, first) {
+        const resp = await fetch(pageUrl, {headers: {Authorization: `Bearer ${token}`}});
+        if (!resp.ok) {
+            const li = document.createElement('li');
+            li.textContent = errorText;
+            list.appendChild(li);
+            return;
+        }
+        const page = await resp.json();
+        if (first && page.results.length === 0) {
+            list.innerHTML = `<li>${emptyText}</li>`;
+            return;
+        }
+        page.results.forEach(item => list.appendChild(renderItem(item)));
+        if (page.next) {
+            const li = document.createElement('li');
+            const more = document.createElement('button');
+            more.textContent = 'Ещё';
+            more.onclick = () => { li.remove(); loadPage(page.next, false); };
+            li.appendChild(more);
+            list.appendChild(li);
+        }
+    }
+    await loadPage(url, true);
+}
+
+function showModal(id) { document.getElementById(id).style.display = 'flex'; }
+function closeModal(id) {
+    document.getElementById(id).style.display = 'none';
+    document.querySelectorAll('.error-msg').forEach(el => el.textContent = '');
+}
+
+document.getElementById('login-btn').onclick = () => showModal('login-modal');
+document.getElementById('register-btn').onclick = () => showModal('register-modal');
+document.getElementById('leaderboard-btn').onclick = () => { showModal('leaderboard-modal'); loadLeaderboard(); };
+document.getElementById('friends-btn').onclick = () => {
+    document.getElementById('friends-btn').classList.remove('has-updates');
+    showModal('friends-modal'); loadFriends(); loadChallenges();
+};
+document.getElementById('profile-btn').onclick = () => { showModal('profile-modal'); loadProfile(); loadAchievements(); };
+document.getElementById('logout-btn').onclick = logout;
+
+async function saveProgress(isCompleted = false) {
+    const cleanUrl = currentImageUrl.split('?')[0];
+    const data = {
+        difficulty: size,
+        game_state: {
+            tiles: tiles.map(t => ({index: t.index})),
+            emptyIndex,
+            moves,
+            timer,
+            imageUrl: cleanUrl
+        },
+        score: isCompleted ? Math.max(0, 10000 - moves * 10 - timer) : 0,
+        is_completed: isCompleted
+    };
+
+    if (token) {
+        let url = '/api/sessions/';
+        let method = 'POST';
+        if (currentSessionId) {
+            url += `${currentSessionId}/`;
+            method = 'PATCH';
+        }
+        const resp = await fetch(url, {
+            method,
+            headers: {
+                'Content-Type': 'application/json',
+                'Authorization': `Bearer ${token}`
+            },
+            body: JSON.stringify(data)
+        });
+        if (resp.ok) {
+            const json = await resp.json();
+            currentSessionId = json.id;
+            savedTimer = data.game_state.timer;
+        }
+    } else {
+        if (isCompleted) {
+            localStorage.removeItem('puzzleProgress');
+        } else {
+            localStorage.setItem('puzzleProgress', JSON.stringify({
+                playerName: playerNameInput.value,
+                difficulty: size,
+                moves, timer,
+                tiles: tiles.map(t => ({index: t.index})),
+                emptyIndex, imageUrl: cleanUrl
+            }));
+        }
+    }
+    checkContinueButton();
+}
+
+function queueMove(pos) {
+    if (!token) {
+        saveProgress();
+        return;
+    }
+    pendingMoves.push(pos);
+    moveLog.push(pos);
+    if (pendingMoves.length >= MOVE_BATCH_SIZE) flushMoves();
+}
+
+async function flushMoves(flush = false) {
+    if (!token || !currentSessionId) return;
+    if (movesInFlight) await movesInFlight;
+    if (pendingMoves.length === 0 && timer === savedTimer && !flush) return;
+    const batch = pendingMoves.splice(0);
+    const sentTimer = timer;
+    // Число ходов до пакета: сервер сверяет его со своим состоянием
+    const base = moves - pendingMoves.length - batch.length;
+    movesInFlight = (async () => {
+        try {
+            const resp = await fetch(`/api/sessions/${currentSessionId}/moves/`, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'Authorization': `Bearer ${token}`
+                },
+                body: JSON.stringify({moves: batch, timer, flush, base}),
+                keepalive: flush
+            });
+            if (resp.ok) {
+                savedTimer = Math.max(savedTimer, sentTimer);
+            } else if (resp.status === 409) {
+                // Расхождение с сервером — продолжаем с его состояния, неотправленные ходы отбрасываем
+                await adoptServerState((await resp.json()).game_state);
+            } else {
+                pendingMoves = batch.concat(pendingMoves);
+            }
+        } catch (err) {
+            pendingMoves = batch.concat(pendingMoves);
+        }
+    })();
+    await movesInFlight;
+    movesInFlight = null;
+}
+
+function autosaveTick() {
+    if (!token) {
+        saveProgress();
+    } else if (timer % AUTOSAVE_INTERVAL === 0) {
+        flushMoves();
+    }
+}
+
+async function adoptServerState(state) {
+    pendingMoves = [];
+    tiles = state.tiles.map(t => ({index: t.index, element: null}));
+    emptyIndex = state.emptyIndex;
+    moves = state.moves || 0;
+    moveLog = state.moveLog || [];
+    savedTimer = Math.min(savedTimer, state.timer || 0);
+    movesDisplay.textContent = moves;
+    board.innerHTML = '';
+    await createBoard();
+    updateBoardState();
+}
+
+async function loadServerProgress() {
+    if (!token) return false;
+    const resp = await fetch('/api/sessions/?page_size=1', {
+        headers: {Authorization: `Bearer ${token}`}
+    });
+    if (!resp.ok) return false;
+    const sessions = (await resp.json()).results;
+    if (sessions.length === 0) return false;
+
+    const s = sessions[0];
+    currentSessionId = s.id;
+    size = s.difficulty;
+    difficultySelect.value = size;
+    const state = s.game_state;
+    tiles = state.tiles.map((t, i) => ({index: t.index, element: null}));
+    emptyIndex = state.emptyIndex;
+    moves = state.moves || 0;
+    timer = state.timer || 0;
+    // Ходы, ещё не отправленные пакетом, в состоянии сервера отсутствуют
+    moveLog = (state.moveLog || []).concat(pendingMoves);
+    savedTimer = timer;
+    currentImageUrl = state.imageUrl || '';
+    movesDisplay.textContent = moves;
+    updateTimerDisplay();
+    return true;
+}
+
+async function checkContinueButton() {
+    let hasSave = false;
+    if (token) {
+        hasSave = await loadServerProgress();
+    } else {
+        hasSave = localStorage.getItem('puzzleProgress') !== null;
+    }
+    continueMainButton.style.display = hasSave ? 'block' : 'none';
+}
+
+async function continueGameMain() {
+    let loaded = false;
+    if (token) {
+        loaded = await loadServerProgress();
+    } else {
+        const progress = JSON.parse(localStorage.getItem('puzzleProgress') || '{}');
+        if (progress.difficulty) {
+            playerNameInput.value = progress.playerName || '';
+            size = progress.difficulty || 3;
+            difficultySelect.value = size;
+            moves = progress.moves || 0;
+            timer = progress.timer || 0;
+            tiles = progress.tiles ? progress.tiles.map(t => ({ index: t.index, element: null })) : [];
+            emptyIndex = progress.emptyIndex !== undefined ? progress.emptyIndex : size * size - 1;
+            currentImageUrl = progress.imageUrl || '';
+            movesDisplay.textContent = moves;
+            updateTimerDisplay();
+            loaded = true;
+        }
+    }
+    if (!loaded) return;
+
+    mainMenu.style.display = 'none';
+    gameMenu.style.display = 'flex';
+    const tileSize = Math.min(100, Math.floor((window.innerWidth * 0.8) / size));
+    board.style.gridTemplateColumns = `repeat(${size}, ${tileSize}px)`;
+    board.style.width = `${size * tileSize}px`;
+    board.style.height = `${size * tileSize}px`;
+    gameContainer.style.width = `${Math.max(300, size * tileSize + 40)}px`;
+    board.style.display = 'grid';
+    await createBoard();
+    updateBoardState();
+
+    board.innerHTML = '';
+    await createBoard();
+    updateBoardState();
+
+    playerInfo.textContent = `Игрок: ${playerNameInput.value || (token ? document.getElementById('username-display').textContent : 'Гость')}, Сложность: ${size}x${size}`;
+    playerInfo.style.display = 'block';
+    document.getElementById('info').style.display = 'block';
+    document.getElementById('easter-egg').style.display = 'block';
+    tutorialButton.style.display = 'block';
+    isGameActive = true;
+    if (timerInterval) clearInterval(timerInterval);
+    timerInterval = setInterval(() => {
+        timer++;
+        updateTimerDisplay();
+        autosaveTick();
+    }, 1000);
+    if (!backgroundMusic.playing()) playSound(backgroundMusic);
+    logBoardState();
+}
+
+function validatePlayerName(name) {
+    const regex = /^[a-zA-Zа-яА-Я0-9]{1,20}$/;
+    return regex.test(name);
+}
+
+function preloadImage(url) {
+    return new Promise((resolve, reject) => {
+        const img = new Image();
+        img.onload = resolve;
+        img.onerror = reject;
+        img.src = url;
+    });
+}
+
+async function fetchImage() {
+    // Сначала локальный пул: один запрос за описанием и один за спрайтом
+    try {
+        const resp = await fetch(`/api/puzzle-image/?difficulty=${size}`);
+        if (resp.ok) {
+            const sprite = await resp.json();
+            await preloadImage(sprite.url);
+            currentSprite = sprite;
+            return sprite.url;
+        }
+    } catch (err) {
+        console.error('Локальная картинка недоступна:', err);
+    }
+    currentSprite = null;
+    let attempts = 0;
+    const maxAttempts = 5;
+    while (attempts < maxAttempts) {
+        try {
+            const response = await fetch('https://api.thecatapi.com/v1/images/search');
+            const data = await response.json();
+            const url = data[0].url;
+            if (!url.toLowerCase().endsWith('.gif')) {
+                return url;
+            }
+            attempts++;
+        } catch (error) {
+            attempts++;
+        }
+    }
+    return 'https://via.placeholder.com/500';
+}
+
+async function startGame() {
+    const playerName = playerNameInput.value.trim() || (token ? document.getElementById('username-display').textContent : 'Гость');
+    if (token && !validatePlayerName(playerName)) {
+        alert('Имя содержит недопустимые символы.');
+        return;
+    }
+    newGameMenu.style.display = 'none';
+    gameMenu.style.display = 'flex';
+    size = parseInt(difficultySelect.value);
+    currentSessionId = null;
+    pendingMoves = [];
+    moveLog = [];
+    savedTimer = 0;
+    moves = 0;
+    timer = 0;
+    movesDisplay.textContent = moves;
+    updateTimerDisplay();
+    if (timerInterval) clearInterval(timerInterval);
+    timerInterval = setInterval(() => {
+        timer++;
+        updateTimerDisplay();
+        autosaveTick();
+    }, 1000);
+    tiles = Array.from({ length: size * size }, (_, i) => ({ index: i, element: null }));
+    const tileSize = Math.min(100, Math.floor((window.innerWidth * 0.8) / size));
+    board.style.gridTemplateColumns = `repeat(${size}, ${tileSize}px)`;
+    board.style.width = `${size * tileSize}px`;
+    board.style.height = `${size * tileSize}px`;
+    gameContainer.style.width = `${Math.max(300, size * tileSize + 40)}px`;
+    board.style.display = 'grid';
+    currentImageUrl = await fetchImage();
+    await createBoard();
+    updateBoardState();
+
+    playerInfo.textContent = `Игрок: ${playerName}, Сложность: ${size}x${size}`;
+    playerInfo.style.display = 'block';
+    document.getElementById('info').style.display = 'block';
+    document.getElementById('easter-egg').style.display = 'block';
+    tutorialButton.style.display = 'block';
+    if (!backgroundMusic.playing()) playSound(backgroundMusic);
+    isGameActive = false;
+    setTimeout(async () => {
+        shuffleTiles();
+        board.innerHTML = '';
+        await createBoard();
+        updateBoardState();
+        isGameActive = true;
+        saveProgress();
+    }, 3000);
+}
+
+function startNewGame() {
+    startGame();
+}
+
+function closeTutorial() {
+    tutorial.classList.add('hidden');
+    localStorage.setItem('tutorialSeen', 'true');
+    newGameMenu.style.display = 'flex';
+}
+
+function showTutorial() {
+    if (!localStorage.getItem('tutorialSeen')) {
+        tutorial.classList.remove('hidden');
+        tutorial.style.display = 'flex';
+    }
+}
+
+function showNewGameMenu() {
+    mainMenu.style.display = 'none';
+    newGameMenu.style.display = 'flex';
+    playerNameInput.value = token ? document.getElementById('username-display').textContent : '';
+    difficultySelect.value = '3';
+    tutorialButton.style.display = 'none';
+    showTutorial();
+}
+
+function showHint() {
+    if (hint && gameMenu.style.display === 'flex') {
+        if (hintTimeout) clearTimeout(hintTimeout);
+        playSound(hintSound);
+        hint.style.display = 'block';
+        hintTimeout = setTimeout(() => hint.style.display = 'none', 5000);
+        loadSolverHint();
+    }
+}
+
+async function loadSolverHint() {
+    const solverHint = document.getElementById('solver-hint');
+    solverHint.textContent = '';
+    if (!token || !currentSessionId || !isGameActive) return;
+    // Сервер считает ход по своему состоянию, поэтому сначала отправляем накопленные ходы
+    await flushMoves();
+    try {
+        const resp = await fetch(`/api/sessions/${currentSessionId}/hint/`, {
+            headers: {Authorization: `Bearer ${token}`}
+        });
+        if (!resp.ok) return;
+        const data = await resp.json();
+        if (data.move === null) return;
+        solverHint.textContent = data.optimal
+            ? `Следующий ход подсвечен. До решения: ${data.distance}`
+            : 'Следующий ход подсвечен.';
+        const tile = tiles[data.move];
+        if (tile && tile.element) tile.element.classList.add('hint-tile');
+    } catch (err) {
+        console.error('Ошибка подсказки:', err);
+    }
+}
+
+function updateTimerDisplay() {
+    const minutes = Math.floor(timer / 60).toString().padStart(2, '0');
+    const seconds = (timer % 60).toString().padStart(2, '0');
+    timerDisplay.textContent = `${minutes}:${seconds}`;
+}
+
+function logBoardState() {
+    let boardState = 'Текущее состояние поля:\n';
+    for (let i = 0; i < size; i++) {
+        let row = '';
+        for (let j = 0; j < size; j++) {
+            const pos = i * size + j;
+            const tile = tiles[pos];
+            row += (tile.index === size * size - 1 ? '[ ]' : (tile.index + 1).toString().padStart(3)) + ' ';
+        }
+        boardState += row + '\n';
+    }
+    console.log(boardState);
+}
+
+async function createBoard() {
+    board.innerHTML = '';
+    const tileSize = Math.min(100, Math.floor((window.innerWidth * 0.8) / size));
+    tiles.forEach((tile, i) => {
+        const tileEl = document.createElement('div');
+        tileEl.classList.add('tile');
+        tileEl.dataset.pos = i.toString();
+        tileEl.style.width = `${tileSize}px`;
+        tileEl.style.height = `${tileSize}px`;
+        tileEl.style.backgroundImage = `url(${currentImageUrl})`;
+        tileEl.style.backgroundSize = `${size * tileSize}px ${size * tileSize}px`;
+        tileEl.addEventListener('click', () => {
+            if (!isGameActive) return;
+            moveTile(parseInt(tileEl.dataset.pos));
+        });
+        board.appendChild(tileEl);
+        tiles[i].element = tileEl;
+    });
+    document.removeEventListener('keydown', handleKeyPress);
+    document.addEventListener('keydown', handleKeyPress);
+    updateBoardState();
+}
+
+function shuffleTiles() {
+    for (let k = 0; k < 3; k++) {
+        for (let i = tiles.length - 1; i > 0; i--) {
+            const j = Math.floor(Math.random() * (i + 1));
+            [tiles[i].index, tiles[j].index] = [tiles[j].index, tiles[i].index];
+        }
+    }
+    emptyIndex = tiles.findIndex(t => t.index === size * size - 1);
+    if (size === 3 && !isSolvable()) {
+        let idx1 = 0, idx2 = 1;
+        while (tiles[idx1].index === size * size - 1) idx1++;
+        while (tiles[idx2].index === size * size - 1 || idx2 === idx1) idx2++;
+        [tiles[idx1].index, tiles[idx2].index] = [tiles[idx2].index, tiles[idx1].index];
+    }
+    emptyIndex = tiles.findIndex(t => t.index === size * size - 1);
+    if (isSolved()) shuffleTiles();
+}
+
+function isSolvable() {
+    let inversions = 0;
+    const tileOrder = tiles.map(t => t.index === size * size - 1 ? 0 : t.index + 1);
+    for (let i = 0; i < tileOrder.length - 1; i++) {
+        for (let j = i + 1; j < tileOrder.length; j++) {
+            if (tileOrder[i] && tileOrder[j] && tileOrder[i] > tileOrder[j]) inversions++;
+        }
+    }
+    const emptyRowFromBottom = size - Math.floor(emptyIndex / size);
+    return (inversions + emptyRowFromBottom) % 2 === 0;
+}
+
+function updateBoardState() {
+    const tileSize = Math.min(100, Math.floor((window.innerWidth * 0.8) / size));
+    tiles.forEach((tile, pos) => {
+        if (tile.element) {
+            tile.element.dataset.pos = pos.toString();
+            tile.element.style.width = `${tileSize}px`;
+            tile.element.style.height = `${tileSize}px`;
+            if (tile.index === size * size - 1) {
+                tile.element.classList.add('empty');
+                tile.element.style.backgroundImage = '';
+            } else {
+                tile.element.classList.remove('empty');
+                tile.element.style.backgroundImage = `url(${currentImageUrl})`;
+                if (currentSprite && currentSprite.url === currentImageUrl) {
+                    const scale = tileSize / currentSprite.tile_size;
+                    const [x, y] = currentSprite.tiles[tile.index];
+                    tile.element.style.backgroundSize = `${currentSprite.width * scale}px ${currentSprite.height * scale}px`;
+                    tile.element.style.backgroundPosition = `${-x * scale}px ${-y * scale}px`;
+                } else {
+                    tile.element.style.backgroundSize = `${size * tileSize}px ${size * tileSize}px`;
+                    tile.element.style.backgroundPosition = `${-(tile.index % size) * tileSize}px ${-Math.floor(tile.index / size) * tileSize}px`;
+                }
+            }
+        }
+    });
+}
+
+async function moveTile(pos) {
+    if (!isGameActive || tiles[pos].index === size * size - 1) return;
+    const emptyRow = Math.floor(emptyIndex / size);
+    const emptyCol = emptyIndex % size;
+    const tileRow = Math.floor(pos / size);
+    const tileCol = pos % size;
+    if ((Math.abs(emptyRow - tileRow) === 1 && emptyCol === tileCol) ||
+        (Math.abs(emptyCol - tileCol) === 1 && emptyRow === tileRow)) {
+        [tiles[emptyIndex].index, tiles[pos].index] = [tiles[pos].index, tiles[emptyIndex].index];
+        emptyIndex = pos;
+        moves++;
+        movesDisplay.textContent = moves;
+        playSound(moveSound);
+        logBoardState();
+        queueMove(pos);
+
+        board.innerHTML = '';
+        await createBoard();
+        updateBoardState();
+
+        if (isSolved()) {
+            isGameActive = false;
+            clearInterval(timerInterval);
+            playSound(winSound);
+            await flushMoves(true);
+            saveProgress(true);
+            setTimeout(() => {
+                alert(`Поздравляем${token ? ', ' + document.getElementById('username-display').textContent : ''}! Вы собрали головоломку! Ходы: ${moves}, Время: ${timer} сек, Очки: ${Math.max(0, 10000 - moves * 10 - timer)}`);
+                exitToMenu();
+            }, 500);
+        }
+    }
+}
+
+function isSolved() {
+    return tiles.every((tile, i) => tile.index === i);
+}
+
+function handleKeyPress(e) {
+    if (!isGameActive) return;
+    let newEmptyIndex = emptyIndex;
+    if (e.key === 'ArrowUp' && emptyIndex >= size) newEmptyIndex -= size;
+    if (e.key === 'ArrowDown' && emptyIndex < size * (size - 1)) newEmptyIndex += size;
+    if (e.key === 'ArrowLeft' && emptyIndex % size > 0) newEmptyIndex -= 1;
+    if (e.key === 'ArrowRight' && emptyIndex % size < size - 1) newEmptyIndex += 1;
+    if (newEmptyIndex !== emptyIndex) moveTile(newEmptyIndex);
+}
+
+function playEasterEgg() {
+    playSound(easterSound);
+    alert('Пасхалка разработчика: пазл собран!');
+    solvePuzzle();
+}
+
+async function solvePuzzle() {
+    for (let i = 0; i < tiles.length; i++) tiles[i].index = i;
+    emptyIndex = size * size - 1;
+    board.innerHTML = '';
+    await createBoard();
+    updateBoardState();
+    logBoardState();
+    await flushMoves(true);
+    saveProgress(true);
+    isGameActive = false;
+    clearInterval(timerInterval);
+    playSound(winSound);
+    setTimeout(() => {
+        alert(`Поздравляем${token ? ', ' + document.getElementById('username-display').textContent : ''}! Вы собрали пазл! Ходы: ${moves}, Время: ${timer} сек, Очки: ${Math.max(0, 10000 - moves * 10 - timer)}`);
+        exitToMenu();
+    }, 500);
+}
+
+async function resetGame() {
+    // Новая раскладка — новая сессия: у начатой сервер не меняет начальную доску
+    currentSessionId = null;
+    pendingMoves = [];
+    moveLog = [];
+    savedTimer = 0;
+    moves = 0;
+    timer = 0;
+    movesDisplay.textContent = moves;
+    updateTimerDisplay();
+    if (timerInterval) clearInterval(timerInterval);
+    timerInterval = setInterval(() => {
+        timer++;
+        updateTimerDisplay();
+        autosaveTick();
+    }, 1000);
+    shuffleTiles();
+    board.innerHTML = '';
+    await createBoard();
+    updateBoardState();
+    isGameActive = true;
+    saveProgress();
+    logBoardState();
+}
+
+function exitToMenu() {
+    if (isGameActive) flushMoves(true);
+    if (timerInterval) clearInterval(timerInterval);
+    if (hintTimeout) clearTimeout(hintTimeout);
+    hint.style.display = 'none';
+    isGameActive = false;
+    board.innerHTML = '';
+    board.style.display = 'none';
+    document.getElementById('info').style.display = 'none';
+    document.getElementById('easter-egg').style.display = 'none';
+    tutorialButton.style.display = 'none';
+    playerInfo.style.display = 'none';
+    mainMenu.style.display = 'flex';
+    newGameMenu.style.display = 'none';
+    gameMenu.style.display = 'none';
+    gameContainer.style.width = 'clamp(300px, 80vw, 500px)';
+    checkContinueButton();
+    backgroundMusic.stop();
+}
+
+async function loadLeaderboard() {
+    const diff = document.getElementById('lb-difficulty').value;
+    const friendsOnly = document.getElementById('lb-friends').checked;
+    let url = '/api/leaderboard/';
+    const params = new URLSearchParams();
+    if (diff) params.append('difficulty', diff);
+    if (friendsOnly) params.append('friends', 'true');
+    if (params.toString()) url += '?' + params.toString();
+    const resp = await fetch(url, token ? {headers: {Authorization: `Bearer ${token}`}} : {});
+    const data = await resp.json();
+    const list = document.getElementById('leaderboard-list');
+    list.innerHTML = '';
+    if (data.length === 0) {
+        list.innerHTML = '<li>Нет записей в таблице лидеров</li>';
+    } else {
+        data.forEach((entry, i) => {
+            const li = document.createElement('li');
+            li.textContent = `${i + 1}. ${entry.user__username} — ${entry.best_score} очков`;
+            list.appendChild(li);
+        });
+    }
+}
+
+async function loadFriends() {
+    await loadPages('/api/friends/', 'friends-list', f => {
+        const li = document.createElement('li');
+        li.textContent = f.username;
+        const del = document.createElement('button');
+        del.textContent = 'Удалить';
+        del.onclick = () => deleteFriend(f.id);
+        li.appendChild(del);
+        return li;
+    }, 'У вас пока нет друзей', 'Ошибка загрузки друзей');
+}
+
+async function loadChallenges() {
+    await loadPages('/api/challenges/', 'challenges-list', c => {
+        const li = document.createElement('li');
+        li.textContent = `От ${c.from_username}: ${c.difficulty}x${c.difficulty}, цель ${c.target_score} очков`;
+        return li;
+    }, 'Нет входящих вызовов', 'Ошибка загрузки вызовов');
+}
+
+async function addFriend() {
+    const username = document.getElementById('friend-username').value.trim();
+    if (!username) {
+        alert('Укажите имя пользователя!');
+        return;
+    }
+    const resp = await fetch('/api/friends/', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'Authorization': `Bearer ${token}`
+        },
+        body: JSON.stringify({username})
+    });
+    if (resp.ok) {
+        document.getElementById('friend-username').value = '';
+        loadFriends();
+        alert('Друг добавлен!');
+    } else {
+        const err = await resp.json();
+        let msg = 'Ошибка добавления друга';
+        if (err.username) msg = err.username.join(' ');
+        alert(msg);
+    }
+}
+
+async function deleteFriend(id) {
+    await fetch(`/api/friends/${id}/`, {
+        method: 'DELETE',
+        headers: {Authorization: `Bearer ${token}`}
+    });
+    loadFriends();
+}
+
+async function sendChallenge() {
+    const username = document.getElementById('challenge-username').value.trim();
+    const difficulty = document.getElementById('challenge-difficulty').value;
+    const score = document.getElementById('challenge-score').value;
+    if (!username || !score) {
+        alert('Заполните все поля вызова!');
+        return;
+    }
+    const resp = await fetch('/api/challenges/', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'Authorization': `Bearer ${token}`
+        },
+        body: JSON.stringify({to_username: username, difficulty, target_score: parseInt(score)})
+    });
+    if (resp.ok) {
+        alert('Вызов отправлен!');
+        document.getElementById('challenge-username').value = '';
+        document.getElementById('challenge-score').value = '';
+    } else {
+        const err = await resp.json();
+        let msg = 'Ошибка отправки вызова';
+        if (err.to_username) msg = err.to_username.join(' ');
+        alert(msg);
+    }
+}
+
+async function loadProfile() {
+    const resp = await fetch('/api/profile/', {headers: {Authorization: `Bearer ${token}`}});
+    if (resp.ok) {
+        const data = await resp.json();
+        document.getElementById('profile-bio').value = data.bio || '';
+        document.getElementById('profile-dob').value = data.date_of_birth || '';
+        const avatar = document.getElementById('profile-avatar');
+        const thumbs = data.avatar_urls || {};
+        if (thumbs['128']) {
+            // Миниатюры готовы: WebP для обычных и плотных экранов, JPEG — запасной
+            avatar.srcset = `${thumbs['128'].webp} 1x, ${thumbs['256'].webp} 2x`;
+            avatar.src = thumbs['128'].jpeg;
+        } else if (data.avatar) {
+            avatar.removeAttribute('srcset');
+            avatar.src = data.avatar + '?t=' + Date.now();
+        }
+    }
+}
+
+async function saveProfile() {
+    const bio = document.getElementById('profile-bio').value;
+    const dob = document.getElementById('profile-dob').value;
+    const avatarFile = document.getElementById('avatar-upload').files[0];
+
+    const formData = new FormData();
+    formData.append('bio', bio);
+    if (dob) formData.append('date_of_birth', dob);
+    if (avatarFile) formData.append('avatar', avatarFile);
+
+    const resp = await fetch('/api/profile/', {
+        method: 'PATCH',
+        headers: {Authorization: `Bearer ${token}`},
+        body: formData
+    });
+
+    if (resp.ok) {
+        alert('Профиль обновлён!');
+        loadProfile();
+    } else {
+        const err = await resp.json();
+        alert('Ошибка: ' + JSON.stringify(err));
+    }
+}
+
+async function loadAchievements() {
+    await loadPages('/api/achievements/', 'achievements-list', a => {
+        const li = document.createElement('li');
+        li.className = 'achievement-item';
+        if (a.icon) {
+            const img = document.createElement('img');
+            img.src = a.icon;
+            img.alt = a.name;
+            li.appendChild(img);
+        }
+        const text = document.createElement('span');
+        text.textContent = `${a.name}: ${a.description}`;
+        li.appendChild(text);
+        return li;
+    }, 'Нет достижений', 'Ошибка загрузки достижений');
+}
+
+window.addEventListener('pagehide', () => { if (isGameActive) flushMoves(true); });
+
+updateAuthUI();
+checkContinueButton();